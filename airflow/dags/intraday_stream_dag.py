@@ -0,0 +1,34 @@
+from airflow.decorators import dag, task
+from airflow.exceptions import AirflowSkipException
+from pendulum import timezone, datetime, duration
+
+
+@dag(
+    schedule='25 9 * * 1-5',
+    dag_id='intraday_stream',
+    start_date=datetime(2025, 8, 1, tz=(timezone('America/New_York'))),
+    catchup=False,
+    max_active_runs=1,
+    tags=['streaming', 'intraday']
+)
+def intraday_stream():
+
+    @task(retries=3, retry_delay=duration(seconds=30),
+          execution_timeout=duration(hours=7))
+    def stream_session():
+        # Runs until just after the close. A retry starts from empty counts;
+        # each ticker is back in them with its next minute bar
+        import pendulum
+        from intraday_stream import MARKET_TZ, run_live
+        from utils import get_trading_days
+
+        today = pendulum.today(MARKET_TZ).date()
+        if not len(get_trading_days(today, today)):
+            raise AirflowSkipException(f"{today} is not a trading day")
+        snapshot = run_live(today)
+        return snapshot['stocks_traded'] if snapshot else 0
+
+    stream_session()
+
+
+intraday_stream()
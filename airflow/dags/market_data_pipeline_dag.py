@@ -1,5 +1,54 @@
-from airflow.decorators import dag, task
+from airflow.decorators import dag, task, task_group
 from pendulum import timezone, datetime
+from pathlib import Path
+import json
+
+
+DBT_PROJECT_DIR = '/opt/airflow/dbt/stock_analytics'
+DBT_MANIFEST = f'{DBT_PROJECT_DIR}/target/manifest.json'
+DBT_THREADS = 4
+# Project files the manifest is parsed from
+DBT_SOURCES = ('dbt_project.yml', 'packages.yml', 'models', 'macros', 'seeds',
+               'snapshots', 'tests')
+
+# Pool sized by POLYGON_POOL_SLOTS (created in airflow-init); it caps how
+# many extraction chunks call Polygon at once
+POLYGON_POOL = 'polygon_api'
+
+
+def manifest_is_stale(manifest_path=DBT_MANIFEST,
+                      project_dir=DBT_PROJECT_DIR):
+    '''True if a project file changed after the manifest was written'''
+    parsed_at = Path(manifest_path).stat().st_mtime
+    for source in DBT_SOURCES:
+        path = Path(project_dir) / source
+        files = path.rglob('*') if path.is_dir() else [path]
+        if any(f.exists() and f.stat().st_mtime > parsed_at for f in files):
+            return True
+    return False
+
+
+def load_dbt_models(manifest_path=DBT_MANIFEST):
+    '''Map each dbt model and seed name to the names it depends on, or None
+    without an up-to-date manifest'''
+    try:
+        if manifest_is_stale(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            nodes = json.load(f)['nodes']
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # Seeds get tasks too, so a regenerated constituents seed is loaded
+    # before the models that read it
+    models = {uid: node for uid, node in nodes.items()
+              if node['resource_type'] in ('model', 'seed')}
+    return {
+        node['name']: [models[parent]['name']
+                       for parent in node['depends_on'].get('nodes', [])
+                       if parent in models]
+        for node in models.values()
+    }
 
 
 @dag(
@@ -13,36 +62,97 @@ def market_data_pipeline():
     # Nice documentation
 
     @task()
-    def extract():
-        from extract_load_polygon_data import extract_load_data
-        return extract_load_data()
+    def plan_chunks():
+        # Days whose raw partition is missing, short or duplicated, from
+        # partition metadata; each chunk carries the days to re-download
+        from config import EXTRACT_CHUNK_DAYS
+        from extract_load_polygon_data import get_pending_days
+        pending = get_pending_days()
+        chunks = [pending[i:i + EXTRACT_CHUNK_DAYS]
+                  for i in range(0, len(pending), EXTRACT_CHUNK_DAYS)]
+        return [{'dates': [item['date'] for item in chunk],
+                 'refetch': [item['date'] for item in chunk
+                             if item['refetch']]}
+                for chunk in chunks]
 
-    @task.bash
-    def run_dbt_staging():
-        return '''cd /opt/airflow/dbt/stock_analytics && \
-            dbt run --select staging --profiles-dir .
-        '''
+    @task(pool=POLYGON_POOL, retries=2)
+    def extract_load_chunk(dates, refetch, ti=None):
+        # Chunks run side by side in the pool, so each takes an equal
+        # share of the plan's rate limit and writes its own metrics file
+        import metrics
+        from config import POLYGON_POOL_SLOTS
+        from extraction import share_rate_limit
+        from extract_load_polygon_data import extract_load_dates
+        share_rate_limit(POLYGON_POOL_SLOTS)
+        metrics.set_map_index(ti.map_index)
+        failed_days = extract_load_dates(dates, refetch=refetch)
+        if failed_days:
+            # Failing the mapped instance retries only this chunk; days
+            # already fetched are re-read from the landing zone
+            raise RuntimeError(f"Failed to load {failed_days}")
+        return len(dates)
 
-    @task.bash
-    def run_dbt_intermediate():
-        return '''cd /opt/airflow/dbt/stock_analytics && \
-            dbt run --select intermediate --profiles-dir .
+    @task_group()
+    def extract_load():
+        return extract_load_chunk.expand_kwargs(plan_chunks())
+
+    @task(pool=POLYGON_POOL, retries=2, trigger_rule='none_failed')
+    def load_corporate_actions():
+        # New splits/dividends make dbt restate only the affected tickers
+        from corporate_actions import load_corporate_actions
+        return load_corporate_actions()
+
+    @task.bash(trigger_rule='none_failed')
+    def dbt_parse():
+        # Writes manifest.json and partial_parse.msgpack for the model tasks
+        return f'''cd {DBT_PROJECT_DIR} && \
+            dbt parse --profiles-dir .
         '''
 
     @task.bash
-    def run_dbt_marts():
-        return '''cd /opt/airflow/dbt/stock_analytics && \
-            dbt run --select marts --profiles-dir .
+    def dbt_build_model(model):
+        # Runs the model then its tests. Each task writes to its own target
+        # path, seeded with a copy of the shared partial parse, so
+        # concurrent tasks never write the same compiled or parse files
+        target_path = f'target/tasks/{model}'
+        return f'''cd {DBT_PROJECT_DIR} && \
+            mkdir -p {target_path} && \
+            cp target/partial_parse.msgpack {target_path}/ && \
+            dbt build --select {model} --profiles-dir . \
+                --target-path {target_path}
         '''
 
     @task.bash
-    def run_dbt_tests():
-        return '''cd /opt/airflow/dbt/stock_analytics && \
-            dbt test --profiles-dir .
+    def dbt_build_all():
+        return f'''cd {DBT_PROJECT_DIR} && \
+            dbt build --profiles-dir . --threads {DBT_THREADS}
         '''
 
-    extract() >> run_dbt_staging() >> run_dbt_intermediate() \
-        >> run_dbt_marts() >> run_dbt_tests()
+    @task_group()
+    def dbt_build():
+        parse = dbt_parse()
+        models = load_dbt_models()
+        if not models:
+            # No manifest yet (first deploy), or models were added or
+            # renamed since it was parsed: build everything in one task.
+            # dbt_parse refreshes the manifest, so the next DAG parse
+            # renders one task per model again
+            parse >> dbt_build_all()
+            return
+
+        # One task per model, wired from the manifest so independent models
+        # run concurrently and a failing test only blocks its dependents
+        tasks = {
+            name: dbt_build_model.override(task_id=name)(name)
+            for name in models
+        }
+        for name, parents in models.items():
+            if parents:
+                [tasks[parent] for parent in parents] >> tasks[name]
+            else:
+                parse >> tasks[name]
+
+    extract_load() >> load_corporate_actions() >> dbt_build()
 
 
 market_data_pipeline()
@@ -0,0 +1,135 @@
+# Offline throughput benchmark for the extract and load-serialization path.
+# Runs against the local Polygon stand-in; BigQuery is never contacted.
+#
+#   python benchmarks/bench_extraction.py --days 20 --in-flight 4 \
+#       --requests-per-minute 600 --latency-ms 150 --rate-limit-rate 0.05
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark extraction against the mock Polygon server')
+    parser.add_argument('--days', type=int, default=20)
+    parser.add_argument('--tickers', type=int, default=10_000)
+    parser.add_argument('--in-flight', type=int, default=4)
+    parser.add_argument('--requests-per-minute', type=float, default=600)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--server-error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from mock_polygon_server import start_server
+
+    server = start_server(
+        tickers=args.tickers,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+    # config reads these at import, so set them before importing extraction
+    landing_dir = tempfile.mkdtemp(prefix='bench_landing_')
+    os.environ.update({
+        'API_BASE_URL': server.base_url,
+        'POLYGON_API_KEY': 'benchmark',
+        'POLYGON_REQUESTS_PER_MINUTE': str(args.requests_per_minute),
+        'POLYGON_MAX_IN_FLIGHT': str(args.in_flight),
+        'POLYGON_POOL_SLOTS': '1',
+        'LANDING_ZONE_PATH': landing_dir,
+        # Request latency is measured below; per-span logs would drown it
+        'METRICS_JSON_LOGS': 'false'
+    })
+    import pendulum
+    import extraction
+    from landing_zone import read_landing_table, to_load_table, \
+        to_parquet_buffer
+
+    latencies = []
+    lock = threading.Lock()
+    real_get = extraction.requests.get
+
+    def timed_get(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return real_get(*a, **kw)
+        finally:
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    extraction.requests.get = timed_get
+
+    start_date = pendulum.date(2024, 1, 1)
+    dates = []
+    day = start_date
+    while len(dates) < args.days:
+        if day.weekday() < 5:
+            dates.append(day.strftime('%Y-%m-%d'))
+        day = day.add(days=1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.in_flight) as executor:
+        frames = list(executor.map(
+            lambda d: extraction.extract_polygon_data(d, refresh=True), dates))
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_bytes = 0
+    for date_str in dates:
+        table = read_landing_table(date_str)
+        if table is not None:
+            load_bytes += len(to_parquet_buffer(
+                to_load_table(table, date_str)).getvalue())
+    load_seconds = time.perf_counter() - start
+
+    extracted = sum(1 for f in frames if f is not None)
+    stats = server.stats
+    print("\n=== Extraction Benchmark ===")
+    print(f"Days extracted:      {extracted}/{len(dates)}")
+    print(f"Tickers per day:     {args.tickers:,}")
+    print(f"Extract throughput:  {extracted / extract_seconds * 60:,.1f} days/min")
+    print(f"Request latency p50: {percentile(latencies, 50):,.1f} ms")
+    print(f"Request latency p99: {percentile(latencies, 99):,.1f} ms")
+    print(f"HTTP requests:       {stats['requests']}")
+    print(f"Retries:             {stats['requests'] - stats['ok']} "
+          f"({stats['rate_limited']} x 429, {stats['server_errors']} x 5xx)")
+    print(f"Load serialization:  {len(dates) / load_seconds * 60:,.1f} days/min "
+          f"({load_bytes / 1024 / 1024:,.1f} MiB Parquet)")
+    print(f"Peak RSS:            {peak_rss_mb():,.1f} MiB")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+{% macro date_diff_days(end_date, start_date) %}
+    {{ return(adapter.dispatch('date_diff_days')(end_date, start_date)) }}
+{% endmacro %}
+
+{% macro default__date_diff_days(end_date, start_date) %}
+    DATE_DIFF({{ end_date }}, {{ start_date }}, DAY)
+{% endmacro %}
+
+{% macro duckdb__date_diff_days(end_date, start_date) %}
+    DATE_DIFF('day', {{ start_date }}, {{ end_date }})
+{% endmacro %}
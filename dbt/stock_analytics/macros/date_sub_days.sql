@@ -0,0 +1,11 @@
+{% macro date_sub_days(date_expr, days) %}
+    {{ return(adapter.dispatch('date_sub_days')(date_expr, days)) }}
+{% endmacro %}
+
+{% macro default__date_sub_days(date_expr, days) %}
+    DATE_SUB({{ date_expr }}, INTERVAL {{ days }} DAY)
+{% endmacro %}
+
+{% macro duckdb__date_sub_days(date_expr, days) %}
+    CAST({{ date_expr }} - INTERVAL {{ days }} DAY AS DATE)
+{% endmacro %}
@@ -0,0 +1,10 @@
+{% macro max_trade_date(relation) %}
+    {#- Latest trade_date in `relation`, or none when parsing or when the
+        relation is empty. Models render it as a DATE literal so BigQuery
+        can prune partitions, which it cannot do for a subquery bound. -#}
+    {% if not execute %}
+        {{ return(none) }}
+    {% endif %}
+    {% set result = run_query('SELECT MAX(trade_date) FROM ' ~ relation) %}
+    {{ return(result.columns[0].values()[0]) }}
+{% endmacro %}
@@ -0,0 +1,43 @@
+{% macro restate_trading_momentum(rebuild_days) %}
+    {#- BigQuery pre-hook of fct_trading_momentum. insert_overwrite replaces
+        whole partitions, so the model itself only writes its rebuild
+        window. Tickers restated upstream get the rest of their history
+        here through a MERGE keyed on (ticker, trade_date) that only
+        touches their rows; every other ticker's history is left alone.
+        Runs before the model so adjusted_at still marks them as restated.
+        Renders nothing when there is nothing to restate. -#}
+    {% if not execute or not is_incremental() %}
+        {{ return('') }}
+    {% endif %}
+    {% set max_date = max_trade_date(this) %}
+    {% set restated = restated_tickers(ref('int_russell3000__daily'), 'adjusted_at', this) %}
+    {% if not max_date or not restated %}
+        {{ return('') }}
+    {% endif %}
+    {% set rebuild_start = (max_date - modules.datetime.timedelta(days=rebuild_days)).strftime('%Y-%m-%d') %}
+    {% set tickers = "('" ~ restated | join("', '") ~ "')" %}
+    {% set columns = adapter.get_columns_in_relation(this)
+        | map(attribute='name') | reject('in', ['ticker', 'trade_date']) | list %}
+
+    MERGE {{ this }} as t
+    USING (
+        SELECT *
+        FROM (
+            {{ trading_momentum_signals('ticker IN ' ~ tickers) }}
+        ) as signals
+        WHERE trade_date < DATE '{{ rebuild_start }}'
+            AND is_valid_record = 1
+    ) as s
+    ON t.ticker IN {{ tickers }}
+        AND t.ticker = s.ticker
+        AND t.trade_date = s.trade_date
+    WHEN MATCHED THEN UPDATE SET
+        {%- for column in columns %}
+        {{ column }} = s.{{ column }}{{ ',' if not loop.last }}
+        {%- endfor %}
+    WHEN NOT MATCHED BY TARGET THEN INSERT ROW
+    WHEN NOT MATCHED BY SOURCE
+        AND t.ticker IN {{ tickers }}
+        AND t.trade_date < DATE '{{ rebuild_start }}'
+    THEN DELETE
+{% endmacro %}
@@ -0,0 +1,17 @@
+{% macro restated_tickers(actions_relation, loaded_at_column, relation) %}
+    {#- Tickers in `actions_relation` whose corporate actions were loaded
+        after the newest adjustment already applied in `relation` (its
+        adjusted_at column). Their whole history is rebuilt; every other
+        ticker is only processed for the usual trailing window. Returned as
+        a list so models render literals and the common empty case adds
+        nothing to the query. -#}
+    {% if not execute %}
+        {{ return([]) }}
+    {% endif %}
+    {% set result = run_query(
+        'SELECT DISTINCT ticker FROM ' ~ actions_relation ~
+        ' WHERE ' ~ loaded_at_column ~ ' > (SELECT COALESCE(MAX(adjusted_at), '
+        ~ "TIMESTAMP '1970-01-01') FROM " ~ relation ~ ')'
+    ) %}
+    {{ return(result.columns[0].values() | list) }}
+{% endmacro %}
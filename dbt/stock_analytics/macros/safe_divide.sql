@@ -0,0 +1,11 @@
+{% macro safe_divide(numerator, denominator) %}
+    {{ return(adapter.dispatch('safe_divide')(numerator, denominator)) }}
+{% endmacro %}
+
+{% macro default__safe_divide(numerator, denominator) %}
+    SAFE_DIVIDE({{ numerator }}, {{ denominator }})
+{% endmacro %}
+
+{% macro duckdb__safe_divide(numerator, denominator) %}
+    ({{ numerator }}) / NULLIF({{ denominator }}, 0)
+{% endmacro %}
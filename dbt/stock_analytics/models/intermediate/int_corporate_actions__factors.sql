@@ -0,0 +1,47 @@
+{{ config(materialized='table') }}
+
+{#- One multiplicative factor per corporate action, applied to every price
+    before the ex-date. Splits scale prices by split_from / split_to and
+    volume by the inverse. Cash dividends scale prices by
+    1 - cash / (close before the ex-date), the usual back-adjustment. -#}
+WITH actions AS (
+    SELECT * FROM {{ ref('stg_corporate_actions') }}
+),
+
+dividend_closes AS (
+    SELECT
+        a.ticker,
+        a.ex_date,
+        s.close as prev_close
+    FROM actions as a
+    INNER JOIN {{ ref('stg_daily_stocks') }} as s
+        ON s.ticker = a.ticker
+        AND s.trade_date < a.ex_date
+        AND s.trade_date >= {{ date_sub_days('a.ex_date', 10) }}
+    WHERE a.action_type = 'dividend'
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY a.ticker, a.ex_date
+        ORDER BY s.trade_date DESC
+    ) = 1
+)
+
+SELECT
+    a.ticker,
+    a.action_type,
+    a.ex_date,
+    CASE
+        WHEN a.action_type = 'split' THEN a.split_from / a.split_to
+        ELSE 1 - a.cash_amount / d.prev_close
+    END as price_factor,
+    CASE
+        WHEN a.action_type = 'split' THEN a.split_to / a.split_from
+        ELSE 1
+    END as volume_factor,
+    a.ingested_at
+FROM actions as a
+LEFT JOIN dividend_closes as d
+    ON d.ticker = a.ticker
+    AND d.ex_date = a.ex_date
+WHERE (a.action_type = 'split' AND a.split_from > 0 AND a.split_to > 0)
+    OR (a.action_type = 'dividend' AND a.cash_amount > 0
+        AND d.prev_close > a.cash_amount)
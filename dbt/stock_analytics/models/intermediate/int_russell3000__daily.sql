@@ -1,32 +1,110 @@
 {{ config(
     materialized='incremental',
     unique_key=['ticker', 'trade_date'],
-    partition_by={'field': 'trade_date', 'data_type': 'date'},
-    cluster_by=['ticker'],
+    partition_by=({'field': 'trade_date', 'data_type': 'date'}
+                  if target.type == 'bigquery' else none),
+    cluster_by=(['ticker'] if target.type == 'bigquery' else none),
     on_schema_change='fail'
 ) }}
 
-WITH russell_3000 AS (
-    SELECT * FROM {{ ref('stg_russell_3000__constituents') }}
+{#- Prices are back-adjusted with the factors of later corporate actions.
+    Splits already folded in by Polygon's adjusted data (rows fetched on or
+    after the ex-date; ingested_at is the download time) are skipped. When
+    new actions arrive, only those tickers are re-read in full and
+    restated. Window bounds are literals so BigQuery prunes the partitions
+    of the market and membership tables. -#}
+{% set rebuild_days = 4 %}
+{% set rebuild_start = none %}
+{% set restated = [] %}
+{% if is_incremental() %}
+    {% set max_date = max_trade_date(this) %}
+    {% if max_date %}
+        {% set rebuild_start = (max_date - modules.datetime.timedelta(days=rebuild_days)).strftime('%Y-%m-%d') %}
+    {% endif %}
+    {% set restated = restated_tickers(ref('int_corporate_actions__factors'), 'ingested_at', this) %}
+{% endif %}
+
+WITH membership AS (
+    SELECT * FROM {{ ref('int_russell3000__membership') }}
+    {% if rebuild_start %}
+    WHERE trade_date >= DATE '{{ rebuild_start }}'
+    {% if restated %}
+    OR ticker IN ('{{ restated | join("', '") }}')
+    {% endif %}
+    {% endif %}
+),
+
+adjustments AS (
+    SELECT * FROM {{ ref('int_corporate_actions__factors') }}
 ),
 
 full_market AS (
-    SELECT DISTINCT * FROM {{ ref('stg_daily_stocks') }}
-    {% if is_incremental() %}
-    WHERE trade_date >= (SELECT DATE_SUB(MAX(trade_date), INTERVAL 4 DAY) FROM {{ this }})
+    SELECT * FROM {{ ref('stg_daily_stocks') }}
+    {% if rebuild_start %}
+    WHERE trade_date >= DATE '{{ rebuild_start }}'
+    {% if restated %}
+    OR ticker IN ('{{ restated | join("', '") }}')
+    {% endif %}
     {% endif %}
 ),
 
+row_factors AS (
+    SELECT
+        m.ticker,
+        m.trade_date,
+        EXP(SUM(LN(a.price_factor))) as price_factor,
+        EXP(SUM(LN(a.volume_factor))) as volume_factor
+    FROM full_market as m
+    INNER JOIN adjustments as a
+        ON a.ticker = m.ticker
+        AND m.trade_date < a.ex_date
+        AND (a.action_type = 'dividend'
+             OR CAST(m.ingested_at AS DATE) < a.ex_date)
+    GROUP BY m.ticker, m.trade_date
+),
+
+ticker_adjustments AS (
+    SELECT
+        ticker,
+        MAX(ingested_at) as adjusted_at
+    FROM adjustments
+    GROUP BY ticker
+),
+
+adjusted_market AS (
+    SELECT
+        m.ticker,
+        CAST(ROUND(m.volume * COALESCE(f.volume_factor, 1)) AS BIGINT) as volume,
+        m.volume_weighted_avg * COALESCE(f.price_factor, 1) as volume_weighted_avg,
+        m.open * COALESCE(f.price_factor, 1) as open,
+        m.close * COALESCE(f.price_factor, 1) as close,
+        m.high * COALESCE(f.price_factor, 1) as high,
+        m.low * COALESCE(f.price_factor, 1) as low,
+        m.num_transactions,
+        m.trade_date,
+        m.ingested_at,
+        m.has_volume,
+        m.is_valid_record,
+        COALESCE(f.price_factor, 1) as adjustment_factor,
+        t.adjusted_at
+    FROM full_market as m
+    LEFT JOIN row_factors as f
+        ON f.ticker = m.ticker
+        AND f.trade_date = m.trade_date
+    LEFT JOIN ticker_adjustments as t
+        ON t.ticker = m.ticker
+),
+
 russell3000_daily AS (
     SELECT 
-        full_market.*,
-        russell_3000.sector,
-        russell_3000.company,
-        russell_3000.market_weight as index_weight
-    FROM full_market
-    INNER JOIN russell_3000
-        ON full_market.ticker = russell_3000.ticker 
-        AND full_market.trade_date BETWEEN russell_3000.valid_from AND russell_3000.valid_to
+        adjusted_market.*,
+        membership.sector,
+        membership.company,
+        membership.index_weight
+    FROM adjusted_market
+    INNER JOIN membership
+        ON adjusted_market.ticker = membership.ticker 
+        AND adjusted_market.trade_date = membership.trade_date
 )
 
 {% if is_incremental() %}
@@ -40,7 +118,8 @@ prev_closes AS (
             ORDER BY trade_date
         ) as prev_close
     FROM {{ this }}
-    WHERE trade_date >= (SELECT DATE_SUB(MIN(trade_date), INTERVAL 10 DAY) FROM full_market)
+    -- Bounded by the trailing window so restated histories do not widen it
+    WHERE trade_date >= (SELECT {{ date_sub_days('MAX(trade_date)', 14) }} FROM {{ this }})
 )
 {% endif %}
 
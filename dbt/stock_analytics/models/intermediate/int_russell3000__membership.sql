@@ -0,0 +1,72 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy=('insert_overwrite' if target.type == 'bigquery'
+                          else 'delete+insert'),
+    unique_key='trade_date',
+    partition_by=({'field': 'trade_date', 'data_type': 'date'}
+                  if target.type == 'bigquery' else none),
+    cluster_by=(['ticker'] if target.type == 'bigquery' else none),
+    on_schema_change='fail'
+)}}
+
+{#- One row per Russell 3000 member per trading day, expanded from the SCD2
+    constituents so int_russell3000__daily equi-joins on (ticker, trade_date)
+    instead of range joining the whole market. Only trading days and
+    versions are range joined here, which is small.
+    constituents_as_of is the newest holdings snapshot in the seed: the
+    latest version start or day after a version end. Incremental runs
+    rebuild the last `rebuild_days`, reaching back to that date when the
+    table was built from an older snapshot. Whole days are replaced
+    (unique_key is trade_date on DuckDB, partitions on BigQuery) so tickers
+    dropped by a rebalance disappear. -#}
+{% set rebuild_days = 4 %}
+{% set rebuild_start = none %}
+{% set as_of = none %}
+{% if execute %}
+    {% set result = run_query(
+        "SELECT MAX(valid_from), MAX(CASE WHEN valid_to < DATE '3000-01-01' "
+        ~ 'THEN valid_to END) FROM ' ~ ref('stg_russell_3000__constituents')
+    ) %}
+    {% set latest_from, latest_to = result.rows[0] %}
+    {% set as_of = latest_from %}
+    {% if latest_to and latest_to >= latest_from %}
+        {% set as_of = latest_to + modules.datetime.timedelta(days=1) %}
+    {% endif %}
+{% endif %}
+{% if is_incremental() %}
+    {% set max_date = max_trade_date(this) %}
+    {% if max_date %}
+        {% set rebuild_start = max_date - modules.datetime.timedelta(days=rebuild_days) %}
+        {% set applied = run_query('SELECT MAX(constituents_as_of) FROM ' ~ this).columns[0].values()[0] %}
+        {% if as_of and (not applied or as_of > applied) and as_of < rebuild_start %}
+            {% set rebuild_start = as_of %}
+        {% endif %}
+    {% endif %}
+{% endif %}
+
+WITH trading_days AS (
+    SELECT DISTINCT trade_date
+    FROM {{ ref('stg_daily_stocks') }}
+    {% if rebuild_start %}
+    WHERE trade_date >= DATE '{{ rebuild_start.strftime('%Y-%m-%d') }}'
+    {% endif %}
+),
+
+constituents AS (
+    SELECT * FROM {{ ref('stg_russell_3000__constituents') }}
+    {% if rebuild_start %}
+    WHERE valid_to >= DATE '{{ rebuild_start.strftime('%Y-%m-%d') }}'
+    {% endif %}
+)
+
+SELECT
+    c.ticker,
+    d.trade_date,
+    c.company,
+    c.sector,
+    c.market_weight as index_weight,
+    c.valid_from,
+    {% if as_of %}DATE '{{ as_of.strftime('%Y-%m-%d') }}'{% else %}CAST(NULL AS DATE){% endif %} as constituents_as_of
+FROM trading_days as d
+INNER JOIN constituents as c
+    ON d.trade_date BETWEEN c.valid_from AND c.valid_to
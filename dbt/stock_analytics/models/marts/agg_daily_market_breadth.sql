@@ -1,14 +1,34 @@
 {{ config(
-    materialized='table'
+    materialized='incremental',
+    incremental_strategy=('merge' if target.type == 'bigquery'
+                          else 'delete+insert'),
+    unique_key='trade_date',
+    on_schema_change='append_new_columns'
 )}}
 
+{#- Incremental runs recompute the same `rebuild_days` window as
+    fct_trading_momentum and carry the cumulative ad_line and the 10-day
+    high_low_index forward from the rows already stored before it. A
+    table built before new_highs/new_lows were stored cannot seed them,
+    so its first incremental run recomputes every day instead. -#}
+{% set rebuild_days = 4 %}
+{% set rebuild_start = none %}
+{% if is_incremental() %}
+    {% set max_date = max_trade_date(this) %}
+    {% set stored_columns = adapter.get_columns_in_relation(this)
+                            | map(attribute='name') | map('lower') | list %}
+    {% if max_date and 'new_highs' in stored_columns %}
+        {% set rebuild_start = (max_date - modules.datetime.timedelta(days=rebuild_days)).strftime('%Y-%m-%d') %}
+    {% endif %}
+{% endif %}
+
 WITH base_aggregates AS (
-    SELECT 
+    SELECT
         trade_date,
         COUNT(DISTINCT ticker) as stocks_traded,
         SUM(CASE
                 WHEN close = yesterday_close OR yesterday_close IS NULL
-                THEN 1 
+                THEN 1
                 ELSE 0
                 END
         ) as unchanged_stocks,
@@ -22,7 +42,7 @@ WITH base_aggregates AS (
                 WHEN close < yesterday_close AND yesterday_close IS NOT NULL
                 THEN 1
                 ELSE 0
-                END 
+                END
         ) as declines,
         SUM(CASE
                 WHEN close > yesterday_close AND yesterday_close IS NOT NULL
@@ -37,106 +57,108 @@ WITH base_aggregates AS (
                 END
         ) as down_volume
     FROM {{ ref('int_russell3000__daily') }}
+    {% if rebuild_start %}
+    WHERE trade_date >= DATE '{{ rebuild_start }}'
+    {% endif %}
     GROUP BY trade_date
 ),
 
-rolling_high_low AS (
+-- 52-week flags come from the momentum mart's high/low columns, so the
+-- rolling 252-row window is computed only once
+momentum_aggs AS (
     SELECT
-        *,
-        CASE
-            WHEN COUNT(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            ) >= 252
-            THEN MAX(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            ) 
-            ELSE NULL
-            END as high_52week,
-        CASE
-            WHEN COUNT(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            ) >= 252
-            THEN
-            MIN(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            ) 
-            ELSE NULL
-            END as low_52week
-    FROM {{ ref('int_russell3000__daily') }}
-),
-
-high_low_aggs AS (
-    SELECT 
         trade_date,
+        SUM(CASE WHEN close > sma_20 THEN 1 ELSE 0 END) / COUNT(close) as pct_market_over_sma20,
+        SUM(CASE WHEN close > sma_50 THEN 1 ELSE 0 END) / COUNT(close) as pct_market_over_sma50,
+        SUM(CASE WHEN close > sma_200 THEN 1 ELSE 0 END) / COUNT(close) as pct_market_over_sma200,
+        AVG(rsi) as market_rsi,
         SUM(CASE WHEN close = high_52week THEN 1 ELSE 0 END) as new_highs,
         SUM(CASE WHEN close = low_52week THEN 1 ELSE 0 END) as new_lows
-    FROM rolling_high_low
+    FROM {{ ref('fct_trading_momentum') }}
+    {% if rebuild_start %}
+    WHERE trade_date >= DATE '{{ rebuild_start }}'
+    {% endif %}
     GROUP BY trade_date
 ),
 
-sma_aggs AS (
+{% if rebuild_start %}
+-- Stored days just before the rebuild window seed the running aggregates
+prior_days AS (
+    SELECT trade_date, ad_line, new_highs, new_lows
+    FROM {{ this }}
+    WHERE trade_date < DATE '{{ rebuild_start }}'
+    ORDER BY trade_date DESC
+    LIMIT 9
+),
+{% endif %}
+
+high_low_days AS (
+    SELECT trade_date, new_highs, new_lows
+    FROM momentum_aggs
+    {% if rebuild_start %}
+    UNION ALL
+    SELECT trade_date, new_highs, new_lows
+    FROM prior_days
+    {% endif %}
+),
+
+high_low_index AS (
     SELECT
-        trade_date, 
-        SUM(CASE WHEN close > sma_20 THEN 1 ELSE 0 END) / COUNT(close) as pct_market_over_sma20,
-        SUM(CASE WHEN close > sma_50 THEN 1 ELSE 0 END) / COUNT(close) as pct_market_over_sma50,
-        SUM(CASE WHEN close > sma_200 THEN 1 ELSE 0 END) / COUNT(close) as pct_market_over_sma200,
-        AVG(rsi) as market_rsi
-    FROM {{ ref('fct_trading_momentum') }}
-    GROUP BY trade_date
+        trade_date,
+        AVG(CASE WHEN (new_highs + new_lows) > 0
+                    THEN new_highs / (new_highs + new_lows)
+                    ELSE NULL END) OVER (
+                        ORDER BY trade_date
+                        ROWS BETWEEN 9 PRECEDING AND CURRENT ROW
+        ) as high_low_index
+    FROM high_low_days
 ),
 
 all_aggs AS (
-    SELECT 
+    SELECT
         b.*,
-        s.pct_market_over_sma20,
-        s.pct_market_over_sma50,
-        s.pct_market_over_sma200,
-        s.market_rsi,
+        m.pct_market_over_sma20,
+        m.pct_market_over_sma50,
+        m.pct_market_over_sma200,
+        m.market_rsi,
+        {% if rebuild_start %}
+        COALESCE((SELECT ad_line FROM prior_days
+                  ORDER BY trade_date DESC LIMIT 1), 0) +
+        {% endif %}
         SUM(b.advances - b.declines) OVER (
             ORDER BY b.trade_date
         ) as ad_line,
-        CASE 
+        CASE
             WHEN (b.advances + b.declines + b.unchanged_stocks) > 0
-            THEN ((b.advances - b.declines) / (b.advances + b.declines + b.unchanged_stocks)) 
+            THEN ((b.advances - b.declines) / (b.advances + b.declines + b.unchanged_stocks))
             ELSE NULL
         END as ad_percentage,
-        SAFE_DIVIDE(b.advances, b.declines) as ad_ratio,
+        {{ safe_divide('b.advances', 'b.declines') }} as ad_ratio,
         CASE
             WHEN (b.up_volume IS NOT NULL AND b.up_volume != 0) AND (b.down_volume IS NOT NULL AND b.down_volume != 0)
             THEN b.up_volume / b.down_volume
             ELSE NULL
         END as up_down_volume_ratio,
         CASE
-            WHEN s.market_rsi > 70 
+            WHEN m.market_rsi > 70
             THEN 'overbought'
-            WHEN s.market_rsi < 30
+            WHEN m.market_rsi < 30
             THEN 'oversold'
             ELSE 'normal'
         END as market_momentum,
-        CASE 
+        CASE
             WHEN b.stocks_traded > 0
-            THEN h.new_highs / b.stocks_traded
+            THEN m.new_highs / b.stocks_traded
             ELSE NULL
         END as record_high_pct,
-        AVG(CASE WHEN (h.new_highs + h.new_lows) > 0
-                    THEN h.new_highs / (h.new_highs + h.new_lows)
-                    ELSE NULL END) OVER (
-                        ORDER BY h.trade_date
-                        ROWS BETWEEN 9 PRECEDING AND CURRENT ROW
-        ) as high_low_index
+        h.high_low_index,
+        m.new_highs,
+        m.new_lows
 
     FROM base_aggregates as b
-    LEFT JOIN sma_aggs as s
-    ON s.trade_date = b.trade_date
-    LEFT JOIN high_low_aggs as h
+    LEFT JOIN momentum_aggs as m
+    ON m.trade_date = b.trade_date
+    LEFT JOIN high_low_index as h
     ON h.trade_date = b.trade_date
 )
 
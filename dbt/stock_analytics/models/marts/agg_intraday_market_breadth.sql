@@ -0,0 +1,32 @@
+{{ config(materialized='view') }}
+
+-- Live breadth snapshots streamed by src/intraday_stream.py, with the
+-- ratios of agg_daily_market_breadth. A view, so readers see rows as soon
+-- as they are streamed; filter on trade_date to read one day's partition.
+SELECT
+    trade_date,
+    snapshot_at,
+    bar_end_at,
+    universe_size,
+    stocks_traded,
+    advances,
+    declines,
+    unchanged_stocks,
+    up_volume,
+    down_volume,
+    CASE
+        WHEN stocks_traded > 0
+        THEN (advances - declines) / stocks_traded
+        ELSE NULL
+    END as ad_percentage,
+    {{ safe_divide('advances', 'declines') }} as ad_ratio,
+    CASE
+        WHEN up_volume != 0 AND down_volume != 0
+        THEN up_volume / down_volume
+        ELSE NULL
+    END as up_down_volume_ratio,
+    {{ safe_divide('over_sma20', 'stocks_traded') }} as pct_market_over_sma20,
+    {{ safe_divide('over_sma50', 'stocks_traded') }} as pct_market_over_sma50,
+    {{ safe_divide('over_sma200', 'stocks_traded') }} as pct_market_over_sma200,
+    events
+FROM {{ source('raw_market', 'intraday_breadth') }}
@@ -3,40 +3,50 @@
 )}}
 
 
-WITH latest_snapshot AS (
+{#- Per-ticker history (returns, day counts, cross dates) comes from the
+    incrementally maintained dim_securities_state; only the 20-day
+    volatility and 1-month sector metrics read recent momentum rows. -#}
+{% set max_date = max_trade_date(ref('fct_trading_momentum')) or modules.datetime.date.today() %}
+{% set sector_start = (max_date - modules.datetime.timedelta(days=33)).strftime('%Y-%m-%d') %}
+
+WITH state AS (
+    SELECT *
+    FROM {{ ref('dim_securities_state') }}
+    WHERE latest_trade_date = DATE '{{ max_date.strftime('%Y-%m-%d') }}'
+),
+
+latest_snapshot AS (
     SELECT
         ticker,
         company,
-        sector, 
-        trade_date as latest_trade_date,
-        volume as latest_volume,
-        open as latest_open,
-        close as latest_close,
-        yesterday_close as latest_prev_close,
-        high as latest_high,
-        low as latest_low,
-        sma_20 as latest_sma20,
-        sma_50 as latest_sma50,
-        sma_200 as latest_sma200,
-        rsi as latest_rsi,
-        rel_vol as latest_rel_vol,
-        high_52week as latest_52week_high,
-        low_52week as latest_52week_low,
-        (close - yesterday_close) as price_change_1d,
-        (close - yesterday_close) / yesterday_close as return_1d
-    FROM {{ ref('fct_trading_momentum') }}
-    WHERE trade_date = (SELECT MAX(trade_date) FROM {{ ref('fct_trading_momentum') }})
+        sector,
+        latest_trade_date,
+        latest_volume,
+        latest_open,
+        latest_close,
+        latest_prev_close,
+        latest_high,
+        latest_low,
+        latest_sma20,
+        latest_sma50,
+        latest_sma200,
+        latest_rsi,
+        latest_rel_vol,
+        latest_52week_high,
+        latest_52week_low,
+        (latest_close - latest_prev_close) as price_change_1d,
+        (latest_close - latest_prev_close) / latest_prev_close as return_1d
+    FROM state
 ),
 
 returns_lookback AS (
-    SELECT 
+    SELECT
         ticker,
-        {{ calculate_return(5) }} as return_1w,
-        {{ calculate_return(21) }} as return_1m,
-        {{ calculate_return(63) }} as return_3m,
-        {{ calculate_return(252) }} as return_ytd,
-    FROM {{ ref('fct_trading_momentum') }}
-    QUALIFY ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trade_date DESC) = 1
+        (latest_close - close_5d_ago) / close_5d_ago as return_1w,
+        (latest_close - close_21d_ago) / close_21d_ago as return_1m,
+        (latest_close - close_63d_ago) / close_63d_ago as return_3m,
+        (latest_close - close_252d_ago) / close_252d_ago as return_ytd
+    FROM state
 ),
 
 numbered_dates AS (
@@ -52,7 +62,7 @@ numbered_dates AS (
             ORDER BY trade_date DESC
         ) as days_back
     FROM {{ ref('fct_trading_momentum') }}
-    WHERE trade_date >= DATE_SUB((SELECT MAX(trade_date) FROM {{ ref('fct_trading_momentum') }}), INTERVAL 33 DAY)
+    WHERE trade_date >= DATE '{{ sector_start }}'
 ), 
 
 sector_lookback AS (
@@ -92,14 +102,6 @@ volatility_metrics AS (
     GROUP BY ticker
 ),
 
-trading_days_count AS (
-    SELECT
-        ticker, 
-        COUNT(DISTINCT trade_date) as total_trading_days
-    FROM {{ ref('fct_trading_momentum') }}
-    GROUP BY ticker 
-),
-
 signal_flags AS (
     SELECT
         ticker,
@@ -126,55 +128,20 @@ signal_flags AS (
     FROM latest_snapshot as l
 ),
 
-last_signals AS (
-    SELECT 
-        ticker,
-        COALESCE(
-            MAX(CASE
-                    WHEN golden_cross = 1
-                    THEN trade_date
-                END),
-            MIN(CASE 
-                    WHEN sma_200 IS NOT NULL
-                    THEN trade_date
-                END)) as last_golden_cross,
-        COALESCE(
-            MAX(CASE
-                    WHEN close > sma_50 AND (yesterday_close < sma_50 OR yesterday_close IS NULL)
-                    THEN trade_date
-                END),
-            MIN(CASE 
-                    WHEN sma_50 IS NOT NULL AND close > sma_50 
-                    THEN trade_date 
-                END)) as day_cross_over_sma50,
-        COALESCE(
-            MAX(CASE
-                    WHEN close < sma_50 AND (yesterday_close > sma_50 OR yesterday_close IS NULL)
-                    THEN trade_date
-                END),
-            MIN(CASE 
-                    WHEN sma_50 IS NOT NULL AND close < sma_50 
-                    THEN trade_date 
-                END)) as day_cross_below_sma50,
-    FROM {{ ref('fct_trading_momentum') }} 
-    WHERE trade_date >= DATE_SUB((SELECT MAX(trade_date) FROM {{ ref('fct_trading_momentum') }}), INTERVAL 365 DAY)
-    GROUP BY ticker     
-),
-
 final AS (
     SELECT 
         l.*,
         CASE
-            WHEN latest_52week_high IS NOT NULL
-            THEN (latest_52week_high - latest_close) / latest_52week_high
+            WHEN l.latest_52week_high IS NOT NULL
+            THEN (l.latest_52week_high - l.latest_close) / l.latest_52week_high
             ELSE NULL
         END as pct_distance_from_52week_high,
         CASE 
-            WHEN latest_52week_low IS NOT NULL
-            THEN (latest_close - latest_52week_low) / latest_52week_low
+            WHEN l.latest_52week_low IS NOT NULL
+            THEN (l.latest_close - l.latest_52week_low) / l.latest_52week_low
             ELSE NULL
         END as pct_distance_from_52week_low,
-        t_days.total_trading_days,
+        st.total_trading_days,
         r.return_1w,
         r.return_1m,
         r.return_3m,
@@ -199,28 +166,26 @@ final AS (
         s.over_sma20,
         s.over_sma50,
         s.over_sma200,
-        DATE_DIFF(l.latest_trade_date, ls.last_golden_cross, DAY) as days_since_last_golden_cross,
+        {{ date_diff_days('l.latest_trade_date', 'st.last_golden_cross') }} as days_since_last_golden_cross,
         CASE
             WHEN s.over_sma50 = 1
-            THEN DATE_DIFF(l.latest_trade_date, ls.day_cross_over_sma50, DAY) 
+            THEN {{ date_diff_days('l.latest_trade_date', 'st.day_cross_over_sma50') }} 
             ELSE NULL
         END as days_over_sma50,
         CASE
             WHEN s.over_sma50 = 0
-            THEN DATE_DIFF(l.latest_trade_date, ls.day_cross_below_sma50, DAY) 
+            THEN {{ date_diff_days('l.latest_trade_date', 'st.day_cross_below_sma50') }} 
             ELSE NULL
         END as days_under_sma50
     FROM latest_snapshot as l
     LEFT JOIN returns_lookback as r
     ON l.ticker = r.ticker
-    LEFT JOIN trading_days_count as t_days
-    ON l.ticker = t_days.ticker
+    LEFT JOIN state as st
+    ON l.ticker = st.ticker
     LEFT JOIN volatility_metrics as v
     ON l.ticker = v.ticker
     LEFT JOIN signal_flags as s
     ON l.ticker = s.ticker
-    LEFT JOIN last_signals as ls 
-    ON l.ticker = ls.ticker
     LEFT JOIN sector_metrics as sm
     ON l.ticker = sm.ticker
 )
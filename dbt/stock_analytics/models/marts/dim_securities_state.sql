@@ -0,0 +1,190 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy=('merge' if target.type == 'bigquery'
+                          else 'delete+insert'),
+    unique_key='ticker',
+    on_schema_change='fail'
+) }}
+
+{#- One row per ticker holding what dim_securities_current needs, so the
+    dimension never scans full history:
+    - the latest row and closes 5/21/63/252 rows back, read from the last
+      `lookback_days` of fct_trading_momentum (enough for 253 rows),
+    - the latest golden cross and SMA50 crossings within the last year,
+    - the trading day count. Rows older than the momentum mart's rebuild
+      window never change, so each run folds the newly settled days into
+      settled_trading_days and recounts only the days after them. -#}
+{% set rebuild_days = 4 %}
+{% set lookback_days = 400 %}
+{% set max_date = max_trade_date(ref('fct_trading_momentum')) or modules.datetime.date.today() %}
+{% set settled_before = (max_date - modules.datetime.timedelta(days=rebuild_days)).strftime('%Y-%m-%d') %}
+{% set window_start = (max_date - modules.datetime.timedelta(days=lookback_days)).strftime('%Y-%m-%d') %}
+{% set signal_start = (max_date - modules.datetime.timedelta(days=365)).strftime('%Y-%m-%d') %}
+{% set prior_settled_before = none %}
+{% if is_incremental() %}
+    {% set prior_settled_before = run_query('SELECT MAX(settled_before) FROM ' ~ this).columns[0].values()[0] %}
+{% endif %}
+
+WITH recent AS (
+    SELECT
+        ticker,
+        company,
+        sector,
+        trade_date,
+        volume,
+        open,
+        close,
+        yesterday_close,
+        high,
+        low,
+        sma_20,
+        sma_50,
+        sma_200,
+        rsi,
+        rel_vol,
+        high_52week,
+        low_52week,
+        golden_cross,
+        ROW_NUMBER() OVER (
+            PARTITION BY ticker
+            ORDER BY trade_date DESC
+        ) as days_back
+    FROM {{ ref('fct_trading_momentum') }}
+    WHERE trade_date >= DATE '{{ window_start }}'
+),
+
+latest AS (
+    SELECT *
+    FROM recent
+    WHERE days_back = 1
+),
+
+ticker_metrics AS (
+    SELECT
+        ticker,
+        MAX(CASE WHEN days_back = 6 THEN close END) as close_5d_ago,
+        MAX(CASE WHEN days_back = 22 THEN close END) as close_21d_ago,
+        MAX(CASE WHEN days_back = 64 THEN close END) as close_63d_ago,
+        MAX(CASE WHEN days_back = 253 THEN close END) as close_252d_ago,
+        COALESCE(
+            MAX(CASE
+                    WHEN trade_date >= DATE '{{ signal_start }}'
+                        AND golden_cross = 1
+                    THEN trade_date
+                END),
+            MIN(CASE
+                    WHEN trade_date >= DATE '{{ signal_start }}'
+                        AND sma_200 IS NOT NULL
+                    THEN trade_date
+                END)) as last_golden_cross,
+        COALESCE(
+            MAX(CASE
+                    WHEN trade_date >= DATE '{{ signal_start }}'
+                        AND close > sma_50
+                        AND (yesterday_close < sma_50 OR yesterday_close IS NULL)
+                    THEN trade_date
+                END),
+            MIN(CASE
+                    WHEN trade_date >= DATE '{{ signal_start }}'
+                        AND sma_50 IS NOT NULL AND close > sma_50
+                    THEN trade_date
+                END)) as day_cross_over_sma50,
+        COALESCE(
+            MAX(CASE
+                    WHEN trade_date >= DATE '{{ signal_start }}'
+                        AND close < sma_50
+                        AND (yesterday_close > sma_50 OR yesterday_close IS NULL)
+                    THEN trade_date
+                END),
+            MIN(CASE
+                    WHEN trade_date >= DATE '{{ signal_start }}'
+                        AND sma_50 IS NOT NULL AND close < sma_50
+                    THEN trade_date
+                END)) as day_cross_below_sma50,
+        COUNT(DISTINCT CASE
+                WHEN trade_date >= DATE '{{ settled_before }}'
+                THEN trade_date
+            END) as unsettled_trading_days
+    FROM recent
+    GROUP BY ticker
+),
+
+-- Days that became final since the previous run (all of them on a full
+-- refresh)
+newly_settled AS (
+    SELECT
+        ticker,
+        COUNT(DISTINCT trade_date) as trading_days
+    FROM {{ ref('fct_trading_momentum') }}
+    WHERE trade_date < DATE '{{ settled_before }}'
+    {% if prior_settled_before %}
+    AND trade_date >= DATE '{{ prior_settled_before.strftime('%Y-%m-%d') }}'
+    {% endif %}
+    GROUP BY ticker
+),
+
+{% if is_incremental() %}
+previous AS (
+    SELECT ticker, settled_trading_days
+    FROM {{ this }}
+),
+{% endif %}
+
+-- Every known ticker is rewritten each run so settled_before stays
+-- uniform, including tickers that have left the index
+tickers AS (
+    SELECT ticker FROM ticker_metrics
+    UNION DISTINCT
+    SELECT ticker FROM newly_settled
+    {% if is_incremental() %}
+    UNION DISTINCT
+    SELECT ticker FROM previous
+    {% endif %}
+)
+
+SELECT
+    t.ticker,
+    l.company,
+    l.sector,
+    l.trade_date as latest_trade_date,
+    l.volume as latest_volume,
+    l.open as latest_open,
+    l.close as latest_close,
+    l.yesterday_close as latest_prev_close,
+    l.high as latest_high,
+    l.low as latest_low,
+    l.sma_20 as latest_sma20,
+    l.sma_50 as latest_sma50,
+    l.sma_200 as latest_sma200,
+    l.rsi as latest_rsi,
+    l.rel_vol as latest_rel_vol,
+    l.high_52week as latest_52week_high,
+    l.low_52week as latest_52week_low,
+    m.close_5d_ago,
+    m.close_21d_ago,
+    m.close_63d_ago,
+    m.close_252d_ago,
+    m.last_golden_cross,
+    m.day_cross_over_sma50,
+    m.day_cross_below_sma50,
+    {% if is_incremental() %}
+    COALESCE(p.settled_trading_days, 0) +
+    {% endif %}
+    COALESCE(s.trading_days, 0) as settled_trading_days,
+    {% if is_incremental() %}
+    COALESCE(p.settled_trading_days, 0) +
+    {% endif %}
+    COALESCE(s.trading_days, 0) +
+    COALESCE(m.unsettled_trading_days, 0) as total_trading_days,
+    DATE '{{ settled_before }}' as settled_before
+FROM tickers as t
+LEFT JOIN latest as l
+ON l.ticker = t.ticker
+LEFT JOIN ticker_metrics as m
+ON m.ticker = t.ticker
+LEFT JOIN newly_settled as s
+ON s.ticker = t.ticker
+{% if is_incremental() %}
+LEFT JOIN previous as p
+ON p.ticker = t.ticker
+{% endif %}
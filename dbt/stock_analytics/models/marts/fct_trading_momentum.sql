@@ -1,144 +1,58 @@
+{#- Incremental runs rebuild the partitions from `rebuild_days` before the
+    latest loaded date, reading only that window plus enough history for
+    the longest window (252 rows for the 52-week high/low). 400 calendar
+    days covers 252 trading days with room for holidays and short halts.
+    Bounds are literals so BigQuery prunes partitions of the source. -#}
+{% set rebuild_days = 4 %}
+{% set lookback_days = 400 %}
+
 {{ config(
     materialized='incremental',
+    incremental_strategy=('insert_overwrite' if target.type == 'bigquery'
+                          else 'delete+insert'),
     unique_key=['ticker', 'trade_date'],
-    partition_by={'field': 'trade_date', 'data_type': 'date'},
-    cluster_by=['ticker'],
+    partition_by=({'field': 'trade_date', 'data_type': 'date'}
+                  if target.type == 'bigquery' else none),
+    cluster_by=(['ticker'] if target.type == 'bigquery' else none),
+    pre_hook=(['{{ restate_trading_momentum(' ~ rebuild_days ~ ') }}']
+              if target.type == 'bigquery' else []),
     on_schema_change='fail'
 )}}
 
-WITH base_metrics AS (
-    SELECT 
-        ticker,
-        volume, 
-        open,
-        close,
-        yesterday_close,
-        high,
-        low,
-        trade_date,
-        sector,
-        company,
-        index_weight,
-        is_new_to_index,
-        is_valid_record,
-        {{ calculate_sma(20) }} as sma_20,
-        {{ calculate_sma(50) }} as sma_50,
-        {{ calculate_sma(200) }} as sma_200,
-        CASE
-            WHEN COUNT(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            ) >= 252
-            THEN MAX(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            )
-            ELSE NULL
-        END as high_52week,
-        CASE
-            WHEN COUNT(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            ) >= 252
-            THEN MIN(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 251 PRECEDING AND CURRENT ROW
-            )
-            ELSE NULL
-        END as low_52week,
-        CASE 
-            WHEN COUNT(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 13 PRECEDING AND CURRENT ROW
-            ) >= 14
-            THEN SUM(CASE WHEN close > yesterday_close THEN (close-yesterday_close) ELSE 0 END) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 13 PRECEDING AND CURRENT ROW
-            ) / 14
-            ELSE NULL
-        END AS avg_gain_14,
-        CASE 
-            WHEN COUNT(close) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 13 PRECEDING AND CURRENT ROW
-            ) >= 14
-            THEN SUM(CASE WHEN close < yesterday_close THEN (yesterday_close-close) ELSE 0 END) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 13 PRECEDING AND CURRENT ROW
-            ) / 14
-            ELSE NULL
-        END AS avg_loss_14
-    FROM {{ ref('int_russell3000__daily') }}
-),
-signal_flags AS (
-    SELECT
-        *,
-        CASE 
-            WHEN close > sma_20 AND LAG(close) OVER (
-                                        PARTITION BY ticker
-                                        ORDER BY trade_date
-                                    ) <= LAG(sma_20) OVER (
-                                        PARTITION BY ticker
-                                        ORDER BY trade_date
-                                    )
-            THEN 1
-            ELSE 0
-        END AS bullish_crossover,
-        CASE 
-            WHEN sma_50 > sma_200 AND LAG(sma_50) OVER (
-                                        PARTITION BY ticker
-                                        ORDER BY trade_date
-                                    ) <= LAG(sma_200) OVER (
-                                        PARTITION BY ticker
-                                        ORDER BY trade_date
-                                    )
-            THEN 1
-            ELSE 0
-        END AS golden_cross,
-        CASE
-            WHEN sma_50 < sma_200 AND LAG(sma_50) OVER (
-                                        PARTITION BY ticker
-                                        ORDER BY trade_date
-                                    ) >= LAG(sma_200) OVER (
-                                        PARTITION BY ticker
-                                        ORDER BY trade_date
-                                    )
-            THEN 1
-            ELSE 0
-        END AS death_cross,
-        CASE 
-            WHEN COUNT(volume) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW 
-                ) >= 20
-            THEN volume / (AVG(volume) OVER (
-                PARTITION BY ticker
-                ORDER BY trade_date
-                ROWS BETWEEN 19 PRECEDING AND CURRENT ROW
-                )) 
-            ELSE NULL
-        END AS rel_vol,
-        CASE 
-            WHEN (avg_gain_14 IS NOT NULL AND avg_gain_14 != 0) AND (avg_loss_14 IS NOT NULL AND avg_loss_14 != 0)
-            THEN 100 - (100 / (1 + (avg_gain_14 / avg_loss_14)))
-            ELSE NULL
-        END AS rsi 
-    FROM base_metrics
-)
-
-SELECT * 
-FROM signal_flags
+{#- Tickers restated upstream for new corporate actions are rebuilt over
+    their whole history. delete+insert does that by key here; on BigQuery
+    the restate_trading_momentum pre-hook merges their earlier rows, so
+    insert_overwrite only replaces the rebuild window's partitions. -#}
+{% set rebuild_start = none %}
+{% set restated = [] %}
 {% if is_incremental() %}
-    WHERE trade_date >= (SELECT DATE_SUB(MAX(trade_date), INTERVAL 4 DAY) FROM {{ this }})
-    AND is_valid_record = 1
+    {% set max_date = max_trade_date(this) %}
+    {% if max_date %}
+        {% set rebuild_start = max_date - modules.datetime.timedelta(days=rebuild_days) %}
+        {% set lookback_start = rebuild_start - modules.datetime.timedelta(days=lookback_days) %}
+    {% endif %}
+    {% if target.type != 'bigquery' %}
+        {% set restated = restated_tickers(ref('int_russell3000__daily'), 'adjusted_at', this) %}
+    {% endif %}
 {% endif %}
 
+{% set source_filter = none %}
+{% if rebuild_start %}
+    {% set source_filter = "trade_date >= DATE '" ~ lookback_start.strftime('%Y-%m-%d') ~ "'" %}
+    {% if restated %}
+        {% set source_filter = source_filter ~ " OR ticker IN ('" ~ restated | join("', '") ~ "')" %}
+    {% endif %}
+{% endif %}
+
+SELECT *
+FROM (
+    {{ trading_momentum_signals(source_filter) }}
+) as signals
+{% if rebuild_start %}
+    WHERE (trade_date >= DATE '{{ rebuild_start.strftime('%Y-%m-%d') }}'
+    {% if restated %}
+        OR ticker IN ('{{ restated | join("', '") }}')
+    {% endif %}
+    )
+    AND is_valid_record = 1
+{% endif %}
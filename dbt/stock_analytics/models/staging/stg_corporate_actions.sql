@@ -0,0 +1,22 @@
+-- Raw actions are appended every time the trailing window is re-read.
+-- Keep the first load of each distinct action so repeats never look new,
+-- and only the latest version of an action that was later corrected.
+WITH first_loads AS (
+    SELECT
+        ticker,
+        action_type,
+        ex_date,
+        split_from,
+        split_to,
+        cash_amount,
+        MIN(ingested_at) as ingested_at
+    FROM {{ source('raw_market', 'corporate_actions') }}
+    GROUP BY ticker, action_type, ex_date, split_from, split_to, cash_amount
+)
+
+SELECT *
+FROM first_loads
+QUALIFY ROW_NUMBER() OVER (
+    PARTITION BY ticker, action_type, ex_date
+    ORDER BY ingested_at DESC
+) = 1
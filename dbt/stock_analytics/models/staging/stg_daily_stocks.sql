@@ -1,6 +1,6 @@
 SELECT 
     T as ticker,
-    CAST(v AS INTEGER) as volume,
+    CAST(v AS BIGINT) as volume,
     vw as volume_weighted_avg,
     o as open,
     c as close,
@@ -2,4 +2,4 @@ SELECT
     *
 FROM {{ ref('agg_daily_market_breadth') }}
 WHERE (advances + declines + unchanged_stocks) != stocks_traded
-    AND trade_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
\ No newline at end of file
+    AND trade_date >= {{ date_sub_days('CURRENT_DATE', 7) }}
\ No newline at end of file
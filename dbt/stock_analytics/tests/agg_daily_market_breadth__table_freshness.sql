@@ -2,7 +2,7 @@ WITH dates as (
     SELECT 
         COUNT(trade_date) as recent_dates
         FROM {{ ref('agg_daily_market_breadth') }}
-    WHERE trade_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 4 DAY)
+    WHERE trade_date >= {{ date_sub_days('CURRENT_DATE', 4) }}
 )
 
 SELECT 
@@ -2,7 +2,7 @@ WITH dates as (
     SELECT 
         COUNT(latest_trade_date) as recent_dates
         FROM {{ ref('dim_securities_current') }}
-    WHERE latest_trade_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 4 DAY)
+    WHERE latest_trade_date >= {{ date_sub_days('CURRENT_DATE', 4) }}
 )
 
 SELECT 
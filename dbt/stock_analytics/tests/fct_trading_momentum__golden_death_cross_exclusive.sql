@@ -1,4 +1,4 @@
 SELECT *
 FROM {{ ref('fct_trading_momentum') }}
 WHERE golden_cross = 1 AND death_cross = 1
-    AND trade_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
\ No newline at end of file
+    AND trade_date >= {{ date_sub_days('CURRENT_DATE', 7) }}
\ No newline at end of file
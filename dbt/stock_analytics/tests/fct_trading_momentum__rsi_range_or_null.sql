@@ -3,4 +3,4 @@ FROM {{ ref('fct_trading_momentum') }}
 WHERE 
     rsi IS NOT NULL 
     AND (rsi < 0 OR rsi > 100)
-    AND trade_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
+    AND trade_date >= {{ date_sub_days('CURRENT_DATE', 7) }}
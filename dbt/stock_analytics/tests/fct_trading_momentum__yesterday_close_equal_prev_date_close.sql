@@ -15,4 +15,4 @@ FROM agg
 WHERE 
     yesterday_close IS NOT NULL AND
     yesterday_close != lag_close AND
-    trade_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
\ No newline at end of file
+    trade_date >= {{ date_sub_days('CURRENT_DATE', 7) }}
\ No newline at end of file
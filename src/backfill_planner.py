@@ -0,0 +1,123 @@
+# Compares the cached trading calendar with per-partition row counts of the
+# raw table and plans the smallest set of days to re-extract: missing
+# partitions, days whose rows disagree with their checkpoint, and days far
+# off the ticker counts of the surrounding trading days.
+import argparse
+import json
+
+import pandas as pd
+import pendulum
+from pendulum import duration
+from config import BACKFILL_BASELINE_DAYS, BACKFILL_SHORT_TOLERANCE
+from utils import get_trading_days
+from warehouse import get_warehouse_manager
+
+
+def find_gaps(start_date, end_date, outliers=False,
+              tolerance=BACKFILL_SHORT_TOLERANCE,
+              baseline_days=BACKFILL_BASELINE_DAYS):
+    '''One dict per bad trading day from `start_date` to `end_date`:
+    date, issue ('missing', 'short' or 'duplicate'), rows, expected and
+    refetch.
+
+    A partition is checked against the rows its completed checkpoint
+    loaded (one per ticker). Days without one are checked against the
+    median rows of the surrounding `baseline_days` trading days,
+    `tolerance` either way. outliers=True also flags checkpointed days
+    short of that baseline; they are left out by default as a half-day
+    session is legitimately thin.
+
+    refetch marks days whose landing file is suspect too, so it is
+    downloaded again rather than reloaded. Days checkpointed with zero
+    rows had no bars on Polygon and are skipped.
+    '''
+    days = pd.DatetimeIndex(get_trading_days(start_date, end_date))
+    stats = get_warehouse_manager().get_partition_stats()
+    stats.index = pd.DatetimeIndex(pd.to_datetime(stats['trade_date']))
+    stats = stats.reindex(days)
+    baseline = stats['row_count'].rolling(
+        baseline_days, center=True, min_periods=1).median()
+
+    gaps = []
+    for day, rows, loaded, median in zip(days, stats['row_count'],
+                                         stats['checkpoint_rows'], baseline):
+        has_checkpoint = not pd.isna(loaded)
+        if has_checkpoint and loaded == 0:
+            # Polygon had no bars for the day
+            continue
+        if pd.isna(rows) or rows == 0:
+            issue, expected, refetch = 'missing', \
+                loaded if has_checkpoint else median, False
+        elif has_checkpoint and rows != loaded:
+            # Rows were deleted or appended since the load; the landing
+            # file still holds the day as loaded
+            issue = 'duplicate' if rows > loaded else 'short'
+            expected, refetch = loaded, False
+        elif (outliers or not has_checkpoint) and \
+                rows < median * (1 - tolerance):
+            issue, expected, refetch = 'short', median, True
+        elif not has_checkpoint and rows > median * (1 + tolerance):
+            issue, expected, refetch = 'duplicate', median, False
+        else:
+            continue
+        gaps.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'issue': issue,
+            'rows': None if pd.isna(rows) else int(rows),
+            'expected': None if pd.isna(expected) else int(expected),
+            'refetch': refetch
+        })
+    return gaps
+
+
+def lookback_window(years_back=2, days_back_override=None):
+    '''(start_date, end_date) of the load window ending yesterday'''
+    end_date = pendulum.now().date() - duration(days=1)
+    if days_back_override:
+        start_date = end_date - duration(days=days_back_override)
+    else:
+        start_date = end_date - duration(years=years_back)
+    return start_date, end_date
+
+
+def print_gaps(gaps, limit=None):
+    counts = pd.Series([gap['issue'] for gap in gaps], dtype=object) \
+        .value_counts().to_dict()
+    print(f"Days to repair: {len(gaps)}" + (f" {counts}" if counts else ''))
+    for gap in gaps[:limit]:
+        print(f"  {gap['date']} {gap['issue']:<9} rows={gap['rows']} "
+              f"expected={gap['expected']}"
+              f"{' (refetch)' if gap['refetch'] else ''}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Find missing, short or duplicated days of raw data '
+                    'and plan (or run) their re-extraction')
+    parser.add_argument('--years-back', type=int, default=2)
+    parser.add_argument('--days-back', type=int,
+                        help='Window length in days instead of years')
+    parser.add_argument('--outliers', action='store_true',
+                        help='Also repair checkpointed days short of the '
+                             'surrounding days')
+    parser.add_argument('--output', help='Write the work list as JSON')
+    parser.add_argument('--run', action='store_true',
+                        help='Re-extract and load the planned days')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    gaps = find_gaps(*lookback_window(args.years_back, args.days_back),
+                     outliers=args.outliers)
+    print_gaps(gaps)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(gaps, f, indent=2)
+    if args.run and gaps:
+        from extract_load_polygon_data import extract_load_dates
+        failed_days = extract_load_dates(
+            [gap['date'] for gap in gaps],
+            refetch=[gap['date'] for gap in gaps if gap['refetch']])
+        if failed_days:
+            print(f"Failed to repair {failed_days}")
@@ -1,29 +1,126 @@
 from google.cloud import bigquery
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+import threading
+import time
+import uuid
 import pandas as pd
+import pyarrow.parquet as pq
 import pendulum
 from config import (
     BIGQUERY_DATASET,
     BIGQUERY_TABLE,
     CHECKPOINT_TABLE,
+    CORPORATE_ACTIONS_TABLE,
     GCP_PROJECT_ID,
+    BIGQUERY_HTTP_POOL_SIZE,
+    INTRADAY_BREADTH_TABLE,
+    METRICS_STATS_DAYS,
+    METRICS_TABLE,
+    QUERY_PROFILE_TABLE,
     credentials
 )
+from checkpoint_index import CheckpointIndex
+from landing_zone import (
+    landing_fetched_at,
+    landing_path,
+    to_parquet_buffer
+)
+from metrics import (
+    QUANTILES,
+    quantile_column,
+    registry,
+    summary_from_frame,
+    timed
+)
+from warehouse import WarehouseManager
+
+
+# BigQuery types of landing_zone.LANDING_SCHEMA, which landing files are
+# loaded into staging with
+LANDING_LOAD_SCHEMA = [
+    bigquery.SchemaField("T", "STRING"),
+    bigquery.SchemaField("v", "FLOAT"),
+    bigquery.SchemaField("vw", "FLOAT"),
+    bigquery.SchemaField("o", "FLOAT"),
+    bigquery.SchemaField("c", "FLOAT"),
+    bigquery.SchemaField("h", "FLOAT"),
+    bigquery.SchemaField("l", "FLOAT"),
+    bigquery.SchemaField("t", "INTEGER"),
+    bigquery.SchemaField("n", "INTEGER")
+]
+
+_client = None
+_manager = None
+_lock = threading.Lock()
+
+
+def get_client():
+    '''Return the process-wide BigQuery client, creating it on first use'''
+    global _client
+    with _lock:
+        if _client is None:
+            client_credentials = credentials
+            if client_credentials is None:
+                client_credentials, _ = google.auth.default(
+                    scopes=['https://www.googleapis.com/auth/bigquery']
+                )
+            # One pooled HTTP session shared by every thread and job
+            session = AuthorizedSession(client_credentials)
+            adapter = HTTPAdapter(pool_connections=BIGQUERY_HTTP_POOL_SIZE,
+                                  pool_maxsize=BIGQUERY_HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            _client = bigquery.Client(
+                project=GCP_PROJECT_ID,
+                credentials=client_credentials,
+                _http=session
+            )
+    return _client
+
 
+def get_bq_manager():
+    '''Return the process-wide BigQueryManager, creating it on first use'''
+    global _manager
+    with _lock:
+        if _manager is None:
+            _manager = BigQueryManager()
+    return _manager
 
-class BigQueryManager:
+
+class BigQueryManager(WarehouseManager):
     def __init__(self):
-        '''Initialize bigquery client and ensure tables exist'''
-        self.client = bigquery.Client(
-            project=GCP_PROJECT_ID,
-            credentials=credentials
-        )
+        '''Set up table ids; no network calls until first use'''
         self.dataset_id = f"{GCP_PROJECT_ID}.{BIGQUERY_DATASET}"
         self.table_id = f"{self.dataset_id}.{BIGQUERY_TABLE}"
         self.checkpoint_table_id = f"{self.dataset_id}.{CHECKPOINT_TABLE}"
+        self.checkpoint_view_id = f"{self.checkpoint_table_id}_latest"
+        self.corporate_actions_table_id = \
+            f"{self.dataset_id}.{CORPORATE_ACTIONS_TABLE}"
+        self.metrics_table_id = \
+            f"{self.dataset_id}.{METRICS_TABLE}" if METRICS_TABLE else None
+        self.query_profile_table_id = \
+            f"{self.dataset_id}.{QUERY_PROFILE_TABLE}"
+        self.intraday_breadth_table_id = \
+            f"{self.dataset_id}.{INTRADAY_BREADTH_TABLE}"
+        self.checkpoint_index = CheckpointIndex()
+        self._partition_counts = {}
+        self._ready = False
+        self._ready_lock = threading.Lock()
 
-        # Ensure that the dataset and tables exist with class methods
-        self._ensure_dataset_exists()
-        self._ensure_tables_exist()
+    @property
+    def client(self):
+        return get_client()
+
+    def _ensure_ready(self):
+        # Check (and create) the dataset and tables once per process
+        if self._ready:
+            return
+        with self._ready_lock:
+            if not self._ready:
+                self._ensure_dataset_exists()
+                self._ensure_tables_exist()
+                self._ready = True
 
     def _ensure_dataset_exists(self):
         # Create dataset if it doesn't exist
@@ -51,7 +148,7 @@ class BigQueryManager:
             bigquery.SchemaField("ts", "TIMESTAMP", description="Timestamp"),
             bigquery.SchemaField("n", "INTEGER", description="Number of transactions"),
             bigquery.SchemaField("date", "DATE", description="Trade date"),
-            bigquery.SchemaField("ingested_at", "TIMESTAMP", description="Time record was loaded")
+            bigquery.SchemaField("ingested_at", "TIMESTAMP", description="When the day was downloaded from Polygon")
         ]
 
         checkpoint_table_schema = [
@@ -62,7 +159,63 @@ class BigQueryManager:
             bigquery.SchemaField("rows_inserted", "INTEGER", description="Rows successfully inserted"),
             bigquery.SchemaField("started_at", "TIMESTAMP", description="When processing started"),
             bigquery.SchemaField("completed_at", "TIMESTAMP", description="When processing completed"),
-            bigquery.SchemaField("error_message", "STRING", description="Error details if failed")
+            bigquery.SchemaField("error_message", "STRING", description="Error details if failed"),
+            bigquery.SchemaField("recorded_at", "TIMESTAMP", description="When the checkpoint event was appended")
+        ]
+
+        corporate_actions_schema = [
+            bigquery.SchemaField("ticker", "STRING", description="Ticker symbol"),
+            bigquery.SchemaField("action_type", "STRING", description="Action: split or dividend"),
+            bigquery.SchemaField("ex_date", "DATE", description="First trade date the action applies to"),
+            bigquery.SchemaField("split_from", "FLOAT", description="Shares before a split"),
+            bigquery.SchemaField("split_to", "FLOAT", description="Shares after a split"),
+            bigquery.SchemaField("cash_amount", "FLOAT", description="Dividend cash amount per share"),
+            bigquery.SchemaField("ingested_at", "TIMESTAMP", description="Time record was loaded")
+        ]
+
+        metrics_schema = [
+            bigquery.SchemaField("run_id", "STRING", description="Run that recorded the span"),
+            bigquery.SchemaField("stage", "STRING", description="Pipeline stage, e.g. extract.request"),
+            bigquery.SchemaField("started_at", "TIMESTAMP", description="When the stage started"),
+            bigquery.SchemaField("duration_seconds", "FLOAT", description="Wall time of the stage"),
+            bigquery.SchemaField("row_count", "INTEGER", description="Rows handled, if any"),
+            bigquery.SchemaField("byte_count", "INTEGER", description="Bytes handled, if any"),
+            bigquery.SchemaField("success", "BOOLEAN", description="False if the stage failed"),
+            bigquery.SchemaField("labels", "STRING", description="Stage labels as JSON")
+        ]
+
+        intraday_breadth_schema = [
+            bigquery.SchemaField("trade_date", "DATE", description="Session the snapshot belongs to"),
+            bigquery.SchemaField("snapshot_at", "TIMESTAMP", description="When the snapshot was taken"),
+            bigquery.SchemaField("bar_end_at", "TIMESTAMP", description="End of the latest minute bar applied"),
+            bigquery.SchemaField("universe_size", "INTEGER", description="Tickers with reference levels"),
+            bigquery.SchemaField("stocks_traded", "INTEGER", description="Tickers with a bar so far today"),
+            bigquery.SchemaField("advances", "INTEGER", description="Tickers above the previous close"),
+            bigquery.SchemaField("declines", "INTEGER", description="Tickers below the previous close"),
+            bigquery.SchemaField("unchanged_stocks", "INTEGER", description="Tickers at (or without) a previous close"),
+            bigquery.SchemaField("up_volume", "FLOAT", description="Day volume of advancing tickers"),
+            bigquery.SchemaField("down_volume", "FLOAT", description="Day volume of declining tickers"),
+            bigquery.SchemaField("over_sma20", "INTEGER", description="Tickers above their live 20-day SMA"),
+            bigquery.SchemaField("over_sma50", "INTEGER", description="Tickers above their live 50-day SMA"),
+            bigquery.SchemaField("over_sma200", "INTEGER", description="Tickers above their live 200-day SMA"),
+            bigquery.SchemaField("events", "INTEGER", description="Minute bars applied since the previous snapshot")
+        ]
+
+        query_profile_schema = [
+            bigquery.SchemaField("run_id", "STRING", description="Profiler run"),
+            bigquery.SchemaField("profiled_at", "TIMESTAMP", description="When the query was profiled"),
+            bigquery.SchemaField("git_commit", "STRING", description="Commit of the profiled SQL"),
+            bigquery.SchemaField("backend", "STRING", description="Warehouse backend profiled"),
+            bigquery.SchemaField("kind", "STRING", description="model or dashboard"),
+            bigquery.SchemaField("name", "STRING", description="dbt model or dashboard query name"),
+            bigquery.SchemaField("sql_hash", "STRING", description="Hash of the profiled SQL"),
+            bigquery.SchemaField("executed", "BOOLEAN", description="False for a dry run"),
+            bigquery.SchemaField("bytes_processed", "INTEGER", description="Bytes the query processes"),
+            bigquery.SchemaField("rows_scanned", "INTEGER", description="Rows scanned, if reported"),
+            bigquery.SchemaField("slot_ms", "FLOAT", description="Slot milliseconds (CPU ms on DuckDB)"),
+            bigquery.SchemaField("partitions_processed", "INTEGER", description="Partitions read"),
+            bigquery.SchemaField("partitions_total", "INTEGER", description="Partitions of the tables read"),
+            bigquery.SchemaField("elapsed_ms", "FLOAT", description="Wall time of an executed query")
         ]
 
         self._create_table_if_not_exists(
@@ -72,16 +225,62 @@ class BigQueryManager:
             clustering_fields=["T"]
         )
 
+        # Checkpoints are an append-only event log; partitioning on the
+        # event time lets incremental reconciliation prune old events
         self._create_table_if_not_exists(
             self.checkpoint_table_id,
-            checkpoint_table_schema
+            checkpoint_table_schema,
+            partition_field="recorded_at"
+        )
+
+        # Append-only like the checkpoints; staging deduplicates re-reads
+        self._create_table_if_not_exists(
+            self.corporate_actions_table_id,
+            corporate_actions_schema,
+            clustering_fields=["ticker"]
+        )
+
+        if self.metrics_table_id:
+            self._create_table_if_not_exists(
+                self.metrics_table_id,
+                metrics_schema,
+                partition_field="started_at",
+                clustering_fields=["stage"]
+            )
+
+        # Streamed a row or two per second while the market is open; dbt's
+        # intraday view reads it directly, so it exists before any stream
+        self._create_table_if_not_exists(
+            self.intraday_breadth_table_id,
+            intraday_breadth_schema,
+            partition_field="trade_date"
+        )
+
+        # One row per query per profiler run (src/query_profiler.py)
+        self._create_table_if_not_exists(
+            self.query_profile_table_id,
+            query_profile_schema,
+            partition_field="profiled_at",
+            clustering_fields=["name"]
+        )
+
+        self._create_view_if_not_exists(
+            self.checkpoint_view_id,
+            f"""
+            SELECT *
+            FROM `{self.checkpoint_table_id}`
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY api_date
+                ORDER BY COALESCE(recorded_at, completed_at, started_at) DESC
+            ) = 1
+            """
         )
 
     def _create_table_if_not_exists(self, table_id, schema,
                                     partition_field=None,
                                     clustering_fields=None):
         try:
-            self.client.get_table(table_id)
+            table = self.client.get_table(table_id)
             print(f"Table {table_id} already exists")
         except Exception:
             table = bigquery.Table(table_id, schema=schema)
@@ -95,49 +294,304 @@ class BigQueryManager:
 
             table = self.client.create_table(table)
             print(f"Created table {table_id}")
+            return
 
-    def insert_stock_data(self, df, date_str):
-        '''Insert stock data to BigQuery'''
-        if df is None or df.empty:
-            return False, 0
+        # Additive migration for tables created by older versions
+        existing = {field.name for field in table.schema}
+        missing = [field for field in schema if field.name not in existing]
+        if missing:
+            table.schema = list(table.schema) + missing
+            self.client.update_table(table, ["schema"])
+            print(f"Added columns {[f.name for f in missing]} to {table_id}")
 
-        # Add metadata
-        df = df.rename(columns={
-            't': 'ts'
-        })
-        df['date'] = pd.to_datetime(date_str).date()
-        df['ingested_at'] = pendulum.now()
-
-        # Transform timestamp into proper form
-        if 'ts' in df.columns:
-            df['ts'] = pd.to_datetime(df['ts'], unit='ms')
-
-        job_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_APPEND",
-            schema_update_options=[
-                bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION
-            ]
+        partitioning = table.time_partitioning
+        if partition_field and (partitioning is None or
+                                partitioning.field != partition_field):
+            print(f"Table {table_id} is not partitioned on "
+                  f"{partition_field}; see src/repartition_checkpoints.py")
+
+    def _create_view_if_not_exists(self, view_id, query):
+        try:
+            self.client.get_table(view_id)
+            print(f"View {view_id} already exists")
+        except Exception:
+            view = bigquery.Table(view_id)
+            view.view_query = query
+            self.client.create_table(view)
+            print(f"Created view {view_id}")
+
+    def _partition_id(self, table_id, date_str):
+        # Partition decorator addressing a single day, e.g. table$20250918
+        return f"{table_id}${date_str.replace('-', '')}"
+
+    def _landing_rows(self, date_str):
+        # Row count from the Parquet footer; None if the day is not cached
+        path = landing_path(date_str)
+        if not path.exists():
+            return None
+        return pq.read_metadata(path).num_rows
+
+    def _replace_days(self, date_strs):
+        '''Replace the raw partitions of `date_strs` with their landing files
+
+        Each landing file is loaded unchanged into one partition of an
+        ingestion-time partitioned staging table, so the partition carries
+        the trade date the file itself does not. A single transactional
+        query then derives ts, date and ingested_at (the download time from
+        the file metadata) in SQL, deletes the days from the raw table and
+        inserts them from staging. Each date is replaced as a whole, so
+        re-runs never duplicate rows.
+
+        Returns the number of rows inserted; raises if any job fails.
+        '''
+        staging_id = f"{self.table_id}__staging_{uuid.uuid4().hex[:8]}"
+        staging = bigquery.Table(staging_id, schema=LANDING_LOAD_SCHEMA)
+        staging.time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY
+        )
+        load_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition="WRITE_TRUNCATE"
         )
+        replace_sql = f"""
+            BEGIN TRANSACTION;
+            DELETE FROM `{self.table_id}` WHERE date IN UNNEST(@dates);
+            INSERT INTO `{self.table_id}`
+                (T, v, vw, o, c, h, l, ts, n, date, ingested_at)
+            SELECT
+                s.T, s.v, s.vw, s.o, s.c, s.h, s.l,
+                TIMESTAMP_MILLIS(s.t), s.n, d.date, d.fetched_at
+            FROM `{staging_id}` as s
+            INNER JOIN UNNEST(@days) as d
+            ON DATE(s._PARTITIONTIME) = d.date;
+            COMMIT TRANSACTION;
+        """
+        days = [(pendulum.parse(d).date(),
+                 landing_fetched_at(landing_path(d))) for d in date_strs]
+        query_config = bigquery.QueryJobConfig(query_parameters=[
+            # Filtering on whole `date` partitions keeps the DELETE a
+            # metadata-only operation
+            bigquery.ArrayQueryParameter(
+                'dates', 'DATE', [date for date, _ in days]),
+            bigquery.ArrayQueryParameter('days', 'STRUCT', [
+                bigquery.StructQueryParameter(
+                    None,
+                    bigquery.ScalarQueryParameter('date', 'DATE', date),
+                    bigquery.ScalarQueryParameter(
+                        'fetched_at', 'TIMESTAMP', fetched_at))
+                for date, fetched_at in days
+            ])
+        ])
 
+        self.client.create_table(staging)
         try:
-            job = self.client.load_table_from_dataframe(
-                df,
-                self.table_id,
-                job_config=job_config
-            )
-            job.result()
+            with timed('load.job', days=len(date_strs)) as span:
+                jobs = []
+                for date_str in date_strs:
+                    with open(landing_path(date_str), 'rb') as landing_file:
+                        jobs.append(self.client.load_table_from_file(
+                            landing_file,
+                            self._partition_id(staging_id, date_str),
+                            job_config=load_config
+                        ))
+                for job in jobs:
+                    job.result()
+                span.rows = sum(job.output_rows for job in jobs)
+                span.bytes = sum(job.input_file_bytes for job in jobs)
+
+            with timed('load.replace', days=len(date_strs)) as span:
+                self.client.query(replace_sql,
+                                  job_config=query_config).result()
+                span.rows = sum(job.output_rows for job in jobs)
+            return span.rows
+        finally:
+            self.client.delete_table(staging_id, not_found_ok=True)
+
+    def insert_stock_data(self, date_str):
+        '''Load one day's landing Parquet file into its BigQuery partition
 
-            rows_inserted = len(df)
+        The day's partition is replaced, so re-running a day never appends
+        duplicates.
+        '''
+        self._ensure_ready()
+        if not self._landing_rows(date_str):
+            return False, 0
+
+        try:
+            rows_inserted = self._replace_days([date_str])
             print(f"Inserted {rows_inserted} rows for {date_str}")
             return True, rows_inserted
         except Exception as e:
             print(f"Failed to insert data for {date_str}: {e}")
             return False, 0
 
+    def insert_stock_data_batch(self, date_strs):
+        '''Load several landing days into BigQuery with one replace query
+
+        Returns {date_str: (success, rows_inserted)}. If the batch fails,
+        each day is retried on its own so the failure maps back to the
+        individual dates that caused it.
+        '''
+        self._ensure_ready()
+        results = {}
+        loadable = []
+        for date_str in date_strs:
+            rows = self._landing_rows(date_str)
+            if rows:
+                loadable.append((date_str, rows))
+            else:
+                results[date_str] = (False, 0)
+
+        if len(loadable) <= 1:
+            for date_str, _ in loadable:
+                results[date_str] = self.insert_stock_data(date_str)
+            return results
+
+        try:
+            rows_inserted = self._replace_days([d for d, _ in loadable])
+        except Exception as e:
+            print(f"Batch load of {len(loadable)} days failed: {e}. "
+                  f"Retrying days individually")
+            for date_str, _ in loadable:
+                results[date_str] = self.insert_stock_data(date_str)
+            return results
+
+        for date_str, rows in loadable:
+            results[date_str] = (True, rows)
+        print(f"Inserted {rows_inserted} rows for {len(loadable)} days")
+        return results
+
+    def insert_corporate_actions(self, table):
+        '''Append corporate actions with one Parquet load job (no DML)'''
+        self._ensure_ready()
+        job = self.client.load_table_from_file(
+            to_parquet_buffer(table),
+            self.corporate_actions_table_id,
+            job_config=bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition="WRITE_APPEND"
+            )
+        )
+        job.result()
+        print(f"Inserted {table.num_rows} corporate actions")
+        return table.num_rows
+
+    def insert_metrics(self, table):
+        '''Append metric spans with one Parquet load job (no DML)'''
+        self._ensure_ready()
+        job = self.client.load_table_from_file(
+            to_parquet_buffer(table),
+            self.metrics_table_id,
+            job_config=bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition="WRITE_APPEND"
+            )
+        )
+        job.result()
+
+    def insert_query_profiles(self, table):
+        '''Append query profiles with one Parquet load job (no DML)'''
+        self._ensure_ready()
+        job = self.client.load_table_from_file(
+            to_parquet_buffer(table),
+            self.query_profile_table_id,
+            job_config=bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition="WRITE_APPEND"
+            )
+        )
+        job.result()
+
+    def insert_intraday_breadth(self, table):
+        '''Append snapshots with a streaming insert.
+
+        Load jobs are limited to a few thousand per table per day, too few
+        for rows every half second, and take seconds to commit; streamed rows
+        are queryable as soon as the call returns.
+        '''
+        self._ensure_ready()
+        rows = [{name: value.isoformat() if hasattr(value, 'isoformat')
+                 else value for name, value in row.items()}
+                for row in table.to_pylist()]
+        errors = self.client.insert_rows_json(self.intraday_breadth_table_id,
+                                              rows)
+        if errors:
+            raise RuntimeError(f"Streaming insert into "
+                               f"{self.intraday_breadth_table_id} failed: "
+                               f"{errors[:3]}")
+
+    def _partitions_total(self, table_refs):
+        # Partition count of every partitioned table a query reads, cached
+        # for the process since one profiler run reads the same tables
+        # many times
+        total = None
+        for ref in table_refs:
+            key = f"{ref.project}.{ref.dataset_id}.{ref.table_id}"
+            if key not in self._partition_counts:
+                table = self.client.get_table(ref)
+                self._partition_counts[key] = \
+                    len(self.client.list_partitions(table)) \
+                    if table.time_partitioning or table.range_partitioning \
+                    else None
+            if self._partition_counts[key] is not None:
+                total = (total or 0) + self._partition_counts[key]
+        return total
+
+    def profile_query(self, sql, params=(), execute=False):
+        '''Dry run `sql` for the bytes it would process.
+
+        `params` are BigQuery query parameters. With execute=True the query
+        runs uncached and discards its result, adding slot-ms and elapsed
+        time, which dry runs do not report. The client library does not
+        expose partitions processed, so that stays None.
+        '''
+        job_config = bigquery.QueryJobConfig(
+            dry_run=not execute,
+            use_query_cache=False,
+            query_parameters=list(params)
+        )
+        started = time.perf_counter()
+        job = self.client.query(sql, job_config=job_config)
+        if execute:
+            job.result(max_results=0)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return {
+            'bytes_processed': job.total_bytes_processed,
+            'rows_scanned': None,
+            'slot_ms': float(job.slot_millis) if job.slot_millis else None,
+            'partitions_processed': None,
+            'partitions_total': self._partitions_total(job.referenced_tables),
+            'elapsed_ms': elapsed_ms if execute else None
+        }
+
+    def _append_checkpoints(self, rows):
+        '''Append checkpoint events with one load job (no DML)'''
+        self._ensure_ready()
+        recorded_at = pendulum.now('UTC')
+        for row in rows:
+            row['api_date'] = pendulum.parse(str(row['api_date'])).date()
+            row['recorded_at'] = recorded_at
+
+        with timed('checkpoint.write') as span:
+            job = self.client.load_table_from_dataframe(
+                pd.DataFrame(rows),
+                self.checkpoint_table_id,
+                job_config=bigquery.LoadJobConfig(
+                    write_disposition="WRITE_APPEND")
+            )
+            job.result()
+            span.rows = len(rows)
+            span.bytes = job.input_file_bytes
+
+        for row in rows:
+            self.checkpoint_index.apply(row['api_date'].strftime('%Y-%m-%d'),
+                                        row['status'], recorded_at)
+        self.checkpoint_index.save()
+
     def record_checkpoint(self, run_id, api_date, status, total_tickers=None,
                           rows_inserted=None, error_message=None):
         '''Record checkpoint information'''
-        checkpoint_data = [{
+        self._append_checkpoints([{
             'run_id': run_id,
             'api_date': api_date,
             'status': status,
@@ -147,76 +601,122 @@ class BigQueryManager:
             'completed_at': pendulum.now() if status in ['completed',
                                                          'failed'] else None,
             'error_message': error_message
-        }]
+        }])
+        print(f"Checkpoint recorded {api_date} - {status}")
 
-        df = pd.DataFrame(checkpoint_data)
+    def record_checkpoints(self, run_id, checkpoints):
+        '''Record final checkpoint rows for a batch with one load job
 
-        # For 'started' status we insert, else update
-        if status == 'started':
-            job = self.client.load_table_from_dataframe(
-                df,
-                self.checkpoint_table_id,
-                job_config=bigquery.LoadJobConfig(write_disposition="WRITE_APPEND")
-            )
+        Each checkpoint is a dict with api_date, status, total_tickers,
+        rows_inserted, started_at and error_message.
+        '''
+        if not checkpoints:
+            return
+
+        completed_at = pendulum.now()
+        self._append_checkpoints([{
+            'run_id': run_id,
+            'api_date': c['api_date'],
+            'status': c['status'],
+            'total_tickers': c.get('total_tickers'),
+            'rows_inserted': c.get('rows_inserted'),
+            'started_at': c.get('started_at'),
+            'completed_at': completed_at,
+            'error_message': c.get('error_message')
+        } for c in checkpoints])
+        print(f"Checkpoints recorded for {len(checkpoints)} dates")
+
+    def get_completed_dates(self):
+        '''Return completed dates from the local index, reconciled with
+        checkpoint events recorded in BigQuery since the last sync'''
+        index = self.checkpoint_index
+        if index.is_empty:
+            query = f"""
+            SELECT api_date, status, recorded_at
+            FROM `{self.checkpoint_view_id}`
+            """
+            job_config = None
         else:
-            # Update existing record
+            # Overlap the watermark so events whose load job committed
+            # after our last sync are not missed
             query = f"""
-            UPDATE `{self.checkpoint_table_id}`
-            SET status = @status,
-                total_tickers = @total_tickers,
-                rows_inserted = @rows_inserted,
-                completed_at = CURRENT_TIMESTAMP(),
-                error_message = @error_message\
-            WHERE run_id = @run_id AND api_date = @api_date
+            SELECT api_date, status, recorded_at
+            FROM `{self.checkpoint_table_id}`
+            WHERE recorded_at >= TIMESTAMP_SUB(@since, INTERVAL 1 HOUR)
+            ORDER BY recorded_at
             """
-
             job_config = bigquery.QueryJobConfig(
                 query_parameters=[
-                    bigquery.ScalarQueryParameter("status", "STRING", status),
-                    bigquery.ScalarQueryParameter("total_tickers", "INTEGER", total_tickers),
-                    bigquery.ScalarQueryParameter("rows_inserted", "INTEGER", rows_inserted),
-                    bigquery.ScalarQueryParameter("error_message", "STRING", error_message),
-                    bigquery.ScalarQueryParameter("run_id", "STRING", run_id),
-                    bigquery.ScalarQueryParameter("api_date", "DATE", api_date)
+                    bigquery.ScalarQueryParameter(
+                        "since", "TIMESTAMP", pendulum.parse(index.synced_at))
                 ]
             )
 
-            job = self.client.query(query, job_config=job_config)
+        try:
+            self._ensure_ready()
+            with timed('checkpoint.read', full=index.is_empty) as span:
+                synced_at = pendulum.now('UTC')
+                results = self.client.query(query,
+                                            job_config=job_config).result()
+                span.rows = 0
+                for row in results:
+                    index.apply(row.api_date.strftime('%Y-%m-%d'),
+                                row.status, row.recorded_at)
+                    span.rows += 1
+                index.synced_at = synced_at.to_iso8601_string()
+                index.save()
+        except Exception as e:
+            print(f"Error reading checkpoint table: {e}")
+            print("Using local checkpoint index only")
 
-        job.result()
-        print(f"Checkpoint recorded {api_date} - {status}")
+        completed_dates = index.completed_dates()
+        print(f"Found {len(completed_dates)} completed dates in checkpoint index")
+        return completed_dates
 
-    def get_completed_dates(self):
-        '''Query checkpoint table to get list of successfully completed dates'''
+    def get_partition_stats(self):
+        '''Row counts from INFORMATION_SCHEMA.PARTITIONS joined with the
+        completed checkpoints'''
+        self._ensure_ready()
         query = f"""
-        SELECT DISTINCT api_date
-        FROM `{self.checkpoint_table_id}`
-        WHERE status = 'completed'
-        ORDER BY api_date
-        """
+        WITH partitions AS (
+            SELECT
+                PARSE_DATE('%Y%m%d', partition_id) as trade_date,
+                total_rows as row_count
+            FROM `{self.dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+            WHERE table_name = '{BIGQUERY_TABLE}'
+            AND partition_id NOT IN ('__NULL__', '__UNPARTITIONED__')
+        ),
 
-        try:
-            results = self.client.query(query).result()
-            completed_dates = {row.api_date.strftime('%Y-%m-%d') for row in results}
-            print(f"Found {len(completed_dates)} completed dates in checkpoint table")
-            return completed_dates
-        except Exception as e:
-            print(f"Error reading checkpoint table: {e}")
-            print("Starting fresh with no completed dates")
-            return set()
+        checkpoints AS (
+            SELECT
+                api_date as trade_date,
+                COALESCE(rows_inserted, total_tickers) as checkpoint_rows
+            FROM `{self.checkpoint_view_id}`
+            WHERE status = 'completed'
+        )
+
+        SELECT trade_date, p.row_count, c.checkpoint_rows
+        FROM partitions as p
+        FULL OUTER JOIN checkpoints as c USING (trade_date)
+        ORDER BY trade_date
+        """
+        with timed('backfill.partition_stats') as span:
+            frame = self.client.query(query).to_dataframe()
+            span.rows = len(frame)
+        return frame
 
     def get_ingestion_stats(self):
         '''Get ingestion statistics for monitoring'''
+        self._ensure_ready()
         query = f"""
         SELECT
-            COUNT(DISTINCT api_date) as days_processed,
-            SUM(rows_inserted) as total_rows,
-            AVG(total_tickers) as avg_tickers_per_day,
-            MIN(api_date) as earliest_date,
-            MAX(api_date) as latest_date,
+            COUNTIF(status = 'completed') as days_processed,
+            SUM(IF(status = 'completed', rows_inserted, NULL)) as total_rows,
+            AVG(IF(status = 'completed', total_tickers, NULL)) as avg_tickers_per_day,
+            MIN(IF(status = 'completed', api_date, NULL)) as earliest_date,
+            MAX(IF(status = 'completed', api_date, NULL)) as latest_date,
             COUNTIF(status = 'failed') as failed_runs
-        FROM `{self.checkpoint_table_id}`
-        WHERE status = 'completed'
+        FROM `{self.checkpoint_view_id}`
         """
 
         try:
@@ -227,7 +727,48 @@ class BigQueryManager:
                 'avg_tickers_per_day': results.avg_tickers_per_day,
                 'earliest_date': results.earliest_date,
                 'latest_date': results.latest_date,
-                'failed_runs': results.failed_runs
+                'failed_runs': results.failed_runs,
+                'stages': self._get_stage_stats()
             }
         except Exception:
             return None
+
+    def _get_stage_stats(self, days=METRICS_STATS_DAYS):
+        if not self.metrics_table_id:
+            return registry.summary()
+        quantiles = ',\n'.join(
+            f"APPROX_QUANTILES(duration_seconds, 100)[OFFSET({int(q * 100)})]"
+            f" as {quantile_column(q)}" for q in QUANTILES)
+        query = f"""
+        SELECT
+            stage,
+            COUNT(*) as spans,
+            COUNTIF(NOT success) as errors,
+            SUM(duration_seconds) as total_seconds,
+            {quantiles},
+            MAX(duration_seconds) as max_seconds,
+            COALESCE(SUM(row_count), 0) as row_count,
+            COALESCE(SUM(byte_count), 0) as byte_count
+        FROM `{self.metrics_table_id}`
+        WHERE started_at >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @days DAY)
+        GROUP BY stage
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("days", "INT64", days)
+            ]
+        )
+        try:
+            return summary_from_frame(
+                self.client.query(query, job_config=job_config).to_dataframe())
+        except Exception as e:
+            print(f"Error reading metrics table: {e}")
+            return registry.summary()
+
+    def relation(self, dataset, table):
+        '''Fully qualified, quoted name of a table in this project'''
+        return f"`{GCP_PROJECT_ID}.{dataset}.{table}`"
+
+    def query(self, sql):
+        '''Run a query and return the result as a DataFrame'''
+        return self.client.query(sql).to_dataframe()
@@ -0,0 +1,59 @@
+import json
+import os
+from pathlib import Path
+
+import pendulum
+from config import CHECKPOINT_INDEX_PATH
+
+
+class CheckpointIndex:
+    def __init__(self, path=CHECKPOINT_INDEX_PATH):
+        '''Local cache of the latest checkpoint status per api_date'''
+        self.path = Path(path)
+        self.synced_at = None
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint index {self.path}: {e}")
+            return
+        self.synced_at = data.get('synced_at')
+        self.entries = data.get('entries', {})
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'synced_at': self.synced_at,
+                       'entries': self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def is_empty(self):
+        return self.synced_at is None
+
+    def apply(self, api_date, status, recorded_at):
+        '''Record a checkpoint event if it is newer than what we hold'''
+        if recorded_at:
+            recorded_at = pendulum.instance(recorded_at).in_tz('UTC')
+        current = self.entries.get(api_date)
+        # Compared as timestamps: the ISO strings drop zero microseconds,
+        # so they do not sort chronologically
+        if current and recorded_at and current['recorded_at'] and \
+                pendulum.parse(current['recorded_at']) > recorded_at:
+            return
+        self.entries[api_date] = {
+            'status': status,
+            'recorded_at':
+                recorded_at.to_iso8601_string() if recorded_at else None
+        }
+
+    def completed_dates(self):
+        return {d for d, e in self.entries.items()
+                if e['status'] == 'completed'}
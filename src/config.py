@@ -26,9 +26,113 @@ GCP_PROJECT_ID = get_config_value('GCP_PROJECT_ID')
 BIGQUERY_DATASET = get_config_value('BIGQUERY_DATASET')
 BIGQUERY_TABLE = get_config_value('BIGQUERY_TABLE')
 CHECKPOINT_TABLE = get_config_value('CHECKPOINT_TABLE')
+CORPORATE_ACTIONS_TABLE = get_config_value('CORPORATE_ACTIONS_TABLE',
+                                           'corporate_actions')
+
+# Warehouse backend for raw data and checkpoints: 'bigquery' or 'duckdb'
+WAREHOUSE_BACKEND = get_config_value('WAREHOUSE_BACKEND', 'bigquery')
+DUCKDB_PATH = get_config_value(
+    'DUCKDB_PATH', str(PROJECT_ROOT / 'data' / 'warehouse.duckdb'))
+DUCKDB_RAW_PATH = get_config_value(
+    'DUCKDB_RAW_PATH', str(PROJECT_ROOT / 'data' / 'raw'))
 
 POLYGON_API_KEY = get_config_value('POLYGON_API_KEY')
 API_BASE_URL = get_config_value('API_BASE_URL')
+REFERENCE_BASE_URL = get_config_value(
+    'REFERENCE_BASE_URL', 'https://api.polygon.io/v3/reference/')
+
+# Splits and dividends are re-read for this many trailing days each run;
+# repeats are deduplicated in staging
+CORPORATE_ACTIONS_DAYS_BACK = int(
+    get_config_value('CORPORATE_ACTIONS_DAYS_BACK', 7))
+
+# Polygon plan limits: free tier allows 5 requests/minute
+POLYGON_REQUESTS_PER_MINUTE = float(
+    get_config_value('POLYGON_REQUESTS_PER_MINUTE', 5))
+POLYGON_MAX_IN_FLIGHT = int(get_config_value('POLYGON_MAX_IN_FLIGHT', 1))
+POLYGON_MAX_RETRIES = int(get_config_value('POLYGON_MAX_RETRIES', 5))
+
+# Airflow fans extraction out across this many `polygon_api` pool slots;
+# each task gets an equal share of the plan's rate limit
+POLYGON_POOL_SLOTS = int(get_config_value('POLYGON_POOL_SLOTS', 1))
+if POLYGON_POOL_SLOTS < 1:
+    raise ValueError(
+        f"POLYGON_POOL_SLOTS must be at least 1, got {POLYGON_POOL_SLOTS}")
+EXTRACT_CHUNK_DAYS = int(get_config_value('EXTRACT_CHUNK_DAYS', 20))
+
+# Connection pool size of the shared BigQuery HTTP session
+BIGQUERY_HTTP_POOL_SIZE = int(get_config_value('BIGQUERY_HTTP_POOL_SIZE', 16))
+
+# Days are loaded to BigQuery in batches of up to N days or M rows
+LOAD_BATCH_DAYS = int(get_config_value('LOAD_BATCH_DAYS', 20))
+LOAD_BATCH_MAX_ROWS = int(get_config_value('LOAD_BATCH_MAX_ROWS', 250000))
+
+# Local cache of checkpoint statuses, reconciled with BigQuery incrementally
+CHECKPOINT_INDEX_PATH = get_config_value(
+    'CHECKPOINT_INDEX_PATH', str(PROJECT_ROOT / 'data' / 'checkpoint_index.json'))
+
+# Local (or mounted) Parquet landing zone for extracted grouped-daily files
+LANDING_ZONE_PATH = get_config_value(
+    'LANDING_ZONE_PATH', str(PROJECT_ROOT / 'data' / 'landing'))
+
+# iShares Russell 3000 holdings files and the SCD2 constituents seed
+# generated from them by russell_constituents.py
+HOLDINGS_PATH = get_config_value(
+    'HOLDINGS_PATH', str(PROJECT_ROOT / 'dbt' / 'stock_analytics' / 'holdings'))
+CONSTITUENTS_SEED_PATH = get_config_value(
+    'CONSTITUENTS_SEED_PATH',
+    str(PROJECT_ROOT / 'dbt' / 'stock_analytics' / 'seeds'
+        / 'russell3000_constituents.csv'))
+
+# Stage metrics: one JSON log line per span, a Prometheus textfile for the
+# node_exporter textfile collector, and an optional warehouse table
+METRICS_JSON_LOGS = get_config_value(
+    'METRICS_JSON_LOGS', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TEXTFILE_DIR = get_config_value(
+    'METRICS_TEXTFILE_DIR', str(PROJECT_ROOT / 'data' / 'metrics'))
+METRICS_TABLE = get_config_value('METRICS_TABLE')
+# Trailing days of the metrics table summarized by get_ingestion_stats
+METRICS_STATS_DAYS = int(get_config_value('METRICS_STATS_DAYS', 7))
+
+# Local cache of the NYSE calendar, refreshed when older than N days
+TRADING_CALENDAR_PATH = get_config_value(
+    'TRADING_CALENDAR_PATH', str(PROJECT_ROOT / 'data' / 'trading_calendar.json'))
+TRADING_CALENDAR_MAX_AGE_DAYS = int(
+    get_config_value('TRADING_CALENDAR_MAX_AGE_DAYS', 30))
+
+# backfill_planner.py: a day is short when its raw partition holds this
+# fraction fewer rows than the median of the surrounding trading days
+BACKFILL_SHORT_TOLERANCE = float(
+    get_config_value('BACKFILL_SHORT_TOLERANCE', 0.2))
+BACKFILL_BASELINE_DAYS = int(get_config_value('BACKFILL_BASELINE_DAYS', 21))
+
+# query_profiler.py: dbt project whose compiled models are profiled, the
+# history table (in BIGQUERY_DATASET) and the allowed growth in scanned
+# bytes (rows on DuckDB) over the median of the last runs
+DBT_PROJECT_DIR = get_config_value(
+    'DBT_PROJECT_DIR', str(PROJECT_ROOT / 'dbt' / 'stock_analytics'))
+QUERY_PROFILE_TABLE = get_config_value('QUERY_PROFILE_TABLE',
+                                       'query_profiles')
+QUERY_PROFILE_THRESHOLD = float(
+    get_config_value('QUERY_PROFILE_THRESHOLD', 0.2))
+QUERY_PROFILE_BASELINE_RUNS = int(
+    get_config_value('QUERY_PROFILE_BASELINE_RUNS', 5))
+
+# intraday_stream.py: Polygon websocket feed of minute aggregates, the
+# table (in BIGQUERY_DATASET) its breadth snapshots are written to, how
+# often a snapshot is taken and how many may wait for the warehouse before
+# the oldest are dropped
+POLYGON_STREAM_URL = get_config_value('POLYGON_STREAM_URL',
+                                      'wss://socket.polygon.io/stocks')
+INTRADAY_BREADTH_TABLE = get_config_value('INTRADAY_BREADTH_TABLE',
+                                          'intraday_breadth')
+INTRADAY_SNAPSHOT_SECONDS = float(
+    get_config_value('INTRADAY_SNAPSHOT_SECONDS', 0.5))
+INTRADAY_MAX_PENDING = int(get_config_value('INTRADAY_MAX_PENDING', 600))
+
+# Persisted per-ticker rolling state of the Python indicator engine
+INDICATOR_STATE_PATH = get_config_value(
+    'INDICATOR_STATE_PATH', str(PROJECT_ROOT / 'data' / 'indicator_state.npz'))
 
 if IS_AIRFLOW:
     credentials_path = get_config_value('GOOGLE_APPLICATION_CREDENTIALS')
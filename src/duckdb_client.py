@@ -0,0 +1,486 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import duckdb
+import pendulum
+import pyarrow.parquet as pq
+from config import (
+    BIGQUERY_DATASET,
+    BIGQUERY_TABLE,
+    CHECKPOINT_TABLE,
+    CORPORATE_ACTIONS_TABLE,
+    DUCKDB_PATH,
+    DUCKDB_RAW_PATH,
+    INTRADAY_BREADTH_TABLE,
+    METRICS_STATS_DAYS,
+    METRICS_TABLE,
+    QUERY_PROFILE_TABLE
+)
+from landing_zone import read_landing_table, to_load_table
+from metrics import (
+    QUANTILES,
+    quantile_column,
+    registry,
+    summary_from_frame,
+    timed
+)
+from warehouse import WarehouseManager
+
+
+# Query-level metrics and the per-operator details profile_query reads
+PROFILING_SETTINGS = {
+    setting: 'true' for setting in ['CPU_TIME', 'CUMULATIVE_ROWS_SCANNED',
+                                    'OPERATOR_TYPE', 'EXTRA_INFO']
+}
+
+_manager = None
+_lock = threading.Lock()
+
+
+def get_duckdb_manager():
+    '''Return the process-wide DuckDBManager, creating it on first use'''
+    global _manager
+    with _lock:
+        if _manager is None:
+            _manager = DuckDBManager()
+    return _manager
+
+
+class DuckDBManager(WarehouseManager):
+    def __init__(self, path=DUCKDB_PATH, raw_path=DUCKDB_RAW_PATH):
+        '''Local warehouse: raw data as date-partitioned Parquet files and
+        checkpoints in a DuckDB database file, both laid out under the same
+        schema/table names as BigQuery so the dbt project runs unchanged'''
+        self.path = path
+        self.raw_path = Path(raw_path) / BIGQUERY_TABLE
+        self.schema = BIGQUERY_DATASET
+        self.table_id = f"{self.schema}.{BIGQUERY_TABLE}"
+        self.checkpoint_table_id = f"{self.schema}.{CHECKPOINT_TABLE}"
+        self.checkpoint_view_id = f"{self.checkpoint_table_id}_latest"
+        self.corporate_actions_table_id = \
+            f"{self.schema}.{CORPORATE_ACTIONS_TABLE}"
+        self.metrics_table_id = \
+            f"{self.schema}.{METRICS_TABLE}" if METRICS_TABLE else None
+        self.query_profile_table_id = f"{self.schema}.{QUERY_PROFILE_TABLE}"
+        self.intraday_breadth_table_id = \
+            f"{self.schema}.{INTRADAY_BREADTH_TABLE}"
+        self._conn = None
+        self._write_lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = duckdb.connect(str(self.path))
+            self._ensure_tables_exist()
+        return self._conn
+
+    def _ensure_tables_exist(self):
+        self._conn.execute(f"CREATE SCHEMA IF NOT EXISTS {self.schema}")
+        self._conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self.checkpoint_table_id} (
+            run_id VARCHAR,
+            api_date DATE,
+            status VARCHAR,
+            total_tickers BIGINT,
+            rows_inserted BIGINT,
+            started_at TIMESTAMPTZ,
+            completed_at TIMESTAMPTZ,
+            error_message VARCHAR,
+            recorded_at TIMESTAMPTZ
+        )
+        """)
+        self._conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self.corporate_actions_table_id} (
+            ticker VARCHAR,
+            action_type VARCHAR,
+            ex_date DATE,
+            split_from DOUBLE,
+            split_to DOUBLE,
+            cash_amount DOUBLE,
+            ingested_at TIMESTAMPTZ
+        )
+        """)
+        self._conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self.query_profile_table_id} (
+            run_id VARCHAR,
+            profiled_at TIMESTAMPTZ,
+            git_commit VARCHAR,
+            backend VARCHAR,
+            kind VARCHAR,
+            name VARCHAR,
+            sql_hash VARCHAR,
+            executed BOOLEAN,
+            bytes_processed BIGINT,
+            rows_scanned BIGINT,
+            slot_ms DOUBLE,
+            partitions_processed BIGINT,
+            partitions_total BIGINT,
+            elapsed_ms DOUBLE
+        )
+        """)
+        self._conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self.intraday_breadth_table_id} (
+            trade_date DATE,
+            snapshot_at TIMESTAMPTZ,
+            bar_end_at TIMESTAMPTZ,
+            universe_size BIGINT,
+            stocks_traded BIGINT,
+            advances BIGINT,
+            declines BIGINT,
+            unchanged_stocks BIGINT,
+            up_volume DOUBLE,
+            down_volume DOUBLE,
+            over_sma20 BIGINT,
+            over_sma50 BIGINT,
+            over_sma200 BIGINT,
+            events BIGINT
+        )
+        """)
+        if self.metrics_table_id:
+            self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.metrics_table_id} (
+                run_id VARCHAR,
+                stage VARCHAR,
+                started_at TIMESTAMPTZ,
+                duration_seconds DOUBLE,
+                row_count BIGINT,
+                byte_count BIGINT,
+                success BOOLEAN,
+                labels VARCHAR
+            )
+            """)
+        self._conn.execute(f"""
+        CREATE OR REPLACE VIEW {self.checkpoint_view_id} AS
+        SELECT *
+        FROM {self.checkpoint_table_id}
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY api_date
+            ORDER BY COALESCE(recorded_at, completed_at, started_at) DESC
+        ) = 1
+        """)
+        self._refresh_raw_view()
+
+    def _refresh_raw_view(self):
+        # The raw table is a view over the hive-partitioned Parquet files;
+        # read_parquet fails on an empty glob, so wait for the first day
+        if not any(self.raw_path.glob('date=*/*.parquet')):
+            return
+        self.conn.execute(f"""
+        CREATE OR REPLACE VIEW {self.table_id} AS
+        SELECT T, v, vw, o, c, h, l, ts, n, date, ingested_at
+        FROM read_parquet(
+            '{self.raw_path.as_posix()}/date=*/*.parquet',
+            hive_partitioning = true,
+            hive_types = {{'date': DATE}}
+        )
+        """)
+
+    def _partition_path(self, date_str):
+        return self.raw_path / f"date={date_str}" / "part-0.parquet"
+
+    def insert_stock_data(self, date_str):
+        '''Replace one date partition with the day's landing data'''
+        table = read_landing_table(date_str)
+        if table is None or table.num_rows == 0:
+            return False, 0
+
+        # `date` comes from the partition directory, not the file
+        load_table = to_load_table(table, date_str).drop_columns(['date'])
+        path = self._partition_path(date_str)
+        try:
+            with timed('load.job', partitioned=True) as span:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix('.parquet.tmp')
+                pq.write_table(load_table, tmp_path, compression='zstd')
+                os.replace(tmp_path, path)
+                span.rows = load_table.num_rows
+                span.bytes = path.stat().st_size
+        except Exception as e:
+            print(f"Failed to insert data for {date_str}: {e}")
+            return False, 0
+
+        with self._write_lock:
+            self._refresh_raw_view()
+        print(f"Inserted {load_table.num_rows} rows for {date_str}")
+        return True, load_table.num_rows
+
+    def insert_stock_data_batch(self, date_strs):
+        '''Replace several date partitions; local writes have no per-job
+        overhead so each day is written as its own file'''
+        return {d: self.insert_stock_data(d) for d in date_strs}
+
+    def insert_corporate_actions(self, table):
+        '''Append corporate actions from an Arrow table'''
+        with self._write_lock:
+            self.conn.register('corporate_actions_batch', table)
+            try:
+                self.conn.execute(f"""
+                INSERT INTO {self.corporate_actions_table_id}
+                SELECT * FROM corporate_actions_batch
+                """)
+            finally:
+                self.conn.unregister('corporate_actions_batch')
+        print(f"Inserted {table.num_rows} corporate actions")
+        return table.num_rows
+
+    def insert_metrics(self, table):
+        '''Append metric spans from an Arrow table'''
+        with self._write_lock:
+            self.conn.register('metrics_batch', table)
+            try:
+                self.conn.execute(f"""
+                INSERT INTO {self.metrics_table_id}
+                SELECT * FROM metrics_batch
+                """)
+            finally:
+                self.conn.unregister('metrics_batch')
+
+    def insert_query_profiles(self, table):
+        '''Append query profiles from an Arrow table'''
+        with self._write_lock:
+            self.conn.register('query_profiles_batch', table)
+            try:
+                self.conn.execute(f"""
+                INSERT INTO {self.query_profile_table_id}
+                SELECT * FROM query_profiles_batch
+                """)
+            finally:
+                self.conn.unregister('query_profiles_batch')
+
+    def insert_intraday_breadth(self, table):
+        '''Append snapshots from an Arrow table'''
+        with self._write_lock:
+            self.conn.register('intraday_breadth_batch', table)
+            try:
+                self.conn.execute(f"""
+                INSERT INTO {self.intraday_breadth_table_id}
+                SELECT * FROM intraday_breadth_batch
+                """)
+            finally:
+                self.conn.unregister('intraday_breadth_batch')
+
+    def profile_query(self, sql, params=(), execute=False):
+        '''Run `sql` with JSON profiling for the rows it scans, the raw
+        Parquet files (one per date partition) it reads, CPU-ms and wall
+        time.
+
+        DuckDB has no dry run, so the query always runs (`execute` is
+        ignored) and its result is discarded. BigQuery
+        parameters are translated: @name becomes $name and
+        `IN UNNEST(@name)` a list subquery.
+        '''
+        if params:
+            sql = re.sub(r'UNNEST\(@(\w+)\)', r'(SELECT UNNEST($\1))', sql)
+            sql = re.sub(r'@(\w+)', r'$\1', sql)
+        values = {name: list(value) if isinstance(value, tuple) else value
+                  for name, value in params}
+
+        # A separate connection keeps profiling off the shared one
+        conn = self.conn.cursor()
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'profile.json'
+            try:
+                conn.execute("SET enable_profiling = 'json'")
+                conn.execute(f"SET profiling_output = '{output.as_posix()}'")
+                conn.execute("SET custom_profiling_settings = "
+                             f"'{json.dumps(PROFILING_SETTINGS)}'")
+                started = time.perf_counter()
+                conn.execute(sql, values or None).fetchall()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            finally:
+                conn.close()
+            # Nothing is written when statistics answer the query
+            # (e.g. MAX of a column) and no operator runs
+            profile = json.loads(output.read_text()) if output.exists() \
+                else {}
+
+        processed = total = None
+        nodes = list(profile.get('children', []))
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('children', []))
+            info = node.get('extra_info', {})
+            if 'Scanning Files' in info:
+                read, available = map(int, info['Scanning Files'].split('/'))
+            elif 'Total Files Read' in info:
+                # No file filter, so every file was read
+                read = available = int(info['Total Files Read'])
+            else:
+                continue
+            processed = (processed or 0) + read
+            total = (total or 0) + available
+        return {
+            'bytes_processed': None,
+            'rows_scanned': int(profile.get('cumulative_rows_scanned', 0)),
+            'slot_ms': profile.get('cpu_time', 0) * 1000,
+            'partitions_processed': processed,
+            'partitions_total': total,
+            'elapsed_ms': elapsed_ms
+        }
+
+    def _append_checkpoints(self, rows):
+        recorded_at = pendulum.now('UTC')
+        with self._write_lock, timed('checkpoint.write') as span:
+            span.rows = len(rows)
+            self.conn.executemany(
+                f"""
+                INSERT INTO {self.checkpoint_table_id}
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(
+                    row['run_id'],
+                    pendulum.parse(str(row['api_date'])).date(),
+                    row['status'],
+                    row.get('total_tickers'),
+                    row.get('rows_inserted'),
+                    row.get('started_at'),
+                    row.get('completed_at'),
+                    row.get('error_message'),
+                    recorded_at
+                ) for row in rows]
+            )
+
+    def record_checkpoint(self, run_id, api_date, status, total_tickers=None,
+                          rows_inserted=None, error_message=None):
+        '''Record checkpoint information'''
+        self._append_checkpoints([{
+            'run_id': run_id,
+            'api_date': api_date,
+            'status': status,
+            'total_tickers': total_tickers,
+            'rows_inserted': rows_inserted,
+            'started_at': pendulum.now() if status == 'started' else None,
+            'completed_at': pendulum.now() if status in ['completed',
+                                                         'failed'] else None,
+            'error_message': error_message
+        }])
+        print(f"Checkpoint recorded {api_date} - {status}")
+
+    def record_checkpoints(self, run_id, checkpoints):
+        '''Record final checkpoint rows for a batch'''
+        if not checkpoints:
+            return
+
+        completed_at = pendulum.now()
+        self._append_checkpoints([{
+            'run_id': run_id,
+            'api_date': c['api_date'],
+            'status': c['status'],
+            'total_tickers': c.get('total_tickers'),
+            'rows_inserted': c.get('rows_inserted'),
+            'started_at': c.get('started_at'),
+            'completed_at': completed_at,
+            'error_message': c.get('error_message')
+        } for c in checkpoints])
+        print(f"Checkpoints recorded for {len(checkpoints)} dates")
+
+    def get_completed_dates(self):
+        '''Dates whose latest checkpoint status is completed'''
+        with timed('checkpoint.read', full=True) as span:
+            rows = self.conn.execute(f"""
+            SELECT api_date
+            FROM {self.checkpoint_view_id}
+            WHERE status = 'completed'
+            """).fetchall()
+            span.rows = len(rows)
+        completed_dates = {row[0].strftime('%Y-%m-%d') for row in rows}
+        print(f"Found {len(completed_dates)} completed dates in checkpoint table")
+        return completed_dates
+
+    def get_partition_stats(self):
+        '''Row counts from the Parquet footers of each date partition
+        joined with the completed checkpoints'''
+        partitions = "SELECT NULL::DATE as trade_date, 0 as row_count " \
+            "WHERE false"
+        if any(self.raw_path.glob('date=*/*.parquet')):
+            partitions = f"""
+            SELECT
+                CAST(regexp_extract(file_name, 'date=([0-9-]+)/', 1) AS DATE)
+                    as trade_date,
+                SUM(num_rows) as row_count
+            FROM parquet_file_metadata(
+                '{self.raw_path.as_posix()}/date=*/*.parquet')
+            GROUP BY 1
+            """
+        query = f"""
+        WITH partitions AS ({partitions}),
+
+        checkpoints AS (
+            SELECT
+                api_date as trade_date,
+                COALESCE(rows_inserted, total_tickers) as checkpoint_rows
+            FROM {self.checkpoint_view_id}
+            WHERE status = 'completed'
+        )
+
+        SELECT trade_date, p.row_count, c.checkpoint_rows
+        FROM partitions as p
+        FULL OUTER JOIN checkpoints as c USING (trade_date)
+        ORDER BY trade_date
+        """
+        with timed('backfill.partition_stats') as span:
+            frame = self.conn.execute(query).df()
+            span.rows = len(frame)
+        return frame
+
+    def get_ingestion_stats(self):
+        '''Get ingestion statistics for monitoring'''
+        query = f"""
+        SELECT
+            count_if(status = 'completed') as days_processed,
+            SUM(IF(status = 'completed', rows_inserted, NULL)) as total_rows,
+            AVG(IF(status = 'completed', total_tickers, NULL)) as avg_tickers_per_day,
+            MIN(IF(status = 'completed', api_date, NULL)) as earliest_date,
+            MAX(IF(status = 'completed', api_date, NULL)) as latest_date,
+            count_if(status = 'failed') as failed_runs
+        FROM {self.checkpoint_view_id}
+        """
+
+        try:
+            cursor = self.conn.execute(query)
+            columns = [c[0] for c in cursor.description]
+            stats = dict(zip(columns, cursor.fetchone()))
+        except Exception:
+            return None
+        stats['stages'] = self._get_stage_stats()
+        return stats
+
+    def _get_stage_stats(self, days=METRICS_STATS_DAYS):
+        if not self.metrics_table_id:
+            return registry.summary()
+        quantiles = ',\n'.join(
+            f"quantile_cont(duration_seconds, {q}) as {quantile_column(q)}"
+            for q in QUANTILES)
+        query = f"""
+        SELECT
+            stage,
+            COUNT(*) as spans,
+            count_if(NOT success) as errors,
+            SUM(duration_seconds) as total_seconds,
+            {quantiles},
+            MAX(duration_seconds) as max_seconds,
+            COALESCE(SUM(row_count), 0) as row_count,
+            COALESCE(SUM(byte_count), 0) as byte_count
+        FROM {self.metrics_table_id}
+        WHERE started_at >= now() - INTERVAL (?) DAY
+        GROUP BY stage
+        """
+        try:
+            return summary_from_frame(self.conn.execute(query, [days]).df())
+        except Exception as e:
+            print(f"Error reading metrics table: {e}")
+            return registry.summary()
+
+    def relation(self, dataset, table):
+        '''Name of a table in the DuckDB file; datasets are schemas'''
+        return f"{dataset}.{table}"
+
+    def query(self, sql):
+        '''Run a query and return the result as a DataFrame'''
+        return self.conn.execute(sql).df()
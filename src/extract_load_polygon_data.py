@@ -1,55 +1,135 @@
 # Simple program to extract a preliminary time frame of market data
 from utils import get_trading_days, get_completed_dates
+from backfill_planner import find_gaps, lookback_window, print_gaps
 from extraction import extract_polygon_data
-from load import load_data
-import time
+from load import load_batch, record_empty_days
+import metrics
+from config import (
+    POLYGON_MAX_IN_FLIGHT,
+    LOAD_BATCH_DAYS,
+    LOAD_BATCH_MAX_ROWS
+)
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import pendulum
-from pendulum import duration
 
 
-def extract_load_data(years_back=2, days_back_override=None):
-    run_id = pendulum.now().strftime('%Y%m%d_%H%M%S')
-    print(f"Starting historical data load with run_id: {run_id}")
+# Work items listed per run; the rest are only counted
+PRINT_GAPS_LIMIT = 20
 
-    end_date = pendulum.now().date() - duration(days=1)
 
-    if days_back_override:
-        start_date = end_date - duration(days=days_back_override)
-    else:
-        start_date = end_date - duration(years=years_back)
-    completed_dates = get_completed_dates()
+def get_pending_days(years_back=2, days_back_override=None):
+    '''Work items (see backfill_planner.find_gaps) for the trading days in
+    the lookback window whose raw partition is missing, short or
+    duplicated.
+
+    Falls back to the days without a completed checkpoint when partition
+    metadata cannot be read.
+    '''
+    start_date, end_date = lookback_window(years_back, days_back_override)
     trading_days = get_trading_days(start_date, end_date)
-    total_days = len(trading_days)
-    remaining_days = len([d for d in trading_days if d.strftime('%Y-%m-%d')
-                          not in completed_dates])
+    try:
+        pending = find_gaps(start_date, end_date)
+    except Exception as e:
+        print(f"Error reading partition stats, using checkpoints: {e}")
+        completed_dates = get_completed_dates()
+        pending = [{'date': d.strftime('%Y-%m-%d'), 'issue': 'pending',
+                    'rows': None, 'expected': None, 'refetch': False}
+                   for d in trading_days
+                   if d.strftime('%Y-%m-%d') not in completed_dates]
+
+    print(f"Total trading days: {len(trading_days)}")
+    print(f"Already complete: {len(trading_days) - len(pending)}")
+    print_gaps(pending, limit=PRINT_GAPS_LIMIT)
+    return pending
+
+
+def extract_load_dates(pending_days, run_id=None, refetch=()):
+    '''Extract and load the given dates; return the dates that failed.
+
+    Dates in `refetch` are downloaded again even when the landing zone
+    has them.
+    '''
+    refetch = set(refetch)
+    run_id = run_id or pendulum.now().strftime('%Y%m%d_%H%M%S')
+    metrics.set_run_id(run_id)
+    remaining_days = len(pending_days)
+    failed_days = []
+    empty_days = []
+
+    # Fetches run on worker threads, paced by the shared rate limiter in
+    # extraction.py, while the main thread loads finished days in order.
+    # The window bounds how many fetched-but-unloaded days sit in memory.
+    workers = max(1, POLYGON_MAX_IN_FLIGHT)
+    batch, batch_rows = [], 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window = deque()
+        dates = iter(pending_days)
 
-    print(f"Total trading days: {total_days}")
-    print(f"Already completed: {len(completed_dates)}")
-    print(f"Remaining to process: {remaining_days}")
+        for date_str in dates:
+            window.append((date_str,
+                           executor.submit(extract_polygon_data, date_str,
+                                           date_str in refetch)))
+            if len(window) >= workers * 2:
+                break
 
-    for i, date in enumerate(trading_days, 1):
-        date_str = date.strftime('%Y-%m-%d')
-        if date_str in completed_dates:
-            print(f"Skipping {date_str} (already completed). "
-                  f"Progress: {i}/{total_days}")
-            continue
+        while window:
+            date_str, future = window.popleft()
+            next_date = next(dates, None)
+            if next_date:
+                window.append((next_date,
+                               executor.submit(extract_polygon_data,
+                                               next_date,
+                                               next_date in refetch)))
 
-        print(f"Processing {date_str}. Progress {i}/{total_days} "
-              f"(Remaining: {remaining_days})")
+            print(f"Processing {date_str} "
+                  f"(Remaining: {remaining_days})")
 
-        df = extract_polygon_data(date_str)
+            started_at = pendulum.now()
+            # Time the loader sits idle waiting on extraction
+            with metrics.timed('extract.wait'):
+                df = future.result()
+            remaining_days -= 1
 
-        load_data(df, date_str, run_id)
+            if df is None:
+                print(f"No data to save for {date_str}")
+                failed_days.append(date_str)
+                continue
+            if df.empty:
+                empty_days.append((date_str, started_at))
+                continue
 
-        time.sleep(20)
+            batch.append((date_str, df['T'].nunique(), started_at))
+            batch_rows += len(df)
+            del df
 
-        remaining_days -= 1
+            if len(batch) >= LOAD_BATCH_DAYS or \
+                    batch_rows >= LOAD_BATCH_MAX_ROWS:
+                failed_days += load_batch(batch, run_id)
+                batch, batch_rows = [], 0
+
+    failed_days += load_batch(batch, run_id)
+    record_empty_days(empty_days, run_id)
+    metrics.flush('extract_load')
+    return failed_days
+
+
+def extract_load_data(years_back=2, days_back_override=None):
+    run_id = pendulum.now().strftime('%Y%m%d_%H%M%S')
+    print(f"Starting historical data load with run_id: {run_id}")
+
+    pending = get_pending_days(years_back, days_back_override)
+    total_days = len(pending)
+    failed_days = extract_load_dates(
+        [item['date'] for item in pending], run_id,
+        refetch=[item['date'] for item in pending if item['refetch']])
+    if failed_days:
+        print(f"Failed to load {len(failed_days)} days: {failed_days}")
 
     print(f"Finished processing {total_days} trading days.")
 
-    from bigquery_client import BigQueryManager
-    bq_manager = BigQueryManager()
-    stats = bq_manager.get_ingestion_stats()
+    from warehouse import get_warehouse_manager
+    stats = get_warehouse_manager().get_ingestion_stats()
     if stats:
         print("\n=== Ingestion Summary ===")
         print(f"Days processed: {stats['days_processed']}")
@@ -57,6 +137,24 @@ def extract_load_data(years_back=2, days_back_override=None):
         print(f"Average tickers per day: {stats['avg_tickers_per_day']:,.0f}")
         print(f"Date range: {stats['earliest_date']} to "
               f"{stats['latest_date']}")
+        print_stage_stats(stats['stages'])
+
+
+def print_stage_stats(stages):
+    '''Per-stage timing table, slowest total first'''
+    if not stages:
+        return
+    print("\n=== Stage Timings ===")
+    print(f"{'stage':<26}{'count':>7}{'errors':>7}{'total s':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rows/s':>11}")
+    for stage, s in sorted(stages.items(),
+                           key=lambda item: -item[1]['total_seconds']):
+        rows_per_second = f"{s['rows_per_second']:,.0f}" \
+            if s['rows_per_second'] else '-'
+        print(f"{stage:<26}{s['count']:>7}{s['errors']:>7}"
+              f"{s['total_seconds']:>10.1f}{s['p50_seconds'] * 1000:>9.1f}"
+              f"{s['p95_seconds'] * 1000:>9.1f}{s['p99_seconds'] * 1000:>9.1f}"
+              f"{rows_per_second:>11}")
 
 
 if __name__ == "__main__":
@@ -1,45 +1,111 @@
 import requests
-import pandas as pd
 import time
 from requests import RequestException
-from config import POLYGON_API_KEY, API_BASE_URL
+from config import (
+    POLYGON_API_KEY,
+    API_BASE_URL,
+    POLYGON_REQUESTS_PER_MINUTE,
+    POLYGON_MAX_IN_FLIGHT,
+    POLYGON_MAX_RETRIES
+)
+from rate_limiter import TokenBucket, parse_retry_after, backoff_delay
+from landing_zone import LANDING_SCHEMA, read_landing_file, write_landing_file
+from metrics import increment, observe, timed
 
 
-def extract_polygon_data(date_str):
+rate_limiter = TokenBucket(
+    requests_per_minute=POLYGON_REQUESTS_PER_MINUTE,
+    max_in_flight=POLYGON_MAX_IN_FLIGHT
+)
+
+
+def share_rate_limit(pool_slots):
+    '''Pace this process at an equal share of the plan's rate limit, for
+    Airflow tasks running side by side in a pool of `pool_slots`'''
+    rate_limiter.set_rate(POLYGON_REQUESTS_PER_MINUTE / pool_slots)
+
+
+def _read_landing_frame(date_str, cached):
+    with timed('extract.dataframe', cached=cached) as span:
+        df = read_landing_file(date_str)
+        span.rows = None if df is None else len(df)
+    return df
+
+
+def extract_polygon_data(date_str, refresh=False):
+    if not refresh:
+        df = _read_landing_frame(date_str, cached=True)
+        if df is not None:
+            print(f"Read {date_str} from landing zone")
+            return df
+
     url = (API_BASE_URL + f"{date_str}")
     params = {'adjusted': 'true',
               'apiKey': POLYGON_API_KEY}
 
-    data = _make_request_with_retry(url, params=params)
+    data = make_request_with_retry(url, params=params)
 
-    if data is None or 'results' not in data:
+    if data is None:
         print(f"Data not downloaded for {date_str}")
         return None
+    if not data.get('results'):
+        # Polygon answered but has no bars, e.g. an unscheduled closure
+        print(f"No data from Polygon for {date_str}")
+        return LANDING_SCHEMA.empty_table().to_pandas()
 
-    df = pd.DataFrame(data['results'])
-    if df.empty:
-        print(f"Data not downloaded for {date_str}")
-        return None
+    with timed('extract.landing_write') as span:
+        path = write_landing_file(data['results'], date_str)
+        span.rows = len(data['results'])
+        span.bytes = path.stat().st_size
+    return _read_landing_frame(date_str, cached=False)
 
-    return df
+
+def make_request_with_retry(url, params, max_retries=POLYGON_MAX_RETRIES):
+    # extract.fetch covers retries and backoff; extract.request is one
+    # HTTP attempt and extract.rate_limit_wait the time queued for a token
+    with timed('extract.fetch') as span:
+        data, attempts = _request_with_retry(url, params, max_retries)
+        span.set(attempts=attempts)
+        span.success = data is not None
+        return data
 
 
-def _make_request_with_retry(url, params, max_retries=3):
+def _request_with_retry(url, params, max_retries):
     for attempt in range(max_retries):
         try:
-            res = requests.get(url, params=params, timeout=10)
+            queued_at = time.perf_counter()
+            with rate_limiter:
+                observe('extract.rate_limit_wait',
+                        time.perf_counter() - queued_at)
+                with timed('extract.request') as request:
+                    res = requests.get(url, params=params, timeout=10)
+                    request.set(status=res.status_code)
+                    request.bytes = len(res.content)
+                    request.success = res.status_code == 200
             if res.status_code == 200:
-                return res.json()
+                return res.json(), attempt + 1
             elif res.status_code == 429:
-                print("Rate limited. Waiting...")
-                time.sleep(60)
+                increment('polygon_retries', reason='rate_limited')
+                wait = parse_retry_after(res.headers.get('Retry-After'))
+                if wait is None:
+                    wait = backoff_delay(attempt, base=60 /
+                                         POLYGON_REQUESTS_PER_MINUTE)
+                print(f"Rate limited. Waiting {wait:.1f}s...")
+                # Pause every worker sharing the limiter, not just this one
+                rate_limiter.pause(wait)
             elif res.status_code >= 500:
-                print(f"Server error: {res.status_code}, retrying...")
-                time.sleep(5)
+                increment('polygon_retries', reason='server_error')
+                wait = backoff_delay(attempt)
+                print(f"Server error: {res.status_code}, retrying in "
+                      f"{wait:.1f}s...")
+                time.sleep(wait)
             else:
                 print(f"Client error: {res.status_code}. Not retrying.")
-                break
+                increment('polygon_client_errors', status=res.status_code)
+                return None, attempt + 1
         except RequestException as e:
+            increment('polygon_retries', reason='request_error')
+            wait = backoff_delay(attempt)
             print(f"Request failed: {e}, attempt {attempt + 1}")
-            time.sleep(5)
-    return None
+            time.sleep(wait)
+    return None, max_retries
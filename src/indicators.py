@@ -0,0 +1,339 @@
+# Incremental reference implementation of the fct_trading_momentum indicators
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pendulum
+import pyarrow as pa
+import pyarrow.compute as pc
+from config import INDICATOR_STATE_PATH
+from landing_zone import landing_path, read_landing_table
+
+
+# Longest window (52 weeks of trading days); every ring buffer row holds
+# this many closes so all shorter close windows are views into it
+WINDOW_52WEEK = 252
+SMA_PERIODS = (20, 50, 200)
+RSI_PERIOD = 14
+REL_VOL_PERIOD = 20
+
+# Columns compared against fct_trading_momentum by compare_with_mart
+INDICATOR_COLUMNS = [
+    'yesterday_close', 'sma_20', 'sma_50', 'sma_200', 'high_52week',
+    'low_52week', 'avg_gain_14', 'avg_loss_14', 'rsi', 'rel_vol',
+    'bullish_crossover', 'golden_cross', 'death_cross'
+]
+
+
+class IndicatorEngine:
+    def __init__(self, path=INDICATOR_STATE_PATH, capacity=4096):
+        '''Per-ticker rolling state for the momentum indicators.
+
+        Each ticker owns one row of fixed-size NumPy arrays, so feeding a
+        grouped-daily file is a handful of vectorized operations over the
+        tickers present that day regardless of how much history has been
+        seen. Windows count a ticker's own rows, as the SQL ROWS frames do.
+        '''
+        self.path = Path(path)
+        self.as_of = None
+        self.tickers = []
+        self.slots = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.count = np.zeros(capacity, np.int64)
+        self.close_ring = np.full((capacity, WINDOW_52WEEK), np.nan)
+        self.volume_ring = np.zeros((capacity, REL_VOL_PERIOD))
+        self.gain_ring = np.zeros((capacity, RSI_PERIOD))
+        self.loss_ring = np.zeros((capacity, RSI_PERIOD))
+        self.close_sums = np.zeros((len(SMA_PERIODS), capacity))
+        self.volume_sum = np.zeros(capacity)
+        self.gain_sum = np.zeros(capacity)
+        self.loss_sum = np.zeros(capacity)
+        self.high = np.full(capacity, np.nan)
+        self.low = np.full(capacity, np.nan)
+        self.prev_close = np.full(capacity, np.nan)
+        self.prev_sma = np.full((len(SMA_PERIODS), capacity), np.nan)
+
+    @staticmethod
+    def _state_arrays():
+        return ['count', 'close_ring', 'volume_ring', 'gain_ring',
+                'loss_ring', 'close_sums', 'volume_sum', 'gain_sum',
+                'loss_sum', 'high', 'low', 'prev_close', 'prev_sma']
+
+    def _ticker_rows(self, name, size):
+        # close_sums and prev_sma are (period, ticker); the rest are
+        # (ticker, ...)
+        values = getattr(self, name)
+        if name in ('close_sums', 'prev_sma'):
+            return values[:, :size]
+        return values[:size]
+
+    def _restore(self, arrays, size):
+        for name, values in arrays.items():
+            self._ticker_rows(name, size)[...] = values
+
+    def _grow(self, capacity):
+        size = len(self.tickers)
+        old = {name: self._ticker_rows(name, size).copy()
+               for name in self._state_arrays()}
+        self._allocate(capacity)
+        self._restore(old, size)
+
+    def _slots_for(self, tickers):
+        new = [t for t in dict.fromkeys(tickers) if t not in self.slots]
+        if new:
+            needed = len(self.tickers) + len(new)
+            if needed > len(self.count):
+                self._grow(max(needed, 2 * len(self.count)))
+            for ticker in new:
+                self.slots[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+        return np.fromiter((self.slots[t] for t in tickers), np.int64,
+                           len(tickers))
+
+    def update(self, date_str, tickers, close, volume):
+        '''Advance state by one trade date and return that day's indicators.
+
+        `tickers`, `close` and `volume` are aligned sequences for the
+        tickers that traded on `date_str`. Dates must arrive in order; a
+        date at or before the last one applied is rejected so replays
+        never double count.
+        '''
+        if self.as_of is not None and date_str <= self.as_of:
+            raise ValueError(f"{date_str} is not after state date {self.as_of}")
+
+        tickers = list(tickers)
+        s = self._slots_for(tickers)
+        close = np.asarray(close, np.float64)
+        volume = np.asarray(volume, np.float64)
+
+        k = self.count[s]
+        pos = k % WINDOW_52WEEK
+
+        # Running close sums: add today, drop the close leaving each window
+        for i, period in enumerate(SMA_PERIODS):
+            leaving = self.close_ring[s, (k - period) % WINDOW_52WEEK]
+            self.close_sums[i, s] += close - np.where(k >= period, leaving, 0)
+
+        # 52-week extremes: fold in today's close, and rescan only the rows
+        # whose current extreme is the close falling out of the window
+        expiring = np.where(k >= WINDOW_52WEEK, self.close_ring[s, pos], np.nan)
+        self.close_ring[s, pos] = close
+        high = np.fmax(self.high[s], close)
+        low = np.fmin(self.low[s], close)
+        rescan_high = expiring == self.high[s]
+        rescan_low = expiring == self.low[s]
+        high[rescan_high] = self.close_ring[s[rescan_high]].max(axis=1)
+        low[rescan_low] = self.close_ring[s[rescan_low]].min(axis=1)
+        self.high[s] = high
+        self.low[s] = low
+
+        # RSI gains/losses against the previous row; none on a first row
+        yesterday_close = self.prev_close[s]
+        with np.errstate(invalid='ignore'):
+            change = close - yesterday_close
+            gain = np.where(change > 0, change, 0.0)
+            loss = np.where(change < 0, -change, 0.0)
+        rsi_pos = k % RSI_PERIOD
+        self.gain_sum[s] += gain - self.gain_ring[s, rsi_pos]
+        self.loss_sum[s] += loss - self.loss_ring[s, rsi_pos]
+        self.gain_ring[s, rsi_pos] = gain
+        self.loss_ring[s, rsi_pos] = loss
+
+        vol_pos = k % REL_VOL_PERIOD
+        self.volume_sum[s] += volume - self.volume_ring[s, vol_pos]
+        self.volume_ring[s, vol_pos] = volume
+
+        n = k + 1
+        self.count[s] = n
+
+        sma = np.full((len(SMA_PERIODS), len(s)), np.nan)
+        for i, period in enumerate(SMA_PERIODS):
+            sma[i] = np.where(n >= period, self.close_sums[i, s] / period,
+                              np.nan)
+        sma_20, sma_50, sma_200 = sma
+        prev_sma_20, prev_sma_50, prev_sma_200 = self.prev_sma[:, s]
+
+        full_year = n >= WINDOW_52WEEK
+        avg_gain = np.where(n >= RSI_PERIOD, self.gain_sum[s] / RSI_PERIOD,
+                            np.nan)
+        avg_loss = np.where(n >= RSI_PERIOD, self.loss_sum[s] / RSI_PERIOD,
+                            np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            has_rsi = (avg_gain != 0) & (avg_loss != 0) & \
+                ~np.isnan(avg_gain) & ~np.isnan(avg_loss)
+            rsi = np.where(has_rsi, 100 - 100 / (1 + avg_gain / avg_loss),
+                           np.nan)
+            avg_volume = self.volume_sum[s] / REL_VOL_PERIOD
+            rel_vol = np.where((n >= REL_VOL_PERIOD) & (avg_volume != 0),
+                               volume / avg_volume, np.nan)
+
+            # NaN comparisons are False, matching the SQL's NULL -> 0 flags
+            bullish = (close > sma_20) & (yesterday_close <= prev_sma_20)
+            golden = (sma_50 > sma_200) & (prev_sma_50 <= prev_sma_200)
+            death = (sma_50 < sma_200) & (prev_sma_50 >= prev_sma_200)
+
+        self.prev_close[s] = close
+        self.prev_sma[:, s] = sma
+        self.as_of = date_str
+
+        return pd.DataFrame({
+            'ticker': tickers,
+            'trade_date': pendulum.parse(date_str).date(),
+            'close': close,
+            'volume': volume,
+            'yesterday_close': yesterday_close,
+            'sma_20': sma_20,
+            'sma_50': sma_50,
+            'sma_200': sma_200,
+            'high_52week': np.where(full_year, high, np.nan),
+            'low_52week': np.where(full_year, low, np.nan),
+            'avg_gain_14': avg_gain,
+            'avg_loss_14': avg_loss,
+            'rsi': rsi,
+            'rel_vol': rel_vol,
+            'bullish_crossover': bullish.astype(np.int64),
+            'golden_cross': golden.astype(np.int64),
+            'death_cross': death.astype(np.int64),
+        })
+
+    def update_from_landing(self, date_str, universe=None):
+        '''Advance state from one landing-zone file, optionally restricted
+        to a ticker universe (e.g. the Russell 3000 constituents)'''
+        table = read_landing_table(date_str)
+        if table is None:
+            raise FileNotFoundError(landing_path(date_str))
+        tickers = pc.cast(table.column('T'), pa.string())
+        if universe is not None:
+            keep = pc.is_in(tickers, value_set=pa.array(sorted(universe),
+                                                         pa.string()))
+            table = table.filter(keep)
+            tickers = tickers.filter(keep)
+        # Volume is cast to BIGINT in stg_daily_stocks before rel_vol
+        return self.update(date_str, tickers.to_pylist(),
+                           table.column('c').to_numpy(),
+                           np.trunc(table.column('v').to_numpy()))
+
+    def _resync_sums(self):
+        # Re-derive running sums from the rings so float drift never
+        # carries over between runs
+        size = len(self.tickers)
+        if size == 0:
+            return
+        k = self.count[:size]
+        for i, period in enumerate(SMA_PERIODS):
+            offsets = np.arange(period)
+            idx = (k[:, None] - 1 - offsets[None, :]) % WINDOW_52WEEK
+            values = np.take_along_axis(self.close_ring[:size], idx, axis=1)
+            values[offsets[None, :] >= k[:, None]] = 0
+            self.close_sums[i, :size] = values.sum(axis=1)
+        self.volume_sum[:size] = self.volume_ring[:size].sum(axis=1)
+        self.gain_sum[:size] = self.gain_ring[:size].sum(axis=1)
+        self.loss_sum[:size] = self.loss_ring[:size].sum(axis=1)
+
+    def save(self):
+        '''Persist state atomically as a compressed .npz file'''
+        self._resync_sums()
+        size = len(self.tickers)
+        arrays = {name: self._ticker_rows(name, size)
+                  for name in self._state_arrays()}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, as_of=np.array(self.as_of or ''),
+                                tickers=np.array(self.tickers, dtype=str),
+                                **arrays)
+        os.replace(tmp_path, self.path)
+
+    @classmethod
+    def load(cls, path=INDICATOR_STATE_PATH):
+        '''Load persisted state, or return an empty engine'''
+        engine = cls(path)
+        if not engine.path.exists():
+            return engine
+        with np.load(engine.path) as data:
+            tickers = data['tickers'].tolist()
+            engine._allocate(max(2 * len(tickers), 4096))
+            engine._restore({name: data[name]
+                             for name in cls._state_arrays()}, len(tickers))
+            engine.as_of = str(data['as_of']) or None
+        engine.tickers = tickers
+        engine.slots = {t: i for i, t in enumerate(tickers)}
+        return engine
+
+
+def pending_landing_dates(as_of=None):
+    '''Landing-zone dates after `as_of`, in order'''
+    root = landing_path('x').parent.parent
+    dates = sorted(p.name.split('=', 1)[1] for p in root.glob('date=*')
+                   if (p / 'part-0.parquet').exists())
+    return [d for d in dates if as_of is None or d > as_of]
+
+
+def load_universe(path):
+    '''Tickers from a Russell 3000 holdings file (the dbt holdings/ layout)'''
+    return set(pd.read_csv(path, usecols=['Ticker'],
+                           encoding='utf-8-sig')['Ticker'].dropna())
+
+
+def compare_with_mart(indicators, mart, rtol=1e-4, atol=1e-6):
+    '''Rows where the engine and fct_trading_momentum disagree.
+
+    Both frames are keyed by (ticker, trade_date); only keys present in
+    both are compared. NULLs must match NULLs.
+    '''
+    merged = indicators.merge(mart, on=['ticker', 'trade_date'],
+                              suffixes=('', '_mart'))
+    mismatched = pd.Series(False, index=merged.index)
+    for column in INDICATOR_COLUMNS:
+        ours = merged[column].astype(float).to_numpy()
+        theirs = merged[f"{column}_mart"].astype(float).to_numpy()
+        close = np.isclose(ours, theirs, rtol=rtol, atol=atol, equal_nan=True)
+        mismatched |= ~close
+    return merged[mismatched]
+
+
+def update_indicators(universe=None, path=INDICATOR_STATE_PATH):
+    '''Apply every landing file newer than the saved state; return the
+    latest day's indicators'''
+    engine = IndicatorEngine.load(path)
+    dates = pending_landing_dates(engine.as_of)
+    latest = None
+    for date_str in dates:
+        latest = engine.update_from_landing(date_str, universe)
+    if dates:
+        engine.save()
+    print(f"Applied {len(dates)} days; indicator state as of {engine.as_of} "
+          f"for {len(engine.tickers)} tickers")
+    return latest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Update persisted indicator state from the landing zone')
+    parser.add_argument('--universe',
+                        help='Russell 3000 holdings CSV to restrict tickers')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare the latest day with fct_trading_momentum')
+    args = parser.parse_args()
+
+    universe = load_universe(args.universe) if args.universe else None
+    latest = update_indicators(universe)
+
+    if args.check and latest is not None:
+        from warehouse import get_warehouse_manager
+        warehouse = get_warehouse_manager()
+        trade_date = latest['trade_date'].iloc[0]
+        mart = warehouse.query(f"""
+        SELECT ticker, trade_date, {', '.join(INDICATOR_COLUMNS)}
+        FROM {warehouse.relation('analytics', 'fct_trading_momentum')}
+        WHERE trade_date = '{trade_date}'
+        """)
+        mart['trade_date'] = pd.to_datetime(mart['trade_date']).dt.date
+        mismatches = compare_with_mart(latest, mart)
+        print(f"Compared {len(latest)} tickers on {trade_date}: "
+              f"{len(mismatches)} mismatches")
@@ -0,0 +1,652 @@
+# Streaming mode: minute aggregates from Polygon's websocket, or a replay
+# of a recorded session or a landing-zone day, keep advances/declines,
+# up/down volume and SMA breadth of the Russell universe current in memory.
+# A snapshot is taken every INTRADAY_SNAPSHOT_SECONDS and written to
+# INTRADAY_BREADTH_TABLE from a background thread.
+import argparse
+import collections
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pendulum
+import pyarrow as pa
+from config import (
+    INTRADAY_MAX_PENDING,
+    INTRADAY_SNAPSHOT_SECONDS,
+    POLYGON_API_KEY,
+    POLYGON_STREAM_URL
+)
+from indicators import SMA_PERIODS
+from landing_zone import read_landing_table
+from metrics import flush, increment, observe
+from warehouse import get_warehouse_manager
+
+
+INTRADAY_SCHEMA = pa.schema([
+    pa.field('trade_date', pa.date32()),
+    pa.field('snapshot_at', pa.timestamp('us', 'UTC')),
+    pa.field('bar_end_at', pa.timestamp('us', 'UTC')),
+    pa.field('universe_size', pa.int64()),
+    pa.field('stocks_traded', pa.int64()),
+    pa.field('advances', pa.int64()),
+    pa.field('declines', pa.int64()),
+    pa.field('unchanged_stocks', pa.int64()),
+    pa.field('up_volume', pa.float64()),
+    pa.field('down_volume', pa.float64()),
+    *[pa.field(f'over_sma{period}', pa.int64()) for period in SMA_PERIODS],
+    pa.field('events', pa.int64()),
+])
+
+# Each ticker's direction against its previous close
+NOT_TRADED, DECLINE, UNCHANGED, ADVANCE = range(4)
+
+MARKET_TZ = 'America/New_York'
+SESSION_MINUTES = 390
+# Calendar days of the momentum mart read for the reference levels: 200
+# trading days with room for holidays
+REFERENCE_DAYS = 400
+# The stream stops this long after the close, once the last bar is in
+CLOSE_GRACE_MINUTES = 5
+# Stream spans are aggregated and metrics flushed this often, so a
+# session records a few hundred spans rather than one per message
+METRICS_SECONDS = 60
+# Longest wait for a websocket message; idle feeds still snapshot and stop.
+# Well under the snapshot interval, so bars that end a burst are written
+# within about that interval rather than with the next message
+RECV_TIMEOUT_SECONDS = 0.1
+CONNECT_TIMEOUT_SECONDS = 10
+RECONNECT_SECONDS = 5
+WRITE_RETRY_SECONDS = 1
+
+
+def session_bounds(trade_date):
+    '''(open, close) of the regular session as UTC epoch milliseconds'''
+    session_open = pendulum.datetime(trade_date.year, trade_date.month,
+                                     trade_date.day, 9, 30, tz=MARKET_TZ)
+    close = session_open.add(minutes=SESSION_MINUTES)
+    return (int(session_open.timestamp() * 1000),
+            int(close.timestamp() * 1000))
+
+
+def reference_query(momentum_table, trade_date):
+    '''Previous close and SMA thresholds of every ticker in the last
+    momentum mart day before `trade_date`.
+
+    A live price is above the SMA-p that will include it exactly when it
+    is above the average of the p - 1 closes before it, so that average is
+    the threshold. Like the mart's SMA it is NULL until the ticker has
+    enough rows.
+    '''
+    start = trade_date.subtract(days=REFERENCE_DAYS)
+    thresholds = ','.join(f"""
+            CASE
+                WHEN COUNT(close) OVER (
+                    PARTITION BY ticker
+                    ORDER BY trade_date
+                    ROWS BETWEEN {period - 2} PRECEDING AND CURRENT ROW
+                ) >= {period - 1}
+                THEN AVG(close) OVER (
+                    PARTITION BY ticker
+                    ORDER BY trade_date
+                    ROWS BETWEEN {period - 2} PRECEDING AND CURRENT ROW
+                )
+            END as sma{period}_threshold""" for period in SMA_PERIODS)
+    return f"""
+    WITH history AS (
+        SELECT
+            ticker,
+            trade_date,
+            close,{thresholds}
+        FROM {momentum_table}
+        WHERE trade_date >= DATE '{start}'
+        AND trade_date < DATE '{trade_date}'
+    )
+
+    SELECT
+        ticker,
+        close as prev_close,
+        {', '.join(f'sma{period}_threshold' for period in SMA_PERIODS)}
+    FROM history
+    WHERE trade_date = (SELECT MAX(trade_date) FROM history)
+    ORDER BY ticker
+    """
+
+
+def load_reference(trade_date, warehouse=None):
+    '''Reference levels of the Russell universe for `trade_date`'''
+    warehouse = warehouse or get_warehouse_manager()
+    momentum_table = warehouse.relation('analytics', 'fct_trading_momentum')
+    reference = warehouse.query(reference_query(momentum_table, trade_date))
+    if reference.empty:
+        raise ValueError(f"No fct_trading_momentum rows before {trade_date}")
+    return reference
+
+
+def adjust_for_actions(reference, actions):
+    '''Scale the reference levels of tickers with a split or dividend in
+    `actions` (CORPORATE_ACTIONS_SCHEMA) by the price factors the marts
+    will apply once the action is loaded, so live prices are compared
+    with levels on the same basis'''
+    if actions is None or actions.num_rows == 0:
+        return reference
+    actions = actions.to_pandas()
+    reference = reference.set_index('ticker')
+    prev_close = reference['prev_close'].reindex(actions['ticker']).to_numpy()
+    factors = np.where(
+        actions['action_type'] == 'split',
+        actions['split_from'] / actions['split_to'],
+        1 - actions['cash_amount'].to_numpy() / prev_close)
+    # Unknown tickers and dividends at or above the close are not applied
+    factors = pd.Series(factors, index=actions['ticker'])
+    factors = factors[(factors > 0) & factors.index.isin(reference.index)]
+    factor = factors.groupby(level=0).prod().reindex(reference.index,
+                                                    fill_value=1.0)
+    columns = ['prev_close'] + [f'sma{period}_threshold'
+                                for period in SMA_PERIODS]
+    reference[columns] = reference[columns].astype(np.float64) \
+        .mul(factor, axis=0)
+    print(f"Adjusted reference levels of {int((factor != 1).sum())} tickers "
+          f"for corporate actions")
+    return reference.reset_index()
+
+
+class BreadthState:
+    def __init__(self, tickers, prev_close, thresholds):
+        '''Live breadth of a fixed universe.
+
+        Each ticker owns one slot of fixed-size arrays holding its day
+        volume, its direction against the previous close and whether it is
+        above each SMA. Applying bars subtracts those tickers' old
+        contributions from the running counts and adds the new ones, so an
+        update costs the size of the batch rather than the universe and
+        memory does not grow during the session.
+
+        `thresholds` is (ticker, period) as returned by reference_query.
+        '''
+        self.tickers = list(tickers)
+        self.slots = {ticker: i for i, ticker in enumerate(self.tickers)}
+        size = len(self.tickers)
+        self.prev_close = np.asarray(prev_close, np.float64)
+        self.thresholds = np.asarray(thresholds, np.float64).T.copy()
+        self.volume = np.zeros(size)
+        self.direction = np.full(size, NOT_TRADED, np.int8)
+        self.over = np.zeros((len(SMA_PERIODS), size), bool)
+        self.direction_counts = np.bincount(self.direction, minlength=4)
+        self.direction_volume = np.zeros(4)
+        self.over_counts = np.zeros(len(SMA_PERIODS), np.int64)
+        self.bar_end = None
+        self.events = 0
+
+    @classmethod
+    def from_reference(cls, reference):
+        columns = [f'sma{period}_threshold' for period in SMA_PERIODS]
+        # NULL levels arrive as None in object columns on some backends
+        return cls(reference['ticker'],
+                   reference['prev_close'].astype(np.float64),
+                   reference[columns].astype(np.float64).to_numpy())
+
+    def apply(self, bars):
+        '''Fold minute bars (Polygon AM events) into the counts.
+
+        Only each ticker's last bar in the batch matters: `c` is its latest
+        price and `av` its accumulated volume for the day. Bars of tickers
+        outside the universe are ignored. Returns the number applied.
+        '''
+        latest = {}
+        applied = 0
+        for bar in bars:
+            slot = self.slots.get(bar.get('sym'))
+            if slot is not None:
+                latest[slot] = bar
+                applied += 1
+        if not latest:
+            return 0
+
+        s = np.fromiter(latest, np.int64, len(latest))
+        price = np.fromiter((bar['c'] for bar in latest.values()),
+                            np.float64, len(latest))
+        volume = np.fromiter((bar['av'] for bar in latest.values()),
+                             np.float64, len(latest))
+        prev_close = self.prev_close[s]
+        # No previous close counts as unchanged, as in the daily mart
+        direction = np.full(len(s), UNCHANGED, np.int8)
+        direction[price > prev_close] = ADVANCE
+        direction[price < prev_close] = DECLINE
+        over = price > self.thresholds[:, s]
+
+        old_direction = self.direction[s]
+        self.direction_counts += np.bincount(direction, minlength=4) - \
+            np.bincount(old_direction, minlength=4)
+        self.direction_volume += np.bincount(direction, volume, 4) - \
+            np.bincount(old_direction, self.volume[s], 4)
+        self.over_counts += over.sum(axis=1) - self.over[:, s].sum(axis=1)
+        self.direction[s] = direction
+        self.volume[s] = volume
+        self.over[:, s] = over
+
+        bar_end = max(bar['e'] for bar in latest.values())
+        self.bar_end = max(bar_end, self.bar_end or bar_end)
+        self.events += applied
+        return applied
+
+    def snapshot(self, trade_date):
+        '''Current counts as one INTRADAY_SCHEMA row; starts a new count of
+        events'''
+        counts = self.direction_counts
+        row = {
+            'trade_date': trade_date,
+            'snapshot_at': pendulum.now('UTC'),
+            'bar_end_at': None if self.bar_end is None
+            else pendulum.from_timestamp(self.bar_end / 1000),
+            'universe_size': len(self.tickers),
+            'stocks_traded': int(len(self.tickers) - counts[NOT_TRADED]),
+            'advances': int(counts[ADVANCE]),
+            'declines': int(counts[DECLINE]),
+            'unchanged_stocks': int(counts[UNCHANGED]),
+            'up_volume': float(self.direction_volume[ADVANCE]),
+            'down_volume': float(self.direction_volume[DECLINE]),
+            **{f'over_sma{period}': int(count)
+               for period, count in zip(SMA_PERIODS, self.over_counts)},
+            'events': self.events
+        }
+        self.events = 0
+        return row
+
+
+class PolygonStreamFeed:
+    def __init__(self, tickers, url=POLYGON_STREAM_URL,
+                 api_key=POLYGON_API_KEY, record=None):
+        '''Polygon's stocks websocket subscribed to the minute aggregates
+        (AM) of `tickers`, yielding each message's bars.
+
+        An empty batch is yielded when nothing arrives for
+        RECV_TIMEOUT_SECONDS. A dropped connection is reopened; bars carry
+        the latest price and day volume, so the next bar of each ticker
+        repairs whatever was missed. `record` appends every message to a
+        JSONL file ReplayFeed.from_recording plays back.
+        '''
+        self.tickers = list(tickers)
+        self.url = url
+        self.api_key = api_key
+        self.record = record
+
+    def _expect(self, ws, status):
+        while True:
+            for event in json.loads(ws.recv()):
+                if event.get('ev') != 'status':
+                    continue
+                print(f"Stream status: {event.get('status')} "
+                      f"{event.get('message', '')}")
+                if event.get('status') == status:
+                    return
+                if event.get('status') == 'auth_failed':
+                    raise ValueError(f"Polygon stream: {event.get('message')}")
+
+    def _connect(self):
+        # websocket-client is only needed for live streams
+        import websocket
+
+        ws = websocket.create_connection(self.url,
+                                         timeout=CONNECT_TIMEOUT_SECONDS)
+        self._expect(ws, 'connected')
+        ws.send(json.dumps({'action': 'auth', 'params': self.api_key}))
+        self._expect(ws, 'auth_success')
+        ws.send(json.dumps({
+            'action': 'subscribe',
+            'params': ','.join(f'AM.{ticker}' for ticker in self.tickers)
+        }))
+        ws.settimeout(RECV_TIMEOUT_SECONDS)
+        return ws
+
+    def __iter__(self):
+        import websocket
+
+        record = open(self.record, 'a') if self.record else None
+        try:
+            while True:
+                try:
+                    ws = self._connect()
+                except (OSError, websocket.WebSocketException) as e:
+                    print(f"Failed to connect to {self.url}: {e}")
+                    increment('stream_reconnects')
+                    time.sleep(RECONNECT_SECONDS)
+                    yield []
+                    continue
+                try:
+                    while True:
+                        try:
+                            message = ws.recv()
+                        except websocket.WebSocketTimeoutException:
+                            yield []
+                            continue
+                        bars = [event for event in json.loads(message)
+                                if event.get('ev') == 'AM']
+                        if bars:
+                            if record:
+                                record.write(json.dumps(bars) + '\n')
+                            yield bars
+                except (OSError, websocket.WebSocketException) as e:
+                    print(f"Stream disconnected: {e}; reconnecting")
+                    increment('stream_reconnects')
+                finally:
+                    ws.close()
+        finally:
+            if record:
+                record.close()
+
+
+class ReplayFeed:
+    def __init__(self, messages, speed=60.0):
+        '''Local stand-in for the websocket: replays batches of AM bars,
+        `speed` times faster than their bar times (0 for no pauses)'''
+        self.messages = messages
+        self.speed = speed
+
+    @classmethod
+    def from_recording(cls, path, speed=60.0):
+        '''Replay a file written by PolygonStreamFeed(record=...)'''
+        def messages():
+            with open(path) as f:
+                for line in f:
+                    yield json.loads(line)
+        return cls(messages(), speed)
+
+    @classmethod
+    def from_landing(cls, date_str, tickers=None, speed=60.0, seed=0):
+        '''Minute bars synthesized from one landing-zone day.
+
+        Each ticker moves linearly from its open through its high and low,
+        in random order and at random minutes, to its close, and trades its
+        day volume in random minute lots. The last bar of each ticker thus
+        ends at the daily close and volume, so a replayed session finishes
+        on that day's daily breadth.
+        '''
+        table = read_landing_table(date_str)
+        if table is None:
+            raise ValueError(f"No landing file for {date_str}")
+        day = table.to_pandas()
+        day['T'] = day['T'].astype(str)
+        if tickers is not None:
+            day = day[day['T'].isin(set(tickers))]
+        day = day.dropna(subset=['o', 'h', 'l', 'c', 'v'])
+        return cls(_landing_messages(day, pendulum.parse(date_str), seed),
+                   speed)
+
+    def __iter__(self):
+        started = first_bar = None
+        for bars in self.messages:
+            if self.speed and bars:
+                bar_start = bars[0]['s']
+                if started is None:
+                    started, first_bar = time.monotonic(), bar_start
+                delay = (bar_start - first_bar) / 1000 / self.speed - \
+                    (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield bars
+
+
+def _landing_messages(day, trade_date, seed):
+    # One message of bars per minute; prices are (ticker, minute) arrays
+    rng = np.random.default_rng(seed)
+    count = len(day)
+    minutes = np.arange(SESSION_MINUTES)
+    first = rng.integers(1, SESSION_MINUTES - 2, count)
+    second = rng.integers(first + 1, SESSION_MINUTES - 1)
+    high_first = rng.random(count) < 0.5
+    high, low = day['h'].to_numpy(np.float64), day['l'].to_numpy(np.float64)
+    knots = np.column_stack([
+        np.zeros(count), first, second,
+        np.full(count, SESSION_MINUTES - 1)])
+    values = np.column_stack([
+        day['o'].to_numpy(np.float64),
+        np.where(high_first, high, low),
+        np.where(high_first, low, high),
+        day['c'].to_numpy(np.float64)])
+    price = np.empty((count, SESSION_MINUTES))
+    for i in range(3):
+        start, end = knots[:, [i]], knots[:, [i + 1]]
+        weight = (minutes - start) / (end - start)
+        segment = (minutes >= start) & (minutes <= end)
+        price[segment] = (values[:, [i]] + weight *
+                          (values[:, [i + 1]] - values[:, [i]]))[segment]
+    lots = rng.random((count, SESSION_MINUTES))
+    volume = day['v'].to_numpy(np.float64)
+    minute_volume = np.floor(lots / lots.sum(axis=1, keepdims=True) *
+                             volume[:, None])
+    minute_volume[:, -1] += volume - minute_volume.sum(axis=1)
+    day_volume = np.cumsum(minute_volume, axis=1)
+
+    tickers = day['T'].tolist()
+    session_open, _ = session_bounds(trade_date)
+    for minute in minutes:
+        bar_start = session_open + int(minute) * 60_000
+        yield [{
+            'ev': 'AM',
+            'sym': ticker,
+            'v': v,
+            'av': av,
+            'o': o,
+            'c': c,
+            'h': max(o, c),
+            'l': min(o, c),
+            's': bar_start,
+            'e': bar_start + 60_000
+        } for ticker, v, av, o, c in zip(
+            tickers,
+            minute_volume[:, minute].tolist(),
+            day_volume[:, minute].tolist(),
+            price[:, max(minute - 1, 0)].tolist(),
+            price[:, minute].tolist())]
+
+
+class SnapshotWriter:
+    def __init__(self, warehouse, max_pending=INTRADAY_MAX_PENDING):
+        '''Writes snapshots from a background thread so a slow warehouse
+        never holds up the feed.
+
+        Snapshots queued during a write go out together in the next one.
+        Past `max_pending` the oldest are dropped, since readers only need
+        the latest breadth.
+        '''
+        self.warehouse = warehouse
+        self.pending = collections.deque(maxlen=max_pending)
+        self.closed = False
+        self.write_seconds = 0.0
+        self.rows_written = 0
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run,
+                                        name='intraday-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, row):
+        with self._condition:
+            if len(self.pending) == self.pending.maxlen:
+                increment('stream_snapshots_dropped')
+            self.pending.append(row)
+            self._condition.notify()
+
+    def close(self):
+        '''Write what is pending and stop'''
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def take_stats(self):
+        '''(seconds spent writing, rows written) since the last call'''
+        with self._condition:
+            stats = (self.write_seconds, self.rows_written)
+            self.write_seconds, self.rows_written = 0.0, 0
+        return stats
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self.pending and not self.closed:
+                    self._condition.wait()
+                if not self.pending:
+                    return
+                rows = list(self.pending)
+                self.pending.clear()
+
+            started = time.perf_counter()
+            try:
+                self.warehouse.insert_intraday_breadth(
+                    pa.Table.from_pylist(rows, schema=INTRADAY_SCHEMA))
+            except Exception as e:
+                print(f"Failed to write {len(rows)} intraday snapshots: {e}")
+                increment('stream_write_errors')
+                with self._condition:
+                    if self.closed:
+                        return
+                    # Retry with anything queued since, newest kept
+                    retry = (rows + list(self.pending))[-self.pending.maxlen:]
+                    self.pending.clear()
+                    self.pending.extend(retry)
+                    self._condition.wait(WRITE_RETRY_SECONDS)
+                continue
+            with self._condition:
+                self.write_seconds += time.perf_counter() - started
+                self.rows_written += len(rows)
+
+
+def run_stream(feed, state, trade_date, warehouse=None,
+               snapshot_seconds=INTRADAY_SNAPSHOT_SECONDS, until=None):
+    '''Apply `feed` to `state`, writing a snapshot every `snapshot_seconds`
+    that saw new bars, until the feed ends or `until` passes.
+
+    Bars outside the regular session are skipped. Returns the last
+    snapshot.
+    '''
+    session_open, session_close = session_bounds(trade_date)
+    writer = SnapshotWriter(warehouse or get_warehouse_manager())
+    writer.start()
+    snapshot = None
+    last_snapshot = last_metrics = time.monotonic()
+    apply_seconds, applied = 0.0, 0
+    try:
+        for bars in feed:
+            started = time.perf_counter()
+            applied += state.apply([
+                bar for bar in bars
+                if session_open <= bar['s'] < session_close])
+            apply_seconds += time.perf_counter() - started
+
+            now = time.monotonic()
+            if state.events and now - last_snapshot >= snapshot_seconds:
+                snapshot = state.snapshot(trade_date)
+                writer.put(snapshot)
+                last_snapshot = now
+            if now - last_metrics >= METRICS_SECONDS:
+                observe('stream.apply', apply_seconds, rows=applied)
+                observe('stream.write', *writer.take_stats())
+                flush('intraday_stream')
+                apply_seconds, applied = 0.0, 0
+                last_metrics = now
+            if until and pendulum.now('UTC') >= until:
+                break
+    finally:
+        if state.events:
+            snapshot = state.snapshot(trade_date)
+            writer.put(snapshot)
+        writer.close()
+        observe('stream.apply', apply_seconds, rows=applied)
+        observe('stream.write', *writer.take_stats())
+        flush('intraday_stream')
+    return snapshot
+
+
+def run_live(trade_date=None, record=None):
+    '''Stream today's session from Polygon until shortly after the close'''
+    from corporate_actions import extract_corporate_actions
+
+    trade_date = trade_date or pendulum.today(MARKET_TZ).date()
+    # The daily DAG loads today's actions only after the open
+    actions = extract_corporate_actions(str(trade_date), str(trade_date))
+    if actions is None:
+        print("Reference levels are not adjusted for today's corporate "
+              "actions")
+    state = BreadthState.from_reference(
+        adjust_for_actions(load_reference(trade_date), actions))
+    _, session_close = session_bounds(trade_date)
+    until = pendulum.from_timestamp(session_close / 1000) \
+        .add(minutes=CLOSE_GRACE_MINUTES)
+    print(f"Streaming {len(state.tickers)} tickers for {trade_date} "
+          f"until {until.in_timezone(MARKET_TZ).to_time_string()} ET")
+    return run_stream(PolygonStreamFeed(state.tickers, record=record),
+                      state, trade_date, until=until)
+
+
+def compare_with_daily(snapshot, warehouse=None):
+    '''Print the final snapshot next to the day's agg_daily_market_breadth
+    row, which a replayed landing day should match'''
+    warehouse = warehouse or get_warehouse_manager()
+    breadth_table = warehouse.relation('analytics', 'agg_daily_market_breadth')
+    daily = warehouse.query(f"""
+    SELECT *
+    FROM {breadth_table}
+    WHERE trade_date = DATE '{snapshot['trade_date']}'
+    """)
+    if daily.empty:
+        print(f"No daily breadth for {snapshot['trade_date']}")
+        return
+    daily = daily.iloc[0]
+    columns = ['stocks_traded', 'advances', 'declines', 'unchanged_stocks',
+               'up_volume', 'down_volume']
+    print(f"{'':<18} {'stream':>16} {'daily':>16}")
+    for column in columns:
+        print(f"{column:<18} {snapshot[column]:>16,.0f} "
+              f"{daily[column]:>16,.0f}")
+    for period in SMA_PERIODS:
+        column = f'pct_market_over_sma{period}'
+        live = snapshot[f'over_sma{period}'] / snapshot['stocks_traded']
+        print(f"{column:<18} {live:>16.4f} {daily[column]:>16.4f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Stream minute aggregates into live market breadth')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--replay', help='Replay a recorded JSONL session')
+    source.add_argument('--replay-date',
+                        help='Replay minute bars synthesized from this '
+                             'landing-zone day (YYYY-MM-DD)')
+    parser.add_argument('--speed', type=float, default=60.0,
+                        help='Replay speed over real time; 0 for no pauses')
+    parser.add_argument('--record', help='Append live messages to this file')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare the final snapshot with the daily '
+                             'breadth mart')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.replay or args.replay_date:
+        if args.replay:
+            with open(args.replay) as f:
+                first_bar = json.loads(f.readline())[0]
+            trade_date = pendulum.from_timestamp(
+                first_bar['s'] / 1000, MARKET_TZ).date()
+        else:
+            trade_date = pendulum.parse(args.replay_date).date()
+        state = BreadthState.from_reference(load_reference(trade_date))
+        feed = ReplayFeed.from_recording(args.replay, args.speed) \
+            if args.replay else ReplayFeed.from_landing(
+                args.replay_date, state.tickers, args.speed)
+        started = time.perf_counter()
+        snapshot = run_stream(feed, state, trade_date)
+        print(f"Replayed {trade_date} in "
+              f"{time.perf_counter() - started:.1f}s")
+    else:
+        snapshot = run_live(record=args.record)
+    if snapshot:
+        print(json.dumps(snapshot, default=str, indent=2))
+        if args.check:
+            compare_with_daily(snapshot)
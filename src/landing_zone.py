@@ -0,0 +1,130 @@
+import io
+import os
+from pathlib import Path
+
+import pendulum
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from config import LANDING_ZONE_PATH
+
+
+# Typed schema for the grouped-daily aggregates response. Prices fit in
+# float32, tickers repeat across days so they are dictionary encoded, and
+# `t` stays as the raw epoch milliseconds returned by Polygon.
+LANDING_SCHEMA = pa.schema([
+    pa.field('T', pa.dictionary(pa.int32(), pa.string())),
+    pa.field('v', pa.float64()),
+    pa.field('vw', pa.float32()),
+    pa.field('o', pa.float32()),
+    pa.field('c', pa.float32()),
+    pa.field('h', pa.float32()),
+    pa.field('l', pa.float32()),
+    pa.field('t', pa.int64()),
+    pa.field('n', pa.int64()),
+])
+
+# File metadata key holding when the day was downloaded from Polygon
+FETCHED_AT_KEY = b'fetched_at'
+
+
+def landing_path(date_str):
+    '''Path of the landing file for one trade date'''
+    return Path(LANDING_ZONE_PATH) / f"date={date_str}" / "part-0.parquet"
+
+
+def landing_file_exists(date_str):
+    return landing_path(date_str).exists()
+
+
+def write_landing_file(results, date_str, fetched_at=None):
+    '''Write grouped-daily `results` records to the landing zone
+
+    The download time (`fetched_at`, default now) is kept in the file's
+    metadata and loaded as the rows' ingested_at: split adjustments
+    depend on when Polygon served the prices, not when they were loaded.
+    '''
+    fetched_at = fetched_at or pendulum.now('UTC')
+    columns = {
+        field.name: [row.get(field.name) for row in results]
+        for field in LANDING_SCHEMA
+    }
+    columns['T'] = pa.array(columns['T'], pa.string()).dictionary_encode()
+    table = pa.Table.from_pydict(columns, schema=LANDING_SCHEMA)
+    table = table.replace_schema_metadata(
+        {FETCHED_AT_KEY: fetched_at.isoformat().encode()})
+
+    path = landing_path(date_str)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write to a temp file and rename so a crash never leaves a partial day
+    tmp_path = path.with_suffix('.parquet.tmp')
+    pq.write_table(table, tmp_path, compression='zstd',
+                   use_dictionary=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_landing_table(date_str):
+    '''Read one landing day as an Arrow table, or None if not cached'''
+    path = landing_path(date_str)
+    if not path.exists():
+        return None
+    table = pq.read_table(path, schema=LANDING_SCHEMA)
+    return table.replace_schema_metadata(
+        {FETCHED_AT_KEY: landing_fetched_at(path).isoformat().encode()})
+
+
+def landing_fetched_at(path):
+    '''When the landing file at `path` was downloaded.
+
+    Files written before the download time was recorded fall back to
+    their modification time, which is when they were written.
+    '''
+    metadata = pq.read_schema(path).metadata or {}
+    if FETCHED_AT_KEY in metadata:
+        return pendulum.parse(metadata[FETCHED_AT_KEY].decode())
+    return pendulum.from_timestamp(path.stat().st_mtime, 'UTC')
+
+
+def read_landing_file(date_str):
+    '''Read one landing day as a DataFrame, or None if not cached'''
+    table = read_landing_table(date_str)
+    if table is None:
+        return None
+    return table.to_pandas()
+
+
+def to_load_table(table, date_str):
+    '''Shape a landing table into the raw `daily_stocks` table schema.
+
+    Used by the DuckDB backend, which writes the raw files itself;
+    BigQuery loads landing files unchanged and derives these columns in
+    SQL.
+    '''
+    metadata = table.schema.metadata or {}
+    ingested_at = pendulum.parse(metadata[FETCHED_AT_KEY].decode()) \
+        if FETCHED_AT_KEY in metadata else pendulum.now('UTC')
+    ts = table.column('t').cast(pa.timestamp('ms', 'UTC'))
+    table = table.drop_columns(['t']).append_column('ts', ts)
+    table = table.set_column(
+        table.schema.get_field_index('T'), 'T',
+        pc.cast(table.column('T'), pa.string())
+    )
+    num_rows = table.num_rows
+    trade_date = pendulum.parse(date_str).date()
+    table = table.append_column(
+        'date', pa.array([trade_date] * num_rows, pa.date32()))
+    table = table.append_column(
+        'ingested_at',
+        pa.array([ingested_at] * num_rows, pa.timestamp('us', 'UTC'))
+    )
+    return table
+
+
+def to_parquet_buffer(table):
+    '''Serialize an Arrow table to an in-memory Parquet file'''
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression='zstd')
+    buffer.seek(0)
+    return buffer
@@ -1,22 +1,22 @@
-from bigquery_client import BigQueryManager
+from warehouse import get_warehouse_manager
+from metrics import timed
 from pendulum import parse
 
-bq_manager = BigQueryManager()
-
 
 def load_data(df, date_str, run_id):
+    warehouse = get_warehouse_manager()
     if df is not None and not df.empty:
-        bq_manager.record_checkpoint(
+        warehouse.record_checkpoint(
             run_id=run_id,
             api_date=parse(date_str),
             status='started',
             total_tickers=len(df['T'].unique()) if 'T' in df.columns else 0
         )
 
-        success, rows_inserted = bq_manager.insert_stock_data(df, date_str)
+        success, rows_inserted = warehouse.insert_stock_data(date_str)
 
         if success:
-            bq_manager.record_checkpoint(
+            warehouse.record_checkpoint(
                 run_id=run_id,
                 api_date=date_str,
                 status='completed',
@@ -25,7 +25,7 @@ def load_data(df, date_str, run_id):
             )
             print(f"Successfully saved {rows_inserted} records for {date_str}")
         else:
-            bq_manager.record_checkpoint(
+            warehouse.record_checkpoint(
                 run_id=run_id,
                 api_date=date_str,
                 status='failed',
@@ -34,3 +34,58 @@ def load_data(df, date_str, run_id):
             print(f"Failed to save data for {date_str}")
     else:
         print(f"No data to save for {date_str}")
+
+
+def load_batch(batch, run_id):
+    '''Load a batch of extracted days with one load job.
+
+    `batch` is a list of (date_str, total_tickers, started_at) tuples for
+    days already written to the landing zone. Returns the dates that
+    failed to load.
+    '''
+    if not batch:
+        return []
+
+    warehouse = get_warehouse_manager()
+    with timed('load.batch', days=len(batch)) as span:
+        results = warehouse.insert_stock_data_batch([d for d, _, _ in batch])
+        span.rows = sum(rows for _, rows in results.values())
+        span.success = all(success for success, _ in results.values())
+
+    checkpoints = []
+    for date_str, total_tickers, started_at in batch:
+        success, rows_inserted = results.get(date_str, (False, 0))
+        checkpoints.append({
+            'api_date': date_str,
+            'status': 'completed' if success else 'failed',
+            'total_tickers': total_tickers,
+            'rows_inserted': rows_inserted if success else None,
+            'started_at': started_at,
+            'error_message': None if success else
+            "Failed to insert data to BigQuery"
+        })
+        if not success:
+            print(f"Failed to save data for {date_str}")
+
+    warehouse.record_checkpoints(run_id, checkpoints)
+    return [c['api_date'] for c in checkpoints if c['status'] == 'failed']
+
+
+def record_empty_days(days, run_id):
+    '''Checkpoint days Polygon returned no bars for as completed with zero
+    rows, so they are not retried as failures.
+
+    `days` is a list of (date_str, started_at) tuples.
+    '''
+    if not days:
+        return
+    get_warehouse_manager().record_checkpoints(run_id, [{
+        'api_date': date_str,
+        'status': 'completed',
+        'total_tickers': 0,
+        'rows_inserted': 0,
+        'started_at': started_at,
+        'error_message': None
+    } for date_str, started_at in days])
+    print(f"Recorded {len(days)} days without data: "
+          f"{[d for d, _ in days]}")
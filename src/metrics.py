@@ -0,0 +1,342 @@
+# Per-stage timings and counters for the extract, load and checkpoint
+# paths. Every span is logged as one JSON line; flush() writes a Prometheus
+# textfile and, when METRICS_TABLE is set, appends the spans to the
+# warehouse so get_ingestion_stats can report percentiles across runs.
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pendulum
+import pyarrow as pa
+from config import (
+    METRICS_JSON_LOGS,
+    METRICS_TABLE,
+    METRICS_TEXTFILE_DIR
+)
+
+
+METRICS_SCHEMA = pa.schema([
+    pa.field('run_id', pa.string()),
+    pa.field('stage', pa.string()),
+    pa.field('started_at', pa.timestamp('us', 'UTC')),
+    pa.field('duration_seconds', pa.float64()),
+    pa.field('row_count', pa.int64()),
+    pa.field('byte_count', pa.int64()),
+    pa.field('success', pa.bool_()),
+    pa.field('labels', pa.string()),
+])
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Durations kept per stage for the quantiles; a uniform sample once a
+# long-running process (the intraday stream) records more than this
+QUANTILE_SAMPLE_SIZE = 1024
+PROMETHEUS_PREFIX = 'stock_pipeline'
+
+
+class Span:
+    def __init__(self, stage, labels):
+        '''One timed stage; the timed block may set rows, bytes, success
+        and extra labels'''
+        self.stage = stage
+        self.labels = labels
+        self.rows = None
+        self.bytes = None
+        self.success = True
+        self.started_at = time.time()
+        self.duration = None
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def to_row(self, run_id):
+        return {
+            'run_id': run_id,
+            'stage': self.stage,
+            'started_at': pendulum.from_timestamp(self.started_at),
+            'duration_seconds': self.duration,
+            'row_count': self.rows,
+            'byte_count': self.bytes,
+            'success': self.success,
+            'labels': json.dumps(self.labels, default=str, sort_keys=True)
+        }
+
+
+class StageTotals:
+    def __init__(self):
+        '''Running totals of one stage's spans, with a bounded sample of
+        their durations for the quantiles'''
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.durations = []
+
+    def add(self, span):
+        self.count += 1
+        self.errors += not span.success
+        self.total_seconds += span.duration
+        self.max_seconds = max(self.max_seconds, span.duration)
+        self.rows += span.rows or 0
+        self.bytes += span.bytes or 0
+        # Reservoir sampling keeps every duration equally likely to be in
+        # the sample
+        if len(self.durations) < QUANTILE_SAMPLE_SIZE:
+            self.durations.append(span.duration)
+        else:
+            slot = random.randrange(self.count)
+            if slot < QUANTILE_SAMPLE_SIZE:
+                self.durations[slot] = span.duration
+
+
+class MetricsRegistry:
+    def __init__(self):
+        '''Thread-safe per-stage totals and labelled counters for this
+        process, plus the spans not yet flushed to METRICS_TABLE'''
+        self.run_id = None
+        self.map_index = None
+        self.stages = {}
+        self.counters = {}
+        self._unflushed = []
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            self.stages.setdefault(span.stage, StageTotals()).add(span)
+            self._unflushed.append(span)
+        if METRICS_JSON_LOGS:
+            print(json.dumps({
+                'metric': 'span',
+                'run_id': self.run_id,
+                'stage': span.stage,
+                'duration_ms': round(span.duration * 1000, 3),
+                'rows': span.rows,
+                'bytes': span.bytes,
+                'success': span.success,
+                **span.labels
+            }, default=str))
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        '''Per-stage count, errors, duration percentiles, rows, bytes and
+        throughput over every span recorded in this process'''
+        with self._lock:
+            stages = {stage: (totals.count, totals.errors,
+                              totals.total_seconds, totals.max_seconds,
+                              totals.rows, totals.bytes,
+                              list(totals.durations))
+                      for stage, totals in self.stages.items()}
+
+        summary = {}
+        for stage, (count, errors, total_seconds, max_seconds, rows,
+                    num_bytes, durations) in stages.items():
+            summary[stage] = stage_stats(
+                count=count,
+                errors=errors,
+                total_seconds=total_seconds,
+                quantiles=dict(zip(QUANTILES, np.quantile(durations,
+                                                          QUANTILES))),
+                max_seconds=max_seconds,
+                rows=rows,
+                num_bytes=num_bytes
+            )
+        return summary
+
+    def counter_values(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def unflushed_rows(self):
+        '''Rows for the spans recorded since the last call, which are
+        then dropped'''
+        with self._lock:
+            spans, self._unflushed = self._unflushed, []
+        return [span.to_row(self.run_id) for span in spans]
+
+
+registry = MetricsRegistry()
+
+
+def stage_stats(count, errors, total_seconds, quantiles, max_seconds, rows,
+                num_bytes):
+    '''One stage's summary dict; throughput is per second of stage time'''
+    return {
+        'count': int(count),
+        'errors': int(errors),
+        'total_seconds': total_seconds,
+        **{quantile_column(q): float(v) for q, v in quantiles.items()},
+        'max_seconds': max_seconds,
+        'rows': int(rows),
+        'bytes': int(num_bytes),
+        'rows_per_second': rows / total_seconds if total_seconds else None,
+        'bytes_per_second':
+            num_bytes / total_seconds if total_seconds else None
+    }
+
+
+def quantile_column(q):
+    return f"p{int(q * 100)}_seconds"
+
+
+def summary_from_frame(frame):
+    '''summary() shaped dict from per-stage aggregates of METRICS_TABLE
+    (stage, spans, errors, total_seconds, one quantile_column per
+    QUANTILES, max_seconds, row_count, byte_count)'''
+    return {
+        row.stage: stage_stats(
+            count=row.spans,
+            errors=row.errors,
+            total_seconds=float(row.total_seconds),
+            quantiles={q: getattr(row, quantile_column(q))
+                       for q in QUANTILES},
+            max_seconds=float(row.max_seconds),
+            rows=row.row_count,
+            num_bytes=row.byte_count
+        )
+        for row in frame.itertuples(index=False)
+    }
+
+
+@contextmanager
+def timed(stage, **labels):
+    '''Time a block, or each call when used as a decorator, as one span.
+
+    Yields the Span so the block can attach rows, bytes and labels. A block
+    that raises is recorded as failed and the exception propagates.
+    '''
+    span = Span(stage, labels)
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span.success = False
+        raise
+    finally:
+        span.duration = time.perf_counter() - started
+        registry.record(span)
+
+
+def observe(stage, seconds, rows=None, **labels):
+    '''Record a span measured by the caller'''
+    span = Span(stage, labels)
+    span.started_at -= seconds
+    span.duration = seconds
+    span.rows = rows
+    registry.record(span)
+
+
+def increment(name, value=1, **labels):
+    registry.increment(name, value, **labels)
+
+
+def set_run_id(run_id):
+    registry.run_id = run_id
+
+
+def set_map_index(map_index):
+    '''Give this process its own textfile and a map_index label, for
+    mapped Airflow task instances running side by side'''
+    registry.map_index = map_index
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"'
+                          for k, v in labels.items()) + '}'
+
+
+def to_prometheus(summary, counters, **const_labels):
+    '''Prometheus text exposition of a summary() and the counters, with
+    `const_labels` on every series'''
+    name = f"{PROMETHEUS_PREFIX}_stage_seconds"
+    lines = [f"# HELP {name} Wall time of each pipeline stage",
+             f"# TYPE {name} summary"]
+    for stage, stats in sorted(summary.items()):
+        labels = {**const_labels, 'stage': stage}
+        for q in QUANTILES:
+            lines.append(f"{name}{_labels(**labels, quantile=q)} "
+                         f"{stats[quantile_column(q)]}")
+        lines.append(f"{name}_sum{_labels(**labels)} "
+                     f"{stats['total_seconds']}")
+        lines.append(f"{name}_count{_labels(**labels)} {stats['count']}")
+
+    for field, help_text in [('errors', 'Failed spans'),
+                             ('rows', 'Rows handled'),
+                             ('bytes', 'Bytes handled')]:
+        name = f"{PROMETHEUS_PREFIX}_stage_{field}_total"
+        lines += [f"# HELP {name} {help_text} per pipeline stage",
+                  f"# TYPE {name} counter"]
+        lines += [f"{name}{_labels(**const_labels, stage=stage)} "
+                  f"{stats[field]}"
+                  for stage, stats in sorted(summary.items())]
+
+    for counter in sorted({key[0] for key in counters}):
+        name = f"{PROMETHEUS_PREFIX}_{counter}_total"
+        lines.append(f"# TYPE {name} counter")
+        lines += [f"{name}{_labels(**const_labels, **dict(labels))} {value}"
+                  for (key, labels), value in sorted(counters.items())
+                  if key == counter]
+
+    name = f"{PROMETHEUS_PREFIX}_metrics_flushed_timestamp_seconds"
+    lines += [f"# TYPE {name} gauge",
+              f"{name}{_labels(**const_labels)} {time.time():.3f}"]
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(job, directory=METRICS_TEXTFILE_DIR):
+    '''Write the process totals for the node_exporter textfile collector.
+
+    Each job has its own file, holding the totals of its latest process.
+    Mapped task instances (set_map_index) each write their own file and
+    label their series, since the collector rejects a series that two
+    files both export.
+    '''
+    name = f"{PROMETHEUS_PREFIX}_{job}"
+    const_labels = {}
+    if registry.map_index is not None:
+        name += f"_{registry.map_index}"
+        const_labels['map_index'] = registry.map_index
+    path = Path(directory) / f"{name}.prom"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # The collector must never read a partially written file, and
+    # processes writing at once must not share a temporary file
+    tmp_path = path.with_name(
+        f"{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp_path.write_text(to_prometheus(registry.summary(),
+                                      registry.counter_values(),
+                                      **const_labels))
+    os.replace(tmp_path, path)
+
+
+def flush(job):
+    '''Write `job`'s textfile and append new spans to METRICS_TABLE.
+
+    Metrics never fail the pipeline: errors are printed and dropped.
+    '''
+    try:
+        if METRICS_TEXTFILE_DIR:
+            write_textfile(job)
+        rows = registry.unflushed_rows()
+        if METRICS_TABLE and rows:
+            from warehouse import get_warehouse_manager
+            get_warehouse_manager().insert_metrics(
+                pa.Table.from_pylist(rows, schema=METRICS_SCHEMA))
+    except Exception as e:
+        print(f"Failed to flush metrics: {e}")
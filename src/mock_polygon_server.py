@@ -0,0 +1,248 @@
+# Local stand-in for Polygon's grouped-daily aggregates endpoint and the
+# splits/dividends reference endpoints.
+# Point API_BASE_URL at http://localhost:<port>/v2/aggs/grouped/locale/us/market/stocks/
+# and REFERENCE_BASE_URL at http://localhost:<port>/v3/reference/
+import argparse
+import json
+import random
+import re
+import string
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode
+
+import pendulum
+
+
+GROUPED_DAILY_PATH = re.compile(
+    r'^/v2/aggs/grouped/locale/us/market/stocks/(\d{4}-\d{2}-\d{2})$')
+REFERENCE_PATH = re.compile(r'^/v3/reference/(splits|dividends)$')
+# Query parameter holding the ex-date for each reference endpoint
+REFERENCE_DATE_FIELDS = {'splits': 'execution_date',
+                         'dividends': 'ex_dividend_date'}
+
+
+def synthetic_tickers(count, seed=0):
+    '''Deterministic list of unique uppercase ticker symbols'''
+    rng = random.Random(seed)
+    tickers = set()
+    while len(tickers) < count:
+        length = rng.choice([1, 2, 3, 3, 4, 4, 4, 5])
+        tickers.add(''.join(rng.choices(string.ascii_uppercase, k=length)))
+    return sorted(tickers)
+
+
+@lru_cache(maxsize=64)
+def grouped_daily_payload(date_str, tickers):
+    '''Serialized grouped-daily response for one date'''
+    rng = random.Random(date_str)
+    ts = int(pendulum.parse(date_str).add(hours=20).timestamp() * 1000)
+    results = []
+    for i, ticker in enumerate(synthetic_tickers(tickers)):
+        base = 5 + (i * 7919) % 500
+        close = round(base * (1 + rng.uniform(-0.05, 0.05)), 4)
+        open_ = round(base * (1 + rng.uniform(-0.03, 0.03)), 4)
+        results.append({
+            'T': ticker,
+            'v': float(rng.randint(100, 50_000_000)),
+            'vw': round((open_ + close) / 2, 4),
+            'o': open_,
+            'c': close,
+            'h': round(max(open_, close) * (1 + rng.uniform(0, 0.02)), 4),
+            'l': round(min(open_, close) * (1 - rng.uniform(0, 0.02)), 4),
+            't': ts,
+            'n': rng.randint(1, 500_000)
+        })
+    return json.dumps({
+        'queryCount': len(results),
+        'resultsCount': len(results),
+        'adjusted': True,
+        'results': results,
+        'status': 'OK'
+    }).encode()
+
+
+@lru_cache(maxsize=256)
+def corporate_actions(date_str, tickers):
+    '''Deterministic (splits, dividends) with an ex-date of `date_str`:
+    about one split per 2000 tickers and one dividend per 100 each
+    weekday'''
+    if pendulum.parse(date_str).day_of_week in (pendulum.SATURDAY,
+                                                pendulum.SUNDAY):
+        return (), ()
+    rng = random.Random(f"actions-{date_str}")
+    names = synthetic_tickers(tickers)
+    splits = tuple({
+        'id': f"S{date_str}{ticker}",
+        'ticker': ticker,
+        'execution_date': date_str,
+        'split_from': 1,
+        'split_to': rng.choice([2, 3, 4, 10])
+    } for ticker in rng.sample(names, max(1, tickers // 2000)))
+    dividends = tuple({
+        'id': f"D{date_str}{ticker}",
+        'ticker': ticker,
+        'ex_dividend_date': date_str,
+        'cash_amount': round(rng.uniform(0.01, 2.0), 4),
+        'currency': 'USD',
+        'dividend_type': 'CD',
+        'frequency': 4
+    } for ticker in rng.sample(names, max(1, tickers // 100)))
+    return splits, dividends
+
+
+def reference_payload(endpoint, query, tickers, base_url):
+    '''Serialized page of splits or dividends filtered on the endpoint's
+    date field; further pages are linked through `next_url`'''
+    field = REFERENCE_DATE_FIELDS[endpoint]
+    start = pendulum.parse(query.get(f"{field}.gte", '2000-01-01'))
+    end = pendulum.parse(query.get(f"{field}.lte",
+                                   pendulum.now().to_date_string()))
+    limit = int(query.get('limit', 10))
+    offset = int(query.get('cursor', 0))
+
+    results = []
+    day = start
+    while day <= end:
+        splits, dividends = corporate_actions(day.to_date_string(), tickers)
+        results += splits if endpoint == 'splits' else dividends
+        day = day.add(days=1)
+
+    payload = {'results': results[offset:offset + limit], 'status': 'OK'}
+    if offset + limit < len(results):
+        next_query = {k: v for k, v in query.items() if k != 'apiKey'}
+        next_query['cursor'] = offset + limit
+        payload['next_url'] = f"{base_url}{endpoint}?{urlencode(next_query)}"
+    return json.dumps(payload).encode()
+
+
+class MockPolygonServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, tickers=10_000, latency_ms=0, jitter_ms=0,
+                 rate_limit_rate=0.0, server_error_rate=0.0,
+                 retry_after=None, seed=None):
+        super().__init__(address, MockPolygonHandler)
+        self.tickers = tickers
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0,
+                      'server_errors': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v2/aggs/grouped/locale/us/market/stocks/"
+
+    @property
+    def reference_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v3/reference/"
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def roll(self):
+        with self._lock:
+            return self.rng.random()
+
+
+class MockPolygonHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+
+        delay = server.latency_ms + random.uniform(0, server.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+        path, _, query_string = self.path.partition('?')
+        match = GROUPED_DAILY_PATH.match(path)
+        reference = REFERENCE_PATH.match(path)
+        if not match and not reference:
+            self._send(404, b'{"status": "NOT_FOUND"}')
+            return
+
+        roll = server.roll()
+        if roll < server.rate_limit_rate:
+            server.count('rate_limited')
+            headers = {}
+            if server.retry_after is not None:
+                headers['Retry-After'] = str(server.retry_after)
+            self._send(429, b'{"status": "ERROR"}', headers)
+            return
+        if roll < server.rate_limit_rate + server.server_error_rate:
+            server.count('server_errors')
+            self._send(503, b'{"status": "ERROR"}')
+            return
+
+        server.count('ok')
+        if reference:
+            query = {k: v[-1] for k, v in parse_qs(query_string).items()}
+            self._send(200, reference_payload(reference.group(1), query,
+                                              server.tickers,
+                                              server.reference_url))
+            return
+        self._send(200, grouped_daily_payload(match.group(1), server.tickers))
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, **options):
+    '''Start the mock server on a background thread and return it'''
+    server = MockPolygonServer(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Local stand-in for the Polygon grouped-daily endpoint')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tickers', type=int, default=10_000,
+                        help='Results per grouped-daily response')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 503')
+    parser.add_argument('--retry-after', type=float, default=None,
+                        help='Retry-After seconds sent with 429s')
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = MockPolygonServer(
+        ('127.0.0.1', args.port),
+        tickers=args.tickers,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    print(f"Serving mock Polygon API at {server.base_url}")
+    print(f"Serving mock reference API at {server.reference_url}")
+    server.serve_forever()
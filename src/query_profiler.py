@@ -0,0 +1,271 @@
+# Profiles every compiled dbt model and dashboard query against the
+# configured warehouse: BigQuery dry runs report bytes processed, the DuckDB
+# stand-in runs each query with profiling for rows scanned and files read.
+# Each run is appended to QUERY_PROFILE_TABLE and fails when a query scans
+# more than QUERY_PROFILE_THRESHOLD over its baseline.
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import uuid
+from functools import partial
+from pathlib import Path
+
+import pendulum
+import pyarrow as pa
+from config import (
+    BIGQUERY_DATASET,
+    DBT_PROJECT_DIR,
+    PROJECT_ROOT,
+    QUERY_PROFILE_BASELINE_RUNS,
+    QUERY_PROFILE_TABLE,
+    QUERY_PROFILE_THRESHOLD,
+    WAREHOUSE_BACKEND
+)
+from warehouse import get_warehouse_manager
+
+# The dashboard's SQL builders live with the Streamlit app
+sys.path.insert(0, str(PROJECT_ROOT / 'streamlit_app'))
+from utilities import queries  # noqa: E402
+
+
+PROFILE_SCHEMA = pa.schema([
+    pa.field('run_id', pa.string()),
+    pa.field('profiled_at', pa.timestamp('us', 'UTC')),
+    pa.field('git_commit', pa.string()),
+    pa.field('backend', pa.string()),
+    pa.field('kind', pa.string()),
+    pa.field('name', pa.string()),
+    pa.field('sql_hash', pa.string()),
+    pa.field('executed', pa.bool_()),
+    pa.field('bytes_processed', pa.int64()),
+    pa.field('rows_scanned', pa.int64()),
+    pa.field('slot_ms', pa.float64()),
+    pa.field('partitions_processed', pa.int64()),
+    pa.field('partitions_total', pa.int64()),
+    pa.field('elapsed_ms', pa.float64()),
+])
+
+# Tickers for the series queries; the screener prefetches this many
+SAMPLE_TICKERS = 20
+
+
+def compile_models(project_dir=DBT_PROJECT_DIR, target=WAREHOUSE_BACKEND,
+                   profiles_dir='.'):
+    '''Refresh target/manifest.json with SQL compiled against `target`'''
+    subprocess.run(['dbt', 'compile', '--profiles-dir', profiles_dir,
+                    '--target', target], cwd=project_dir, check=True)
+
+
+def model_queries(project_dir=DBT_PROJECT_DIR):
+    '''(name, sql, params) for each model compiled into the manifest.
+
+    Incremental models hold the SQL of their next incremental run, which
+    is what the daily build scans.
+    '''
+    manifest_path = Path(project_dir) / 'target' / 'manifest.json'
+    try:
+        with open(manifest_path) as f:
+            nodes = json.load(f)['nodes']
+    except OSError:
+        raise ValueError(f"No dbt manifest at {manifest_path}; run with "
+                         f"--compile")
+    models = sorted((node['name'], node['compiled_code'], ())
+                    for node in nodes.values()
+                    if node['resource_type'] == 'model'
+                    and node.get('compiled_code'))
+    if not models:
+        raise ValueError(f"{manifest_path} has no compiled SQL; run with "
+                         f"--compile")
+    return models
+
+
+def dashboard_queries(warehouse, backend=WAREHOUSE_BACKEND):
+    '''(name, sql, params) for each query the Streamlit pages run, naming
+    the marts as the dashboard does on BigQuery'''
+    mart = queries.mart if backend == 'bigquery' \
+        else partial(warehouse.relation, 'analytics')
+    dim_table = mart('dim_securities_current')
+    data_version = warehouse.query(
+        queries.data_version_query(dim_table, queries.DIM_VERSION_COLUMN)
+    ).iloc[0]['latest']
+    tickers = warehouse.query(
+        f"SELECT ticker FROM {dim_table} ORDER BY ticker "
+        f"LIMIT {SAMPLE_TICKERS}")['ticker'].tolist()
+    return queries.dashboard_queries(mart, data_version, tickers)
+
+
+def scanned(profile):
+    '''The regression metric: bytes processed, or rows scanned where the
+    backend does not report bytes'''
+    if profile['bytes_processed'] is not None:
+        return profile['bytes_processed']
+    return profile['rows_scanned']
+
+
+def load_baselines(warehouse, backend, executed,
+                   runs=QUERY_PROFILE_BASELINE_RUNS):
+    '''Median scanned amount of each query over its last `runs` profiles.
+
+    Dry-run estimates and executed runs are not compared with each other.
+    '''
+    relation = warehouse.relation(BIGQUERY_DATASET, QUERY_PROFILE_TABLE)
+    query = f"""
+    SELECT name, COALESCE(bytes_processed, rows_scanned) as scanned
+    FROM (
+        SELECT
+            name,
+            bytes_processed,
+            rows_scanned,
+            ROW_NUMBER() OVER (
+                PARTITION BY name ORDER BY profiled_at DESC
+            ) as recency
+        FROM {relation}
+        WHERE backend = '{backend}'
+        AND executed = {'TRUE' if executed else 'FALSE'}
+    ) as profiles
+    WHERE recency <= {int(runs)}
+    """
+    try:
+        history = warehouse.query(query)
+    except Exception as e:
+        print(f"No profile history in {relation}: {e}")
+        return {}
+    return history.dropna().groupby('name')['scanned'].median().to_dict()
+
+
+def git_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def format_scanned(profile):
+    if profile['bytes_processed'] is None:
+        return f"{profile['rows_scanned']:,} rows"
+    size = float(profile['bytes_processed'])
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'TB'
+    return f"{size:.1f} {unit}"
+
+
+def print_profile(row, baseline):
+    partitions = '-'
+    if row['partitions_total'] is not None:
+        processed = row['partitions_processed']
+        partitions = f"{'?' if processed is None else processed}/" \
+            f"{row['partitions_total']}"
+    slot_ms = '-' if row['slot_ms'] is None else f"{row['slot_ms']:.0f}"
+    change = '-'
+    if baseline:
+        change = f"{scanned(row) / baseline - 1:+.1%}"
+    print(f"{row['kind']:<9} {row['name']:<40} {format_scanned(row):>14} "
+          f"{partitions:>9} {slot_ms:>9} {change:>8}")
+
+
+def profile_queries(select=None, include_dashboard=True, execute=False,
+                    threshold=QUERY_PROFILE_THRESHOLD, record=True,
+                    project_dir=DBT_PROJECT_DIR, backend=WAREHOUSE_BACKEND):
+    '''Profile each model and dashboard query, compare with the baselines
+    and append the profiles to QUERY_PROFILE_TABLE.
+
+    `select` limits the run to those model or dashboard query names.
+    Returns (regressions, failures): names that scanned more than
+    `threshold` over baseline and names that could not be profiled.
+    '''
+    warehouse = get_warehouse_manager(backend)
+    # The DuckDB stand-in always runs the query
+    executed = execute or backend == 'duckdb'
+    work = [('model', *query) for query in model_queries(project_dir)]
+    if include_dashboard:
+        work += [('dashboard', *query)
+                 for query in dashboard_queries(warehouse, backend)]
+    if select:
+        work = [item for item in work if item[1] in select]
+    if backend == 'bigquery':
+        # Bound exactly as the dashboard binds them; only BigQuery needs
+        # its client library for this
+        from utilities.parameters import query_parameters
+        work = [(kind, name, sql, query_parameters(params))
+                for kind, name, sql, params in work]
+
+    baselines = load_baselines(warehouse, backend, executed)
+    run_id = str(uuid.uuid4())
+    commit = git_commit()
+    print(f"{'kind':<9} {'name':<40} {'scanned':>14} {'parts':>9} "
+          f"{'slot_ms':>9} {'change':>8}")
+
+    rows, regressions, failures = [], [], []
+    for kind, name, sql, params in work:
+        try:
+            profile = warehouse.profile_query(sql, params, execute=execute)
+        except Exception as e:
+            print(f"Failed to profile {name}: {e}")
+            failures.append(name)
+            continue
+        row = {
+            'run_id': run_id,
+            'profiled_at': pendulum.now('UTC'),
+            'git_commit': commit,
+            'backend': backend,
+            'kind': kind,
+            'name': name,
+            'sql_hash': hashlib.sha256(sql.encode()).hexdigest()[:16],
+            'executed': executed,
+            **profile
+        }
+        rows.append(row)
+        baseline = baselines.get(name)
+        print_profile(row, baseline)
+        if baseline and scanned(row) > baseline * (1 + threshold):
+            regressions.append(name)
+
+    if record and rows:
+        warehouse.insert_query_profiles(
+            pa.Table.from_pylist(rows, schema=PROFILE_SCHEMA))
+        print(f"Recorded {len(rows)} profiles to {QUERY_PROFILE_TABLE}")
+    if regressions:
+        print(f"Scanned more than {threshold:.0%} over baseline: "
+              f"{', '.join(regressions)}")
+    return regressions, failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Profile what each dbt model and dashboard query scans '
+                    'and fail on regressions over the recorded baseline')
+    parser.add_argument('--compile', action='store_true',
+                        help='Run `dbt compile` first')
+    parser.add_argument('--profiles-dir', default='.',
+                        help='dbt profiles dir, relative to the project')
+    parser.add_argument('--select', nargs='+',
+                        help='Only these model or dashboard query names')
+    parser.add_argument('--skip-dashboard', action='store_true')
+    parser.add_argument('--execute', action='store_true',
+                        help='Run BigQuery queries instead of dry running '
+                             'them, for slot-ms and elapsed time')
+    parser.add_argument('--threshold', type=float,
+                        default=QUERY_PROFILE_THRESHOLD,
+                        help='Allowed growth over baseline, e.g. 0.2')
+    parser.add_argument('--no-record', action='store_true',
+                        help='Compare only; leave the history unchanged')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.compile:
+        compile_models(profiles_dir=args.profiles_dir)
+    regressions, failures = profile_queries(
+        select=args.select,
+        include_dashboard=not args.skip_dashboard,
+        execute=args.execute,
+        threshold=args.threshold,
+        record=not args.no_record
+    )
+    sys.exit(1 if regressions or failures else 0)
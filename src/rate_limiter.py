@@ -0,0 +1,81 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import pendulum
+
+
+class TokenBucket:
+    def __init__(self, requests_per_minute, max_in_flight=1, burst=None):
+        '''Thread-safe token bucket capping request rate and concurrency'''
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst if burst else max(1, max_in_flight)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        '''Block until a token is available, then take it'''
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now,
+                           (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def set_rate(self, requests_per_minute):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = requests_per_minute / 60.0
+
+    def pause(self, seconds):
+        '''Stop handing out tokens for `seconds` (e.g. after a 429)'''
+        with self._lock:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0.0
+            self.updated_at = now
+
+    def __enter__(self):
+        self._in_flight.acquire()
+        try:
+            self.acquire()
+        except BaseException:
+            self._in_flight.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._in_flight.release()
+
+
+def parse_retry_after(value):
+    '''Return seconds to wait from a Retry-After header, or None'''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - pendulum.now().timestamp())
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    '''Exponential backoff with full jitter'''
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
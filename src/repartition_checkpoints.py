@@ -0,0 +1,132 @@
+# One-off migration for a checkpoint table created before checkpoints were
+# partitioned on recorded_at. BigQuery cannot re-partition a table in
+# place, so the events are copied into a partitioned table that takes the
+# old one's name once the copy is verified. Pause the pipeline DAG first:
+#
+#   python src/repartition_checkpoints.py
+#
+# The original table is kept as <table>__unpartitioned. Re-running is safe
+# at any point: a finished migration is a no-op, an interrupted swap is
+# completed and an unverified copy is rebuilt.
+import argparse
+
+from bigquery_client import get_bq_manager
+
+
+PARTITION_FIELD = 'recorded_at'
+
+
+def table_exists(client, table_id):
+    try:
+        client.get_table(table_id)
+        return True
+    except Exception:
+        return False
+
+
+def is_partitioned(client, table_id):
+    partitioning = client.get_table(table_id).time_partitioning
+    return partitioning is not None and \
+        partitioning.field == PARTITION_FIELD
+
+
+def fingerprint(client, table_id):
+    '''(row count, order-independent hash of every row) of a table'''
+    row = list(client.query(f"""
+        SELECT
+            COUNT(*) as row_count,
+            BIT_XOR(FARM_FINGERPRINT(TO_JSON_STRING(t))) as row_hash
+        FROM `{table_id}` as t
+    """).result())[0]
+    return row.row_count, row.row_hash
+
+
+def copy_missing_events(client, source_id, table_id):
+    '''Append the rows of `source_id` that `table_id` lacks'''
+    job = client.query(f"""
+        INSERT INTO `{table_id}`
+        SELECT * FROM `{source_id}`
+        EXCEPT DISTINCT
+        SELECT * FROM `{table_id}`
+    """)
+    job.result()
+    return job.num_dml_affected_rows
+
+
+def rename(client, table_id, new_table_id):
+    client.query(f"ALTER TABLE `{table_id}` "
+                 f"RENAME TO `{new_table_id.split('.')[-1]}`").result()
+    print(f"Renamed {table_id} to {new_table_id}")
+
+
+def repartition_checkpoints(drop_backup=False):
+    '''Swap the checkpoint table for a copy partitioned on recorded_at.
+
+    The source table is renamed aside only after the copy's row count and
+    row hash match it. Its events are copied again after the swap, so it
+    is only dropped (with drop_backup) once the new table holds them all.
+    '''
+    manager = get_bq_manager()
+    client = manager.client
+    table_id = manager.checkpoint_table_id
+    rebuild_id = f"{table_id}__partitioned"
+    backup_id = f"{table_id}__unpartitioned"
+
+    if not table_exists(client, table_id):
+        if not table_exists(client, rebuild_id):
+            raise RuntimeError(f"Checkpoint table {table_id} not found")
+        # A previous run stopped between the two renames
+        rename(client, rebuild_id, table_id)
+    elif is_partitioned(client, table_id):
+        print(f"{table_id} is already partitioned on {PARTITION_FIELD}")
+    else:
+        if table_exists(client, backup_id):
+            raise RuntimeError(
+                f"{backup_id} already exists; check it and drop it before "
+                f"migrating again")
+        client.query(f"""
+            CREATE OR REPLACE TABLE `{rebuild_id}`
+            PARTITION BY DATE({PARTITION_FIELD})
+            AS SELECT * FROM `{table_id}`
+        """).result()
+        source = fingerprint(client, table_id)
+        if fingerprint(client, rebuild_id) != source:
+            raise RuntimeError(
+                f"{table_id} changed while it was copied; pause the "
+                f"pipeline and run the migration again")
+        print(f"Copied {source[0]} checkpoint events to {rebuild_id}")
+        rename(client, table_id, backup_id)
+        rename(client, rebuild_id, table_id)
+
+    # Events in the old table (appended between the copy and the swap) or
+    # in a copy stranded when the loader recreated the table mid-swap
+    for leftover_id in (rebuild_id, backup_id):
+        if table_exists(client, leftover_id):
+            copied = copy_missing_events(client, leftover_id, table_id)
+            if copied:
+                print(f"Copied {copied} events from {leftover_id}")
+    if table_exists(client, rebuild_id):
+        client.delete_table(rebuild_id)
+    if not table_exists(client, backup_id):
+        return
+    if drop_backup:
+        client.delete_table(backup_id)
+        print(f"Dropped {backup_id}")
+    else:
+        print(f"Kept the original table as {backup_id}; re-run with "
+              f"--drop-backup once checked")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Rebuild the checkpoint table partitioned on '
+                    'recorded_at (one-off migration)')
+    parser.add_argument('--drop-backup', action='store_true',
+                        help='Drop the original table once its events are '
+                             'in the migrated one')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    repartition_checkpoints(args.drop_backup)
@@ -0,0 +1,177 @@
+# Builds the SCD2 Russell 3000 constituents seed from iShares holdings files
+import argparse
+import io
+import re
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pendulum
+from config import CONSTITUENTS_SEED_PATH, HOLDINGS_PATH
+
+
+# Stored holdings files are named after their as-of date
+HOLDINGS_FILE = re.compile(r'^russell3000_(\d{4})_(\d{2})(\d{2})\.csv$')
+# Files downloaded from ishares.com start with a preamble naming the date
+AS_OF_LINE = re.compile(r'Fund Holdings as of,"?([A-Za-z]{3} \d{1,2}, \d{4})')
+
+# The first snapshot also covers the history loaded before it; the latest
+# versions stay open
+HISTORY_START = '2023-01-01'
+OPEN_VALID_TO = '3000-01-01'
+# int_russell3000__daily only rebuilds this many days on incremental runs
+REBUILD_DAYS = 4
+
+HOLDINGS_COLUMNS = {
+    'Ticker': 'ticker',
+    'Name': 'company',
+    'Sector': 'sector',
+    'Asset Class': 'asset_class',
+    'Market Value': 'market_value',
+    'Weight': 'market_weight',
+}
+# A ticker gets a new version when any of these change or it rejoins
+VERSION_COLUMNS = ['company', 'sector', 'market_value', 'market_weight']
+SEED_COLUMNS = ['ticker'] + VERSION_COLUMNS + ['valid_from', 'valid_to']
+
+
+def holdings_file_date(path):
+    '''As-of date encoded in a stored holdings file name, or None'''
+    match = HOLDINGS_FILE.match(Path(path).name)
+    if not match:
+        return None
+    return pendulum.date(*map(int, match.groups()))
+
+
+def read_holdings(path):
+    '''Equity holdings of one iShares file as (as_of_date, DataFrame).
+
+    Skips any preamble before the header row and the disclaimer after the
+    first blank line, and parses quoted "1,234.56" numbers as floats. The
+    as-of date comes from the file name or the preamble (None if neither).
+    '''
+    lines = Path(path).read_text(encoding='utf-8-sig').splitlines()
+    as_of = holdings_file_date(path)
+    header = None
+    for i, line in enumerate(lines):
+        match = AS_OF_LINE.search(line)
+        if match and as_of is None:
+            as_of = pendulum.from_format(match.group(1), 'MMM D, YYYY').date()
+        if line.lstrip('"').startswith('Ticker'):
+            header = i
+            break
+    if header is None:
+        raise ValueError(f"No holdings header row in {path}")
+    end = next((i for i in range(header, len(lines)) if not lines[i].strip()),
+               len(lines))
+
+    df = pd.read_csv(io.StringIO('\n'.join(lines[header:end])),
+                     usecols=list(HOLDINGS_COLUMNS), thousands=',',
+                     na_values=['-'], keep_default_na=False,
+                     dtype={'Ticker': str, 'Name': str, 'Sector': str})
+    df = df.rename(columns=HOLDINGS_COLUMNS)
+    df['ticker'] = df['ticker'].replace('', None)
+    df = df[df['ticker'].notna() & (df['asset_class'] == 'Equity')]
+    # A ticker listed twice (e.g. a stock and its CVR) keeps its main line
+    df = df.sort_values('market_value', ascending=False) \
+        .drop_duplicates('ticker')
+    return as_of, df.drop(columns='asset_class').sort_values('ticker') \
+        .reset_index(drop=True)
+
+
+def build_scd2(snapshots, history_start=HISTORY_START):
+    '''SCD2 versions from [(as_of_date, holdings DataFrame)] snapshots.
+
+    Each version runs from the snapshot that introduced it to the day
+    before the first snapshot that drops or changes it.
+    '''
+    snapshots = sorted(snapshots, key=lambda s: s[0])
+    starts = [pendulum.parse(history_start).date()] + \
+        [as_of for as_of, _ in snapshots[1:]]
+    ends = [as_of.subtract(days=1) for as_of, _ in snapshots[1:]] + \
+        [pendulum.parse(OPEN_VALID_TO).date()]
+
+    frames = pd.concat([df.assign(snapshot=i)
+                        for i, (_, df) in enumerate(snapshots)],
+                       ignore_index=True)
+    frames = frames.sort_values(['ticker', 'snapshot'], ignore_index=True)
+
+    previous = frames.groupby('ticker')[['snapshot'] + VERSION_COLUMNS] \
+        .shift()
+    changed = frames['snapshot'] != previous['snapshot'] + 1
+    for column in VERSION_COLUMNS:
+        current, prior = frames[column], previous[column]
+        changed |= (current != prior) & ~(current.isna() & prior.isna())
+
+    frames['version'] = changed.cumsum()
+    versions = frames.groupby('version').agg(
+        ticker=('ticker', 'first'),
+        **{column: (column, 'first') for column in VERSION_COLUMNS},
+        first_snapshot=('snapshot', 'first'),
+        last_snapshot=('snapshot', 'last'))
+    versions['valid_from'] = [starts[i] for i in versions['first_snapshot']]
+    versions['valid_to'] = [ends[i] for i in versions['last_snapshot']]
+    return versions[SEED_COLUMNS].reset_index(drop=True)
+
+
+def build_constituents(holdings_path=HOLDINGS_PATH,
+                       seed_path=CONSTITUENTS_SEED_PATH,
+                       history_start=HISTORY_START):
+    '''Rewrite the constituents seed from every stored holdings file'''
+    files = sorted(p for p in Path(holdings_path).glob('*.csv')
+                   if holdings_file_date(p))
+    if not files:
+        raise ValueError(f"No holdings files in {holdings_path}")
+
+    versions = build_scd2([read_holdings(p) for p in files], history_start)
+    versions.to_csv(seed_path, index=False)
+    print(f"Wrote {len(versions)} versions of {versions['ticker'].nunique()} "
+          f"tickers from {len(files)} snapshots to {seed_path}")
+    return versions
+
+
+def add_holdings(path, as_of=None, holdings_path=HOLDINGS_PATH,
+                 seed_path=CONSTITUENTS_SEED_PATH):
+    '''Store a downloaded holdings file under its as-of date and rebuild
+    the seed'''
+    file_as_of, df = read_holdings(path)
+    as_of = pendulum.parse(as_of).date() if as_of else file_as_of
+    if as_of is None:
+        raise ValueError(f"No as-of date for {path}; pass --as-of")
+    if df.empty:
+        raise ValueError(f"No equity holdings in {path}")
+
+    target = Path(holdings_path) / \
+        f"russell3000_{as_of.format('YYYY_MMDD')}.csv"
+    if Path(path).resolve() != target.resolve():
+        shutil.copyfile(path, target)
+    print(f"Stored {len(df)} holdings as of {as_of} in {target}")
+    if as_of < pendulum.now().date().subtract(days=REBUILD_DAYS):
+        # Membership catches up by itself, the daily rows already built do not
+        print(f"{as_of} is before the incremental window; run `dbt build "
+              f"--select int_russell3000__daily+ --full-refresh` to restate "
+              f"membership since then")
+    return build_constituents(holdings_path, seed_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Maintain the SCD2 Russell 3000 constituents seed')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser(
+        'add', help='Store a new iShares holdings file and rebuild the seed')
+    add.add_argument('path')
+    add.add_argument('--as-of', help='Holdings date (YYYY-MM-DD) when the '
+                     'file does not state it')
+    build = commands.add_parser(
+        'build', help='Rebuild the seed from the stored holdings files')
+    build.add_argument('--history-start', default=HISTORY_START)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'add':
+        add_holdings(args.path, args.as_of)
+    else:
+        build_constituents(history_start=args.history_start)
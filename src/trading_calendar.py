@@ -0,0 +1,103 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pendulum
+from config import (
+    TRADING_CALENDAR_MAX_AGE_DAYS,
+    TRADING_CALENDAR_PATH
+)
+
+
+# Each refresh also covers this far ahead, so daily runs hit the cache
+LOOKAHEAD_DAYS = 366
+
+
+class TradingCalendar:
+    def __init__(self, name='NYSE', path=TRADING_CALENDAR_PATH,
+                 max_age_days=TRADING_CALENDAR_MAX_AGE_DAYS):
+        '''Local cache of one exchange's trading days.
+
+        pandas_market_calendars is only asked when a range falls outside
+        the cached one or the cache is older than `max_age_days`, which
+        picks up closures announced after it was written.
+        '''
+        self.name = name
+        self.path = Path(path)
+        self.max_age_days = max_age_days
+        self.start = None
+        self.end = None
+        self.fetched_at = None
+        self.days = pd.DatetimeIndex([])
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)[self.name]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring trading calendar cache {self.path}: {e!r}")
+            return
+        self.start = pd.Timestamp(data['start']).date()
+        self.end = pd.Timestamp(data['end']).date()
+        self.fetched_at = pendulum.parse(data['fetched_at'])
+        self.days = pd.DatetimeIndex(data['days'])
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The file holds every exchange's calendar; keep the others
+        calendars = {}
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    calendars = json.load(f)
+            except (OSError, ValueError):
+                pass
+        calendars[self.name] = {
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'fetched_at': self.fetched_at.to_iso8601_string(),
+            'days': [d.strftime('%Y-%m-%d') for d in self.days]
+        }
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(calendars, f)
+        os.replace(tmp_path, self.path)
+
+    def covers(self, start_date, end_date):
+        if self.fetched_at is None:
+            return False
+        if pendulum.now('UTC') - self.fetched_at > \
+                pendulum.duration(days=self.max_age_days):
+            return False
+        return self.start <= start_date and end_date <= self.end
+
+    def refresh(self, start_date, end_date):
+        '''Fetch the schedule from `start_date` to `end_date`, widened to
+        the cached range and LOOKAHEAD_DAYS past today'''
+        import pandas_market_calendars as mcal
+
+        start = min(start_date, self.start or start_date)
+        end = max(end_date, self.end or end_date,
+                  pendulum.today().date().add(days=LOOKAHEAD_DAYS))
+        schedule = mcal.get_calendar(self.name).schedule(
+            start_date=start, end_date=end)
+        self.start, self.end = start, end
+        self.fetched_at = pendulum.now('UTC')
+        self.days = pd.DatetimeIndex(schedule.index)
+        self.save()
+        print(f"Cached {len(self.days)} {self.name} trading days "
+              f"from {start} to {end}")
+
+    def trading_days(self, start_date, end_date):
+        '''Trading days from `start_date` to `end_date` inclusive'''
+        start_date = pd.Timestamp(start_date).date()
+        end_date = pd.Timestamp(end_date).date()
+        if not self.covers(start_date, end_date):
+            self.refresh(start_date, end_date)
+        mask = (self.days >= pd.Timestamp(start_date)) & \
+            (self.days <= pd.Timestamp(end_date))
+        return self.days[mask]
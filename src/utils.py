@@ -1,15 +1,16 @@
-import pandas_market_calendars as mcal
-from bigquery_client import BigQueryManager
+from trading_calendar import TradingCalendar
+from warehouse import get_warehouse_manager
 
 
-def get_trading_days(start_date, end_date, calendar='NYSE'):
-    calendar = mcal.get_calendar(calendar)
-    schedule = calendar.schedule(start_date=start_date, end_date=end_date)
-    trading_days = schedule.index
+_calendars = {}
+
 
-    return trading_days
+def get_trading_days(start_date, end_date, calendar='NYSE'):
+    '''Trading days from the locally cached exchange calendar'''
+    if calendar not in _calendars:
+        _calendars[calendar] = TradingCalendar(calendar)
+    return _calendars[calendar].trading_days(start_date, end_date)
 
 
 def get_completed_dates():
-    bq_manager = BigQueryManager()
-    return bq_manager.get_completed_dates()
+    return get_warehouse_manager().get_completed_dates()
@@ -0,0 +1,108 @@
+from abc import ABC, abstractmethod
+
+from config import WAREHOUSE_BACKEND
+
+
+class WarehouseManager(ABC):
+    '''Interface the extract/load path uses to write to a warehouse'''
+
+    @abstractmethod
+    def insert_stock_data(self, date_str):
+        '''Replace one date of raw data from the landing zone.
+
+        Returns (success, rows_inserted).
+        '''
+
+    @abstractmethod
+    def insert_stock_data_batch(self, date_strs):
+        '''Replace several dates of raw data from the landing zone.
+
+        Returns {date_str: (success, rows_inserted)}.
+        '''
+
+    @abstractmethod
+    def insert_corporate_actions(self, table):
+        '''Append corporate actions (an Arrow table in
+        CORPORATE_ACTIONS_SCHEMA).
+
+        Returns the number of rows appended.
+        '''
+
+    @abstractmethod
+    def insert_metrics(self, table):
+        '''Append stage metric spans (an Arrow table in METRICS_SCHEMA) to
+        METRICS_TABLE'''
+
+    @abstractmethod
+    def insert_query_profiles(self, table):
+        '''Append query profiles (an Arrow table in PROFILE_SCHEMA) to
+        QUERY_PROFILE_TABLE'''
+
+    @abstractmethod
+    def insert_intraday_breadth(self, table):
+        '''Append intraday breadth snapshots (an Arrow table in
+        INTRADAY_SCHEMA) to INTRADAY_BREADTH_TABLE as they are taken'''
+
+    @abstractmethod
+    def profile_query(self, sql, params=(), execute=False):
+        '''Measure what one query scans without fetching its result.
+
+        `params` bind the @name placeholders: (name, value) pairs, or on
+        BigQuery the query parameters built from them. Returns a dict of
+        bytes_processed, rows_scanned, slot_ms, partitions_processed,
+        partitions_total and elapsed_ms; metrics the backend cannot report
+        are None.
+        '''
+
+    @abstractmethod
+    def record_checkpoint(self, run_id, api_date, status, total_tickers=None,
+                          rows_inserted=None, error_message=None):
+        '''Append one checkpoint event'''
+
+    @abstractmethod
+    def record_checkpoints(self, run_id, checkpoints):
+        '''Append final checkpoint events for a batch'''
+
+    @abstractmethod
+    def get_completed_dates(self):
+        '''Return the set of 'YYYY-MM-DD' dates whose latest status is
+        completed'''
+
+    @abstractmethod
+    def get_partition_stats(self):
+        '''Per-day row counts of the raw table, read from partition
+        metadata without scanning the data.
+
+        Returns a DataFrame of trade_date (date), row_count and
+        checkpoint_rows (rows loaded by the latest completed checkpoint,
+        or its ticker count), with a row for every day that has either.
+        '''
+
+    @abstractmethod
+    def get_ingestion_stats(self):
+        '''Return a dict of ingestion statistics, or None.
+
+        'stages' maps each pipeline stage to its count, errors, duration
+        percentiles, rows, bytes and throughput: over the last
+        METRICS_STATS_DAYS of METRICS_TABLE when it is set, otherwise over
+        this process's spans.
+        '''
+
+    @abstractmethod
+    def relation(self, dataset, table):
+        '''Fully qualified name of a table in this warehouse'''
+
+    @abstractmethod
+    def query(self, sql):
+        '''Run a query and return the result as a DataFrame'''
+
+
+def get_warehouse_manager(backend=WAREHOUSE_BACKEND):
+    '''Return the process-wide manager for the configured backend'''
+    if backend == 'bigquery':
+        from bigquery_client import get_bq_manager
+        return get_bq_manager()
+    if backend == 'duckdb':
+        from duckdb_client import get_duckdb_manager
+        return get_duckdb_manager()
+    raise ValueError(f"Unknown WAREHOUSE_BACKEND: {backend}")
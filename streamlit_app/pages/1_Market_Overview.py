@@ -1,18 +1,23 @@
-from utilities.helper import query_bigquery
+import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+from utilities.helper import mart, query_bigquery, query_live
+from utilities.queries import (
+    INTRADAY_REFRESH_SECONDS,
+    breadth_query,
+    intraday_breadth_query
+)
 import streamlit as st
 
 
-st.title('Market Overview')
+MARKET_TZ = ZoneInfo('America/New_York')
 
+st.title('Market Overview')
 
-query = '''
-        SELECT *
-        FROM dbt-learning-project-471822.analytics.agg_daily_market_breadth
-        ORDER BY trade_date DESC
-        LIMIT 30
-    '''
 
-df = query_bigquery(query)
+breadth_table = mart('agg_daily_market_breadth')
+df = query_bigquery(breadth_query(breadth_table), table=breadth_table)
 chart_df = df.sort_values('trade_date', ascending=True)
 
 
@@ -33,6 +38,60 @@ def make_column_metric(metric, col, percent=False):
                           f'{metric_change:.2f}', chart_data=metric_series)
 
 
+def market_open():
+    # Regular session plus a few minutes for the last bar; holidays just
+    # have no snapshots
+    now = datetime.datetime.now(MARKET_TZ)
+    return now.weekday() < 5 and \
+        datetime.time(9, 30) <= now.time() <= datetime.time(16, 5)
+
+
+def make_live_metric(metric, col, row, percent=False):
+    # Deltas are against the latest daily close
+    title = metric.replace('_', ' ').upper()
+    value = row[metric]
+    if pd.isna(value):
+        return col.metric(title, '-')
+    change = value - df[metric].iloc[0]
+    if percent:
+        return col.metric(title, f'{value * 100:.2f}%', f'{change * 100:.2f}%')
+    return col.metric(title, f'{value:.2f}', f'{change:.2f}')
+
+
+intraday_table = mart('agg_intraday_market_breadth')
+
+
+# The timer always runs, since run_every is fixed when the page first
+# runs and a page left open must start updating at the open. Outside the
+# session the day's last result is shown again without a query.
+@st.fragment(run_every=INTRADAY_REFRESH_SECONDS)
+def live_breadth():
+    today = datetime.datetime.now(MARKET_TZ).date()
+    last = st.session_state.get('live_breadth')
+    if market_open() or last is None or last[0] != today:
+        live = query_live(intraday_breadth_query(intraday_table),
+                          {'since': today})
+        st.session_state['live_breadth'] = (today, live)
+    else:
+        live = last[1]
+    if live.empty:
+        return
+    row = live.iloc[0]
+    st.subheader('Live Breadth')
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('ADVANCES / DECLINES',
+                f'{row.advances:,} / {row.declines:,}')
+    make_live_metric('ad_ratio', col2, row)
+    make_live_metric('up_down_volume_ratio', col3, row)
+    make_live_metric('pct_market_over_sma50', col4, row, percent=True)
+    bar_end = row.bar_end_at.tz_convert(MARKET_TZ).strftime('%H:%M')
+    st.caption(f'Minute bars to {bar_end} ET; {row.stocks_traded:,} of '
+               f'{row.universe_size:,} stocks traded. Changes are against '
+               'the last daily close.')
+
+
+live_breadth()
+
 col1, col2, col3 = st.columns(3)
 
 make_column_metric('pct_market_over_sma50', col1, percent=True)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from utilities.screener import get_screener
+from utilities.series_cache import get_series
+
+
+st.title('Ticker Detail')
+
+RANGES = {'3M': 63, '6M': 126, '1Y': 252, '2Y': 504, 'All': None}
+
+# Ticker list and latest metrics come from the screener's in-memory
+# dimension, so only the price history below touches BigQuery
+screener = get_screener()
+frame = screener.frame.set_index('ticker')
+tickers = sorted(frame.index)
+
+requested = st.query_params.get('ticker') or \
+    st.session_state.get('detail_ticker')
+ticker = st.sidebar.selectbox(
+    'Ticker', tickers,
+    index=tickers.index(requested) if requested in tickers else 0
+)
+st.session_state['detail_ticker'] = ticker
+st.query_params['ticker'] = ticker
+window = st.sidebar.radio('Range', list(RANGES), index=2, horizontal=True)
+
+row = frame.loc[ticker]
+st.subheader(f"{ticker} · {row['company']}")
+st.caption(row['sector'])
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric('CLOSE', f"{row['latest_close']:.2f}",
+            f"{row['return_1d'] * 100:.2f}%")
+col2.metric('RSI', f"{row['latest_rsi']:.2f}")
+col3.metric('RETURN 1M', f"{row['return_1m'] * 100:.2f}%")
+col4.metric('% BELOW 52W HIGH',
+            f"{row['pct_distance_from_52week_high'] * 100:.2f}%")
+
+series = get_series(ticker)
+if series is None:
+    st.info(f'No price history found for {ticker}')
+    st.stop()
+
+# The cache holds the full lookback; ranges are slices of the same arrays
+days = RANGES[window]
+start = 0 if days is None else max(len(series['trade_date']) - days, 0)
+dates = series['trade_date'][start:]
+
+
+def values(column):
+    return series[column][start:]
+
+
+price = go.Figure()
+price.add_trace(go.Scatter(x=dates, y=values('close'), name='Close'))
+for column, label in [('sma_20', 'SMA 20'), ('sma_50', 'SMA 50'),
+                      ('sma_200', 'SMA 200')]:
+    price.add_trace(go.Scatter(x=dates, y=values(column), name=label,
+                               line={'width': 1}))
+price.update_layout(title='Price', height=400,
+                    margin={'t': 40, 'b': 20})
+st.plotly_chart(price, width='stretch')
+
+rsi = go.Figure(go.Scatter(x=dates, y=values('rsi'), name='RSI'))
+for level in (30, 70):
+    rsi.add_hline(y=level, line_dash='dash', line_color='grey')
+rsi.update_layout(title='RSI', height=250, yaxis_range=[0, 100],
+                  margin={'t': 40, 'b': 20})
+st.plotly_chart(rsi, width='stretch')
+
+volume = go.Figure(go.Bar(x=dates, y=values('volume'), name='Volume'))
+volume.update_layout(title='Volume', height=250, margin={'t': 40, 'b': 20})
+st.plotly_chart(volume, width='stretch')
+
+latest = pd.Timestamp(dates[-1]).date() if len(dates) else None
+st.caption(f'{np.count_nonzero(~np.isnan(values("close")))} trading days '
+           f'through {latest}')
@@ -1,30 +1,55 @@
 import streamlit as st
-from utilities.helper import query_bigquery
+from utilities.screener import SIGNALS, SMA_FLAGS, get_screener
+from utilities.series_cache import prefetch
 
 
-sector_query = '''SELECT DISTINCT sector \
-        FROM dbt-learning-project-471822.analytics.dim_securities_current \
-        ORDER BY sector'''
-all_sectors = query_bigquery(sector_query)['sector'].tolist()
+# The dimension is loaded once per data day; every widget change below is
+# filtered in memory without querying BigQuery
+screener = get_screener()
+all_sectors = sorted(screener.sectors.dropna())
+
+SORT_COLUMNS = {
+    'Return 1M': 'return_1m',
+    'Return 1W': 'return_1w',
+    'Return 3M': 'return_3m',
+    'Return YTD': 'return_ytd',
+    'RSI': 'latest_rsi',
+    'Relative Volume': 'latest_rel_vol',
+    '% Below 52W High': 'pct_distance_from_52week_high',
+    'Sector': 'sector',
+    'Ticker': 'ticker',
+}
 
 st.sidebar.header("Filters")
 rsi_min, rsi_max = st.sidebar.slider("RSI Range", 0, 100, (20, 80))
 sector = st.sidebar.multiselect("Sectors", options=all_sectors)
-signals = st.sidebar.multiselect("Signals", ["Golden Cross", "Death Cross"])
-
-query = f"""
-    SELECT ticker, company, sector, latest_rsi, latest_close, return_1m
-    FROM dbt-learning-project-471822.analytics.dim_securities_current
-    WHERE latest_rsi BETWEEN {rsi_min} AND {rsi_max}
-    {'AND sector IN ("' + '","'.join(sector) + '")' if sector else ''}
-    ORDER BY return_1m DESC
-"""
-
-results = query_bigquery(query)
-
-st.warning('''WARNING! Known Limitations: This model currently does not \
-           account for corporate actions taken after historical data load \
-           such as splits and dividends. This may cause anomalies in metrics \
-           requiring lookback windows such as RSI. A fix to this issue is in \
-           progress.''', icon='⚠️')
-st.dataframe(results, width='stretch')
+signals = st.sidebar.multiselect("Signals", SIGNALS)
+over_sma = st.sidebar.multiselect("Close Above SMA", list(SMA_FLAGS))
+max_below_high = st.sidebar.slider("Max % Below 52W High", 0, 100, 100)
+min_percentile = st.sidebar.slider("Min 1M Return Percentile", 0, 100, 0)
+
+st.sidebar.header("Sort")
+sort_keys = st.sidebar.multiselect("Sort By", list(SORT_COLUMNS),
+                                   default=['Return 1M'])
+ascending = st.sidebar.toggle("Ascending", value=False)
+
+results = screener.screen(
+    rsi_range=(rsi_min, rsi_max),
+    sectors=sector,
+    signals=signals,
+    over_sma=over_sma,
+    max_pct_below_high=max_below_high / 100 if max_below_high < 100 else None,
+    min_percentile=min_percentile / 100 if min_percentile > 0 else None,
+    sort_by=[(SORT_COLUMNS[key], ascending) for key in sort_keys],
+)
+
+# Warm the detail page's series cache for the top matches in the background
+prefetch(results['ticker'].tolist())
+
+st.caption('Prices and indicators are adjusted for splits and cash '
+           'dividends; a new corporate action is reflected after the next '
+           'daily run.')
+st.caption(f'{len(results)} of {len(screener)} securities match')
+st.dataframe(results[['ticker', 'company', 'sector', 'latest_rsi',
+                      'latest_close', 'return_1m']],
+             width='stretch')
@@ -1,13 +1,98 @@
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 from google.oauth2 import service_account
 import streamlit as st
+from utilities.parameters import query_parameters
+from utilities.queries import data_version_query, mart  # noqa: F401
 
 
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets['gcp_service_account']
-)
-client = bigquery.Client(credentials=credentials)
+# Marts change once a day, so results are cached for a day and keyed on
+# the mart's latest trade_date; the freshness probe itself is re-run at
+# most every few minutes.
+QUERY_CACHE_TTL = 24 * 60 * 60
+QUERY_CACHE_MAX_ENTRIES = 256
+FRESHNESS_TTL = 5 * 60
+# Intraday snapshots are streamed every half second; no longer than the
+# page's poll, so a cached result adds at most this much staleness
+LIVE_QUERY_TTL = 0.5
 
 
-def query_bigquery(sql):
-    return client.query(sql).to_dataframe()
+@st.cache_resource
+def get_credentials():
+    return service_account.Credentials.from_service_account_info(
+        st.secrets['gcp_service_account']
+    )
+
+
+@st.cache_resource
+def get_client():
+    '''BigQuery client shared by every session'''
+    credentials = get_credentials()
+    return bigquery.Client(credentials=credentials,
+                           project=credentials.project_id)
+
+
+@st.cache_resource
+def get_bqstorage_client():
+    '''Storage Read API client shared by every session'''
+    return bigquery_storage.BigQueryReadClient(credentials=get_credentials())
+
+
+def run_query(sql, params=(), client=None, bqstorage_client=None):
+    '''Run a query without caching. Pass the clients explicitly when
+    calling from a background thread.'''
+    client = client or get_client()
+    bqstorage_client = bqstorage_client or get_bqstorage_client()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=query_parameters(params))
+    result = client.query(sql, job_config=job_config).result()
+    # Large results stream over the Storage Read API as Arrow; small ones
+    # come back with the first REST page
+    table = result.to_arrow(bqstorage_client=bqstorage_client)
+    return table.to_pandas(date_as_object=False)
+
+
+@st.cache_data(ttl=FRESHNESS_TTL, show_spinner=False)
+def get_data_version(table, column='trade_date'):
+    '''Latest `column` date in `table`'''
+    return run_query(data_version_query(table, column)).iloc[0]['latest']
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES,
+               show_spinner=False)
+def _cached_query(sql, params, data_version):
+    # data_version only feeds the cache key
+    return run_query(sql, params)
+
+
+@st.cache_data(ttl=LIVE_QUERY_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES,
+               show_spinner=False)
+def _cached_live_query(sql, params):
+    return run_query(sql, params)
+
+
+def _query_params(params):
+    # Hashable (name, value) pairs for the cache key
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in (params or {}).items()
+    ))
+
+
+def query_bigquery(sql, params=None, table=None, version_column='trade_date'):
+    '''Run `sql` through the cross-session result cache.
+
+    `params` maps @names in `sql` to values (lists become ARRAY
+    parameters). When `table` is given, cached results are reused until
+    its latest `version_column` date changes.
+    '''
+    data_version = str(get_data_version(table, version_column)) \
+        if table else None
+    return _cached_query(sql, _query_params(params), data_version)
+
+
+def query_live(sql, params=None):
+    '''Run `sql` against a table written while the market is open. Every
+    session shares one result per LIVE_QUERY_TTL, so viewers add no
+    queries.'''
+    return _cached_live_query(sql, _query_params(params))
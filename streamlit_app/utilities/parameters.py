@@ -0,0 +1,27 @@
+import datetime
+
+from google.cloud import bigquery
+
+
+# Shared by the dashboard and src/query_profiler.py, so profiled queries
+# bind their parameters exactly as the pages do.
+
+def _query_parameter(name, value):
+    if isinstance(value, (list, tuple)):
+        element_type = 'INT64' if value and isinstance(value[0], int) \
+            else 'STRING'
+        return bigquery.ArrayQueryParameter(name, element_type, list(value))
+    if isinstance(value, bool):
+        return bigquery.ScalarQueryParameter(name, 'BOOL', value)
+    if isinstance(value, datetime.date):
+        return bigquery.ScalarQueryParameter(name, 'DATE', value)
+    if isinstance(value, int):
+        return bigquery.ScalarQueryParameter(name, 'INT64', value)
+    if isinstance(value, float):
+        return bigquery.ScalarQueryParameter(name, 'FLOAT64', value)
+    return bigquery.ScalarQueryParameter(name, 'STRING', value)
+
+
+def query_parameters(params):
+    '''BigQuery query parameters for (name, value) pairs'''
+    return [_query_parameter(name, value) for name, value in params]
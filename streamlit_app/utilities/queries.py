@@ -0,0 +1,108 @@
+import datetime
+
+
+# SQL behind every dashboard query. Kept free of Streamlit and BigQuery
+# clients so src/query_profiler.py can profile exactly what the pages run.
+
+ANALYTICS_DATASET = 'dbt-learning-project-471822.analytics'
+
+SCREENER_COLUMNS = [
+    'ticker', 'company', 'sector', 'latest_close', 'latest_rsi',
+    'latest_rel_vol', 'return_1d', 'return_1w', 'return_1m', 'return_3m',
+    'return_ytd', 'performance_percentile', 'pct_distance_from_52week_high',
+    'pct_distance_from_52week_low', 'latest_sma50', 'latest_sma200',
+    'has_golden_cross_active', 'over_sma20', 'over_sma50', 'over_sma200',
+    'days_since_last_golden_cross'
+]
+SERIES_COLUMNS = ['close', 'sma_20', 'sma_50', 'sma_200', 'rsi', 'volume']
+HISTORY_DAYS = 3 * 365
+BREADTH_DAYS = 30
+# dim_securities_current holds one row per ticker as of this date
+DIM_VERSION_COLUMN = 'latest_trade_date'
+# The stream writes a breadth snapshot every half second while bars arrive
+# during the session; the page polls for the latest one this often
+INTRADAY_REFRESH_SECONDS = 0.5
+
+
+def mart(name):
+    '''Fully qualified name of an analytics mart'''
+    return f"`{ANALYTICS_DATASET}.{name}`"
+
+
+def data_version_query(table, column='trade_date'):
+    return f"SELECT MAX({column}) AS latest FROM {table}"
+
+
+def breadth_query(breadth_table):
+    return f'''
+        SELECT *
+        FROM {breadth_table}
+        ORDER BY trade_date DESC
+        LIMIT {BREADTH_DAYS}
+    '''
+
+
+def screener_query(dim_table):
+    return f"""
+        SELECT {', '.join(SCREENER_COLUMNS)}
+        FROM {dim_table}
+    """
+
+
+def series_query(momentum_table):
+    '''Series for @tickers since @start. trade_date bounds prune partitions
+    and the ticker filter prunes clustered blocks, so each ticker scans
+    only its own rows'''
+    return f"""
+        SELECT ticker, trade_date, {', '.join(SERIES_COLUMNS)}
+        FROM {momentum_table}
+        WHERE trade_date >= @start
+        AND ticker IN UNNEST(@tickers)
+        ORDER BY ticker, trade_date
+    """
+
+
+def intraday_breadth_query(intraday_table):
+    '''Latest snapshot since @since; the date bound keeps each poll to the
+    current partition'''
+    return f"""
+        SELECT *
+        FROM {intraday_table}
+        WHERE trade_date >= @since
+        ORDER BY snapshot_at DESC
+        LIMIT 1
+    """
+
+
+def as_date(data_version):
+    return datetime.date.fromisoformat(str(data_version)[:10])
+
+
+def series_start(data_version):
+    return as_date(data_version) - datetime.timedelta(days=HISTORY_DAYS)
+
+
+def dashboard_queries(mart, data_version, tickers):
+    '''(name, sql, params) for each query the pages run, naming tables with
+    `mart` and using `data_version` and `tickers` for the series queries.
+    The single-ticker series is the detail page; the multi-ticker one is
+    the screener's prefetch.'''
+    start = series_start(data_version)
+    return [
+        ('market_overview.breadth',
+         breadth_query(mart('agg_daily_market_breadth')), ()),
+        ('market_overview.data_version',
+         data_version_query(mart('agg_daily_market_breadth')), ()),
+        ('market_overview.intraday',
+         intraday_breadth_query(mart('agg_intraday_market_breadth')),
+         (('since', as_date(data_version)),)),
+        ('screener.dimension',
+         screener_query(mart('dim_securities_current')), ()),
+        ('screener.data_version',
+         data_version_query(mart('dim_securities_current'),
+                            DIM_VERSION_COLUMN), ()),
+        ('ticker_detail.series', series_query(mart('fct_trading_momentum')),
+         (('start', start), ('tickers', tuple(tickers[:1])))),
+        ('screener.prefetch', series_query(mart('fct_trading_momentum')),
+         (('start', start), ('tickers', tuple(tickers)))),
+    ]
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utilities.helper import get_data_version, mart, query_bigquery
+from utilities.queries import DIM_VERSION_COLUMN, screener_query
+
+
+DIM_TABLE = mart('dim_securities_current')
+
+TEXT_COLUMNS = {'ticker', 'company', 'sector'}
+
+SIGNALS = ['Golden Cross', 'Death Cross']
+SMA_FLAGS = {'20-day': 'over_sma20', '50-day': 'over_sma50',
+             '200-day': 'over_sma200'}
+
+
+class Screener:
+    def __init__(self, frame):
+        '''Vectorized filters over one day's dim_securities_current.
+
+        Numeric columns are held as float64 NumPy arrays (NULL -> NaN) and
+        sectors as integer codes, so each filter is a boolean mask and a
+        screen is a handful of array operations over ~3000 rows.
+        '''
+        self.frame = frame.reset_index(drop=True)
+        self.columns = {
+            column: self.frame[column].to_numpy(dtype=float, na_value=np.nan)
+            for column in self.frame.columns if column not in TEXT_COLUMNS
+        }
+        self.sector_codes, self.sectors = pd.factorize(self.frame['sector'])
+        # Text columns sort by their precomputed rank
+        self.text_ranks = {
+            column: np.unique(self.frame[column].astype(str).to_numpy(),
+                              return_inverse=True)[1]
+            for column in TEXT_COLUMNS
+        }
+
+    def __len__(self):
+        return len(self.frame)
+
+    def mask(self, rsi_range=None, sectors=None, signals=None,
+             over_sma=None, max_pct_below_high=None,
+             min_percentile=None):
+        '''Boolean mask of rows passing every given filter'''
+        c = self.columns
+        keep = np.ones(len(self.frame), dtype=bool)
+
+        if rsi_range is not None:
+            # NaN compares False, so tickers without an RSI drop out as
+            # they did with SQL BETWEEN
+            rsi = c['latest_rsi']
+            keep &= (rsi >= rsi_range[0]) & (rsi <= rsi_range[1])
+
+        if sectors:
+            codes = self.sectors.get_indexer(list(sectors))
+            keep &= np.isin(self.sector_codes, codes[codes >= 0])
+
+        if signals:
+            signal_mask = np.zeros(len(self.frame), dtype=bool)
+            if 'Golden Cross' in signals:
+                signal_mask |= c['has_golden_cross_active'] == 1
+            if 'Death Cross' in signals:
+                signal_mask |= c['latest_sma50'] < c['latest_sma200']
+            keep &= signal_mask
+
+        for flag in over_sma or []:
+            keep &= c[SMA_FLAGS[flag]] == 1
+
+        if max_pct_below_high is not None:
+            keep &= c['pct_distance_from_52week_high'] <= max_pct_below_high
+
+        if min_percentile is not None:
+            keep &= c['performance_percentile'] >= min_percentile
+
+        return keep
+
+    def screen(self, sort_by=(('return_1m', False),), **filters):
+        '''Rows passing `filters`, ordered by (column, ascending) keys with
+        NULLs last'''
+        rows = np.flatnonzero(self.mask(**filters))
+        if sort_by and len(rows):
+            keys = []
+            # np.lexsort treats its last key as primary
+            for column, ascending in reversed(list(sort_by)):
+                if column in TEXT_COLUMNS:
+                    ranks = self.text_ranks[column][rows]
+                    keys.append(ranks if ascending else -ranks)
+                else:
+                    values = self.columns[column][rows]
+                    keys.append(values if ascending else -values)
+                    keys.append(np.isnan(values))
+            rows = rows[np.lexsort(keys)]
+        return self.frame.iloc[rows]
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_screener(data_version):
+    return Screener(query_bigquery(screener_query(DIM_TABLE),
+                                   table=DIM_TABLE,
+                                   version_column=DIM_VERSION_COLUMN))
+
+
+def get_screener():
+    '''Screener over the latest dimension, loaded once per data day and
+    shared by every session'''
+    return _load_screener(
+        str(get_data_version(DIM_TABLE, DIM_VERSION_COLUMN)))
@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+from utilities.helper import (
+    get_bqstorage_client,
+    get_client,
+    get_data_version,
+    mart,
+    run_query
+)
+from utilities.queries import (
+    DIM_VERSION_COLUMN,
+    SERIES_COLUMNS,
+    series_query,
+    series_start
+)
+
+
+MOMENTUM_TABLE = mart('fct_trading_momentum')
+# The dimension's latest trade_date matches the momentum mart's and is far
+# cheaper to probe, so it versions the cached series
+VERSION_TABLE = mart('dim_securities_current')
+
+SERIES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PREFETCH_LIMIT = 20
+
+
+class SeriesCache:
+    def __init__(self, max_bytes=SERIES_CACHE_MAX_BYTES):
+        '''Thread-safe LRU of per-ticker series, bounded by array bytes'''
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            series = self._entries.get(key)
+            if series is not None:
+                self._entries.move_to_end(key)
+            return series
+
+    def put(self, key, series):
+        size = sum(values.nbytes for values in series.values())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= sum(values.nbytes for values in old.values())
+            self._entries[key] = series
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= sum(values.nbytes
+                                   for values in evicted.values())
+
+
+@st.cache_resource
+def get_series_cache():
+    '''Series cache shared by every session'''
+    return SeriesCache()
+
+
+@st.cache_resource
+def _get_prefetch_executor():
+    return ThreadPoolExecutor(max_workers=2,
+                              thread_name_prefix='series-prefetch')
+
+
+@st.cache_resource
+def _get_in_flight():
+    return set(), threading.Lock()
+
+
+def _to_series(frame):
+    '''Compact arrays for one ticker: day-resolution dates plus float32
+    values (NULL -> NaN)'''
+    series = {'trade_date': frame['trade_date'].to_numpy()
+              .astype('datetime64[D]')}
+    for column in SERIES_COLUMNS:
+        series[column] = frame[column].to_numpy(dtype=np.float32,
+                                                na_value=np.nan)
+    return series
+
+
+def _fetch(tickers, data_version, cache, client, bqstorage_client):
+    frame = run_query(series_query(MOMENTUM_TABLE),
+                      (('start', series_start(data_version)),
+                       ('tickers', tuple(tickers))),
+                      client, bqstorage_client)
+    for ticker, group in frame.groupby('ticker', sort=False):
+        cache.put((ticker, data_version), _to_series(group))
+
+
+def _data_version():
+    return str(get_data_version(VERSION_TABLE, DIM_VERSION_COLUMN))[:10]
+
+
+def get_series(ticker):
+    '''Price, SMA, RSI and volume history for `ticker`, from the cache
+    when possible'''
+    data_version = _data_version()
+    cache = get_series_cache()
+    key = (ticker, data_version)
+    series = cache.get(key)
+    if series is None:
+        _fetch([ticker], data_version, cache, get_client(),
+               get_bqstorage_client())
+        series = cache.get(key)
+    return series
+
+
+def prefetch(tickers):
+    '''Load series for `tickers` in the background with one query'''
+    data_version = _data_version()
+    cache = get_series_cache()
+    in_flight, lock = _get_in_flight()
+    with lock:
+        missing = [t for t in tickers[:PREFETCH_LIMIT]
+                   if (t, data_version) not in cache
+                   and (t, data_version) not in in_flight]
+        if not missing:
+            return
+        in_flight.update((t, data_version) for t in missing)
+
+    def load():
+        try:
+            _fetch(missing, data_version, cache, client, bqstorage_client)
+        finally:
+            with lock:
+                in_flight.difference_update((t, data_version)
+                                            for t in missing)
+
+    # The cache and clients are resolved here because Streamlit caches are
+    # not available on the worker thread
+    client, bqstorage_client = get_client(), get_bqstorage_client()
+    _get_prefetch_executor().submit(load)